@@ -0,0 +1,54 @@
+"""
+Generation-time benchmark on a synthetic grammar with thousands of rules
+
+Run from the repository root: python -m benchmarks.codegen
+"""
+
+import time
+
+import click
+
+from benchmarks.synthetic import make_grammar
+from hwpg.config import Config
+from hwpg.frontend import parse_grammar
+from hwpg.manifest import Manifest
+from hwpg.parsergen import ParserGen
+from hwpg.process import Process
+from hwpg.runtime.python.parser_codegen import PyParserCodeGen
+
+
+@click.command()
+@click.option("--rules", "-r", default=5000, show_default=True)
+@click.option("--tokens", "-t", default=200, show_default=True)
+@click.option("--runs", "-n", default=3, show_default=True)
+def codegen(rules: int, tokens: int, runs: int):
+    grammar, _, errors = Process(parse_grammar(make_grammar(rules, tokens))).process()
+    assert not errors, errors
+
+    cfg = Config()
+    best = float("inf")
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        parser, _ = ParserGen(PyParserCodeGen("synthetic", cfg)).generate(grammar)
+        best = min(best, time.perf_counter() - start)
+
+    # Regenerate with the manifest of a previous run, with no rules changed
+    manifest = Manifest("bench")
+    ParserGen(PyParserCodeGen("synthetic", cfg), manifest).generate(grammar)
+    saved = manifest.dumps()
+    incr_best = float("inf")
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        manifest = Manifest.loads(saved, "bench")
+        ParserGen(PyParserCodeGen("synthetic", cfg), manifest).generate(grammar)
+        incr_best = min(incr_best, time.perf_counter() - start)
+
+    print(f"{rules} rules, {len(parser.splitlines())} lines of output")
+    print(f"generate best:    {best * 1000:8.1f} ms")
+    print(f"incremental best: {incr_best * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    codegen()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,97 @@
+"""
+Event benchmark on the JSON example grammar: parse time on a large random
+document, and the peak memory the parse allocates per input token, building the
+tree and then only calling a handler (which counts the numbers, strings and
+objects) with no tree made at all
+
+Run from the repository root: python -m benchmarks.json_events
+"""
+
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Any, List, Optional
+
+import click
+
+from benchmarks.json_memo import _Tokenizer
+from benchmarks.json_parse import make_tokens, Token
+from hwpg.api import load_parser
+from hwpg.config import Config
+
+_GRAMMAR = "examples/json/json.hwpg"
+
+
+class _Counter:
+    def __init__(self, module: ModuleType):
+        self._types = module.TokenType
+        self.values = self.objects = 0
+
+    def on_token(self, tok: Token):
+        if tok.token_type in (self._types.NUMBER, self._types.STRING):
+            self.values += 1
+
+    def exit_dict(self, result: Any):
+        self.objects += 1
+
+
+def _load(events: bool) -> ModuleType:
+    with open(_GRAMMAR, "r") as f:
+        src = f.read()
+
+    cfg = Config(events=events, make_parse_tree=not events)
+    return load_parser(src, cfg, name="json")
+
+
+def _parse(module: ModuleType, tokens: List[Token], handler: Optional[_Counter]):
+    # The parser only takes a handler when generated with events on
+    tokenizer = _Tokenizer(module, tokens)
+    if handler:
+        return module.JsonParser(tokenizer, handler).parse_value()
+
+    return module.JsonParser(tokenizer).parse_value()
+
+
+def _best_time(module: ModuleType, tokens: List[Token], events: bool, runs: int):
+    # Timed without tracing, as tracing slows down every allocation
+    best = float("inf")
+    for _ in range(runs):
+        handler = _Counter(module) if events else None
+        start = time.perf_counter()
+        assert _parse(module, tokens, handler)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _traced_peak(module: ModuleType, tokens: List[Token], events: bool) -> int:
+    handler = _Counter(module) if events else None
+    tracemalloc.start()
+    result = _parse(module, tokens, handler)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert result
+    return peak
+
+
+@click.command()
+@click.option("--tokens", "-t", "min_tokens", default=200_000, show_default=True)
+@click.option("--runs", "-n", default=5, show_default=True)
+def json_events(min_tokens: int, runs: int):
+    tokens = make_tokens(min_tokens)
+    print(f"{len(tokens)} tokens")
+
+    for title, events in (("tree", False), ("events", True)):
+        module = _load(events)
+        best = _best_time(module, tokens, events, runs)
+        peak = _traced_peak(module, tokens, events)
+
+        print(f"{title}:")
+        print(f"  parse best: {best * 1000:8.1f} ms")
+        print(f"  peak bytes: {peak:8}")
+        print(f"  per token:  {peak / len(tokens):8.1f}")
+
+
+if __name__ == "__main__":
+    json_events()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,97 @@
+"""
+Memo benchmark on the JSON example grammar, generated without prediction and
+with every rule marked '@memo', so that each function backtracks and keeps its
+results in the memo: parse time on a large random document, plus the memory the
+memo takes per input token (what the parse leaves allocated, tree included,
+less what it does with memoizing turned off). With a memo window, also how
+many positions it dropped and how often the parse went back behind it
+
+Run from the repository root: python -m benchmarks.json_memo
+"""
+
+import re
+import time
+import tracemalloc
+from types import ModuleType
+from typing import List
+
+import click
+
+from benchmarks.json_parse import make_tokens, Token
+from hwpg.api import load_parser
+from hwpg.config import Config
+
+_GRAMMAR = "examples/json/json.hwpg"
+
+
+class _Tokenizer:
+    def __init__(self, module: ModuleType, tokens: List[Token]):
+        # The example's tokens, with the types of the loaded parser
+        types = module.TokenType
+        self._tokens = iter(
+            [Token(tok.data, types[tok.token_type.name]) for tok in tokens]
+        )
+        self._eof = Token("", types.EOF)
+
+    def next_token(self) -> Token:
+        return next(self._tokens, self._eof)
+
+
+def _load(memoize: bool, window: int = 0) -> ModuleType:
+    with open(_GRAMMAR, "r") as f:
+        src = re.sub(r"^([a-z])", r"@memo\n\1", f.read(), flags=re.MULTILINE)
+
+    cfg = Config(predictive=False, memoize=memoize, memo_window=window)
+    return load_parser(src, cfg, name="json")
+
+
+def _traced_size(module: ModuleType, tokens: List[Token]) -> int:
+    # The tree is kept, so only what the parser itself drops is freed
+    tracemalloc.start()
+    parser = module.JsonParser(_Tokenizer(module, tokens))
+    tree = parser.parse_value()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert tree
+    return size
+
+
+@click.command()
+@click.option("--tokens", "-t", "min_tokens", default=200_000, show_default=True)
+@click.option("--runs", "-n", default=5, show_default=True)
+@click.option(
+    "--window",
+    "-w",
+    default=0,
+    show_default=True,
+    help="Keep memo results for this many positions behind the current one (0 "
+    "keeps them all)",
+)
+def json_memo(min_tokens: int, runs: int, window: int):
+    tokens = make_tokens(min_tokens)
+    memoized, plain = _load(memoize=True, window=window), _load(memoize=False)
+
+    # Timed without tracing, as tracing slows down every allocation
+    best = float("inf")
+    for _ in range(runs):
+        tokenizer = _Tokenizer(memoized, tokens)
+        start = time.perf_counter()
+        parser = memoized.JsonParser(tokenizer)
+        assert parser.parse_value()
+        best = min(best, time.perf_counter() - start)
+
+    with_memo = _traced_size(memoized, tokens)
+    without = _traced_size(plain, tokens)
+
+    print(f"{len(tokens)} tokens")
+    print(f"parse best:   {best * 1000:8.1f} ms")
+    print(f"memo bytes:   {with_memo - without:8}")
+    print(f"per token:    {(with_memo - without) / len(tokens):8.1f}")
+    if window:
+        print(f"evicted:      {parser.memo_evicted:8}")
+        print(f"reparses:     {parser.memo_reparses:8}")
+
+
+if __name__ == "__main__":
+    json_memo()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,140 @@
+"""
+Parse benchmark for the generated JSON example parser: parse time on a large
+random document, plus how many parse function and token match calls failed
+and how many results were memoized
+
+Run from the repository root: python -m benchmarks.json_parse
+"""
+
+import random
+import time
+from typing import Callable, Dict, List
+
+import click
+
+from examples.json.parser.parser import JsonParser
+from examples.json.parser.tokens import TokenType
+
+_SCALARS = [
+    TokenType.STRING,
+    TokenType.NUMBER,
+    TokenType.TRUE,
+    TokenType.FALSE,
+    TokenType.NULL,
+]
+
+
+class Token:
+    __slots__ = ("data", "token_type")
+
+    def __init__(self, data: str, token_type: TokenType):
+        self.data = data
+        self.token_type = token_type
+
+
+class Tokenizer:
+    def __init__(self, tokens: List[Token]):
+        self._tokens = iter(tokens)
+        self._eof = Token("", TokenType.EOF)
+
+    def next_token(self) -> Token:
+        return next(self._tokens, self._eof)
+
+
+def _add_value(rand: random.Random, tokens: List[Token], depth: int):
+    kind = rand.randrange(4) if depth < 6 else 3
+
+    if kind == 0:
+        tokens.append(Token("{", TokenType.LBRACE))
+        for idx in range(rand.randrange(6)):
+            if idx:
+                tokens.append(Token(",", TokenType.COMMA))
+            tokens.append(Token("key", TokenType.STRING))
+            tokens.append(Token(":", TokenType.COLON))
+            _add_value(rand, tokens, depth + 1)
+        tokens.append(Token("}", TokenType.RBRACE))
+    elif kind == 1:
+        tokens.append(Token("[", TokenType.LBRACKET))
+        for idx in range(rand.randrange(6)):
+            if idx:
+                tokens.append(Token(",", TokenType.COMMA))
+            _add_value(rand, tokens, depth + 1)
+        tokens.append(Token("]", TokenType.RBRACKET))
+    else:
+        tokens.append(Token("1", rand.choice(_SCALARS)))
+
+
+def make_tokens(min_tokens: int, seed: int = 0) -> List[Token]:
+    """Returns the tokens of a random JSON document (a list of values)"""
+    rand = random.Random(seed)
+    tokens = [Token("[", TokenType.LBRACKET)]
+
+    while len(tokens) < min_tokens:
+        if len(tokens) > 1:
+            tokens.append(Token(",", TokenType.COMMA))
+        _add_value(rand, tokens, 1)
+
+    tokens.append(Token("]", TokenType.RBRACKET))
+    return tokens
+
+
+def _count_failures(tokens: List[Token]) -> Dict[str, int]:
+    counts: Dict[str, int] = {"calls": 0, "failed": 0}
+
+    def wrap(func: Callable) -> Callable:
+        def counter(*args):
+            result = func(*args)
+            counts["calls"] += 1
+            if not result:
+                counts["failed"] += 1
+            return result
+
+        return counter
+
+    # Wrap every parse function and token match helper on a throwaway subclass
+    attrs = {
+        name: wrap(getattr(JsonParser, name))
+        for name in dir(JsonParser)
+        if "parse_" in name or "match_token" in name
+    }
+    parser = type("CountingParser", (JsonParser,), attrs)(Tokenizer(tokens))
+    assert parser.parse_value()
+    return counts
+
+
+@click.command()
+@click.option("--tokens", "-t", "min_tokens", default=200_000, show_default=True)
+@click.option("--runs", "-n", default=5, show_default=True)
+def json_parse(min_tokens: int, runs: int):
+    tokens = make_tokens(min_tokens)
+    best = float("inf")
+    memos = 0
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        parser = JsonParser(Tokenizer(tokens))
+        tree = parser.parse_value()
+        best = min(best, time.perf_counter() - start)
+        assert tree
+
+        # Only generated when some function is memoized: the results and ends
+        # side by side, and a bit for each failure
+        memos = sum(
+            len(memo) // 2 - memo[::2].count(None)
+            for memo in getattr(parser, "_memos", ())
+        )
+        memos += sum(
+            bin(int.from_bytes(fails, "little")).count("1")
+            for fails in getattr(parser, "_fails", ())
+        )
+
+    counts = _count_failures(tokens)
+    print(f"{len(tokens)} tokens")
+    print(f"parse best:   {best * 1000:8.1f} ms")
+    print(f"calls:        {counts['calls']:8}")
+    print(f"failed calls: {counts['failed']:8}")
+    print(f"memo entries: {memos:8}")
+
+
+if __name__ == "__main__":
+    json_parse()  # pylint: disable=no-value-for-parameter
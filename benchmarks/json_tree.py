@@ -0,0 +1,76 @@
+"""
+Tree benchmark on the JSON example grammar, generated without its actions so
+every node comes from the default action: parse time on a large random
+document, and the memory the parse leaves allocated per input token (the tree,
+plus the tokens the parser holds), with 'ParserNode' lists and with a slotted
+class per rule
+
+Run from the repository root: python -m benchmarks.json_tree
+"""
+
+import time
+import tracemalloc
+from types import ModuleType
+from typing import List
+
+import click
+
+from benchmarks.json_memo import _Tokenizer
+from benchmarks.json_parse import make_tokens, Token
+from hwpg.api import load_parser
+from hwpg.config import Config
+
+_GRAMMAR = "examples/json/json.hwpg"
+
+
+def _load(node_classes: bool) -> ModuleType:
+    with open(_GRAMMAR, "r") as f:
+        src = f.read()
+
+    return load_parser(src, Config(node_classes=node_classes), name="json")
+
+
+def _best_time(module: ModuleType, tokens: List[Token], runs: int) -> float:
+    # Timed without tracing, as tracing slows down every allocation
+    best = float("inf")
+    for _ in range(runs):
+        tokenizer = _Tokenizer(module, tokens)
+        start = time.perf_counter()
+        parser = module.JsonParser(tokenizer)
+        assert parser.parse_value()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _traced_size(module: ModuleType, tokens: List[Token]) -> int:
+    tracemalloc.start()
+    parser = module.JsonParser(_Tokenizer(module, tokens))
+    tree = parser.parse_value()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert tree
+    return size
+
+
+@click.command()
+@click.option("--tokens", "-t", "min_tokens", default=200_000, show_default=True)
+@click.option("--runs", "-n", default=5, show_default=True)
+def json_tree(min_tokens: int, runs: int):
+    tokens = make_tokens(min_tokens)
+    print(f"{len(tokens)} tokens")
+
+    for title, node_classes in (("ParserNode", False), ("node classes", True)):
+        module = _load(node_classes)
+        best = _best_time(module, tokens, runs)
+        size = _traced_size(module, tokens)
+
+        print(f"{title}:")
+        print(f"  parse best: {best * 1000:8.1f} ms")
+        print(f"  tree bytes: {size:8}")
+        print(f"  per token:  {size / len(tokens):8.1f}")
+
+
+if __name__ == "__main__":
+    json_tree()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,83 @@
+"""
+Scaling benchmark: generation time on synthetic grammars of growing size (up
+to 10k rules with thousands of tokens), each including a few rules with deeply
+nested groups. Linear passes keep the time per rule flat as the grammar grows
+
+Run from the repository root: python -m benchmarks.scaling
+"""
+
+import time
+from typing import List, Tuple
+
+import click
+
+from benchmarks.synthetic import make_grammar, make_nested_rule, make_token_rules
+from hwpg.ast import Grammar
+from hwpg.config import Config
+from hwpg.frontend import parse_grammar
+from hwpg.parsergen import ParserGen
+from hwpg.process import Process
+from hwpg.runtime.python.parser_codegen import PyParserCodeGen
+
+# Grammar sizes (in rules) to time, each double the last
+_SIZES = [1250, 2500, 5000, 10000]
+
+# One deeply nested rule per this many rules
+_NESTED_EVERY = 1000
+
+
+def _make_grammar(rules: int, depth: int) -> Grammar:
+    tokens = rules // 5
+    src = make_grammar(rules, tokens) + make_token_rules(tokens)
+    grammar = parse_grammar(src)
+
+    for idx in range(rules // _NESTED_EVERY):
+        rule = make_nested_rule(f"nested{idx}", depth, tokens, seed=idx)
+        grammar.rules.append(rule)
+
+    return grammar
+
+
+def _time_generate(grammar: Grammar, runs: int) -> Tuple[float, float]:
+    best_process, best_gen = float("inf"), float("inf")
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        processed, _, errors = Process(grammar).process()
+        best_process = min(best_process, time.perf_counter() - start)
+        assert not errors, errors
+
+        start = time.perf_counter()
+        ParserGen(PyParserCodeGen("synthetic", Config())).generate(processed)
+        best_gen = min(best_gen, time.perf_counter() - start)
+
+    return best_process, best_gen
+
+
+@click.command()
+@click.option("--depth", "-d", default=1000, show_default=True)
+@click.option("--runs", "-n", default=2, show_default=True)
+def scaling(depth: int, runs: int):
+    results: List[Tuple[int, float]] = []
+
+    print(f"{'rules':>6} {'tokens':>6} {'process':>10} {'generate':>10} {'us/rule':>8}")
+    for rules in _SIZES:
+        grammar = _make_grammar(rules, depth)
+        process_time, gen_time = _time_generate(grammar, runs)
+
+        total = process_time + gen_time
+        per_rule = total / len(grammar.rules) * 1e6
+        results.append((rules, per_rule))
+        print(
+            f"{rules:>6} {rules // 5:>6} {process_time * 1000:>8.1f}ms"
+            f" {gen_time * 1000:>8.1f}ms {per_rule:>8.1f}"
+        )
+
+    # With linear passes, doubling the rules doubles the time, so the cost of
+    # each rule stays (roughly) the same from the smallest grammar to the largest
+    (_, first), (_, last) = results[0], results[-1]
+    print(f"per rule cost, largest vs smallest grammar: {last / first:.2f}x")
+
+
+if __name__ == "__main__":
+    scaling()  # pylint: disable=no-value-for-parameter
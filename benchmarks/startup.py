@@ -0,0 +1,72 @@
+"""
+Startup benchmark: CLI time with the self-hosted front end vs. the Lark front
+end, both cold (empty meta-parser cache) and warm (cached meta-parser tables)
+
+Run from the repository root: python -m benchmarks.startup
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import click
+
+_GRAMMAR = "examples/json/json.hwpg"
+_CONFIG = "examples/json/json_cfg.py"
+
+
+def _run_cli(cache_dir: str, output: str, use_lark: bool) -> float:
+    env: Dict[str, str] = dict(os.environ, HWPG_CACHE_DIR=cache_dir)
+    cmd = [sys.executable, "hwpg.py", "-c", _CONFIG, "-o", output, _GRAMMAR]
+    if use_lark:
+        cmd.append("--lark")
+
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def _report(name: str, times: List[float]):
+    median = statistics.median(times) * 1000
+    best = min(times) * 1000
+    print(f"{name:<12} median: {median:8.1f} ms   best: {best:8.1f} ms")
+
+
+@click.command()
+@click.option("--runs", "-n", default=10, show_default=True, help="Runs per mode")
+def startup(runs: int):
+    cold: List[float] = []
+    warm: List[float] = []
+    self_hosted: List[float] = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out")
+
+        # Cold: every run gets an empty cache directory
+        for i in range(runs):
+            cache_dir = os.path.join(tmp, f"cold{i}")
+            os.mkdir(cache_dir)
+            cold.append(_run_cli(cache_dir, output, use_lark=True))
+
+        # Warm: populate the cache once, then reuse it
+        cache_dir = os.path.join(tmp, "warm")
+        os.mkdir(cache_dir)
+        _run_cli(cache_dir, output, use_lark=True)
+        for _ in range(runs):
+            warm.append(_run_cli(cache_dir, output, use_lark=True))
+
+        # Self-hosted: no meta-parser (and no Lark import) at all
+        for _ in range(runs):
+            self_hosted.append(_run_cli(cache_dir, output, use_lark=False))
+
+    _report("lark cold", cold)
+    _report("lark warm", warm)
+    _report("self-hosted", self_hosted)
+
+
+if __name__ == "__main__":
+    startup()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,85 @@
+"""Synthetic grammar generator used by the benchmarks"""
+
+import random
+from typing import List
+
+from hwpg.ast import (
+    Alternatives,
+    MultipartBody,
+    Node,
+    Rule,
+    TokenLit,
+    TokenRef,
+    ZeroOrMore,
+    ZeroOrOne,
+)
+
+
+def _token(rand: random.Random, tokens: int) -> str:
+    return f"T{rand.randrange(tokens)}"
+
+
+def _rule_ref(rand: random.Random, idx: int, rules: int) -> str:
+    # Only reference later rules so the grammar is free of left recursion
+    return f"r{rand.randrange(idx + 1, rules)}" if idx + 1 < rules else "T0"
+
+
+def _alt(rand: random.Random, idx: int, rules: int, tokens: int) -> str:
+    parts: List[str] = [_token(rand, tokens)]
+
+    for _ in range(rand.randrange(1, 4)):
+        kind = rand.randrange(5)
+        if kind == 0:
+            parts.append(_token(rand, tokens))
+        elif kind == 1:
+            parts.append(_rule_ref(rand, idx, rules))
+        elif kind == 2:
+            parts.append(f"({_token(rand, tokens)} {_rule_ref(rand, idx, rules)})*")
+        elif kind == 3:
+            parts.append(f"[{_token(rand, tokens)} {_rule_ref(rand, idx, rules)}]")
+        else:
+            parts.append(_rule_ref(rand, idx, rules) + "+")
+
+    return " ".join(parts)
+
+
+def make_grammar(rules: int, tokens: int, seed: int = 0) -> str:
+    """Returns the source of a random (but reproducible) grammar"""
+    rand = random.Random(seed)
+    lines: List[str] = []
+
+    for idx in range(rules):
+        alts = [_alt(rand, idx, rules, tokens) for _ in range(rand.randrange(1, 4))]
+        lines.append(f"r{idx}: " + " | ".join(alts))
+
+    return "\n".join(lines) + "\n"
+
+
+def make_token_rules(tokens: int) -> str:
+    """Returns the source of a token rule for each token 'make_grammar' uses"""
+    return "".join(f"T{idx}: 't{idx}'\n" for idx in range(tokens))
+
+
+def make_nested_rule(name: str, depth: int, tokens: int, seed: int = 0) -> Rule:
+    """
+    Returns a rule made of groups nested 'depth' levels deep, alternating
+    between repeated, optional and alternative groups. It is built directly as
+    an AST, so only the generator's own passes are timed on it
+    """
+    rand = random.Random(seed)
+    node: Node = TokenRef(None, _token(rand, tokens), None)
+
+    for level in range(depth):
+        lit = TokenLit(None, f"'t{rand.randrange(tokens)}'")
+        body = MultipartBody(None, [lit, node])
+
+        kind = level % 3
+        if kind == 0:
+            node = ZeroOrMore(None, body)
+        elif kind == 1:
+            node = ZeroOrOne(None, body, brackets=True)
+        else:
+            other = TokenRef(None, _token(rand, tokens), None)
+            node = Alternatives(None, [body, other])
+
+    return Rule(name, node, ())
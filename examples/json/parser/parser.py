@@ -1,11 +1,13 @@
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import List, Optional, Union
 
 from .tokens import Token, TokenType, Tokenizer, TreeNode
 
 
 @dataclass
 class ParserNode:
+    __slots__ = ("nodes",)
+
     nodes: List[Union[Optional[TreeNode], List[TreeNode]]]
 
 
@@ -70,23 +72,26 @@ class _Parser:
 
         return tokens
 
+    def _try_match_token_in(self, mask: int) -> Optional[Token]:
+        # The mask has the bit '1 << token_type' set for each token to match
+        tok = self._curr_token()
 
-def _memoize(func):
-    def memoize_wrapper(self):
-        pos = self.pos
-        key = (func, pos)
+        if not (1 << tok.token_type) & mask:
+            return None
 
-        if key in self._memos:
-            result, new_pos = self._memos[key]
-            self.pos = new_pos
-            return result
+        self._next_token()
+        return tok
 
-        result = func(self)
-        key = (func, pos)
-        self._memos[key] = result, self.pos
-        return result
+    def _try_match_tokens_in(self, mask: int) -> List[Token]:
+        tokens: List[Token] = []
+        tok = self._curr_token()
+
+        while (1 << tok.token_type) & mask:
+            tokens.append(tok)
+            tok = self._next_token()
+
+        return tokens
 
-    return memoize_wrapper
 
 
 class JsonParser(_Parser):
@@ -94,204 +99,178 @@ class JsonParser(_Parser):
 
     def __init__(self, tokenizer: Tokenizer):
         super().__init__(tokenizer)
-        self._memos: Dict[Tuple[Callable, int], Any] = {}
 
 
-    @_memoize
     def parse_value(self) -> Optional[TreeNode]:
         """
         value: dict | list | STRING | NUMBER | 'true' | 'false' | 'null'
         """
-        old_pos = self.pos
-
-        # dict
-        dict = self.parse_dict()
-        if dict:
-            return dict
-
-        # list
-        list = self.parse_list()
-        if list:
-            return list
+        tt = self._curr_token().token_type
+
+        if tt == TokenType.LBRACE:
+            # dict
+            dict = self.parse_dict()
+            if dict:
+                return dict
+
+        if tt == TokenType.LBRACKET:
+            # list
+            list = self.parse_list()
+            if list:
+                return list
+
+        # TRUE, FALSE, NULL, STRING, NUMBER
+        if (1 << tt) & 0xc0e:
+            # STRING | NUMBER | 'true' | 'false' | 'null'
+            token = self._try_match_token_in(0xc0e)
+            if token:
+                return token
 
-        # STRING
-        string = self._try_match_token(TokenType.STRING)
-        if string:
-            return string
-
-        # NUMBER
-        number = self._try_match_token(TokenType.NUMBER)
-        if number:
-            return number
-
-        # 'true'
-        true = self._try_match_token(TokenType.TRUE)
-        if true:
-            return true
-
-        # 'false'
-        false = self._try_match_token(TokenType.FALSE)
-        if false:
-            return false
-
-        # 'null'
-        null = self._try_match_token(TokenType.NULL)
-        if null:
-            return null
-
-        self.pos = old_pos
         return None
 
 
-    @_memoize
-    def _parse_list_elems2(self) -> Optional[TreeNode]:
-        """
-        ',' value
-        """
-        old_pos = self.pos
-
-        # ','
-        comma = self._match_token_or_rollback(TokenType.COMMA, old_pos)
-        if not comma:
-            return None
-
-        # value
-        value = self.parse_value()
-        if not value:
-            self.pos = old_pos
-            return None
-
-        return ParserNode([comma, value])
-
-    @_memoize
     def _parse_list_elems(self) -> Optional[TreeNode]:
         """
         value (',' value)*
         """
-        old_pos = self.pos
-
         # value
         value = self.parse_value()
         if not value:
-            self.pos = old_pos
             return None
 
         # (',' value)*
         list_elems2_list: List[TreeNode] = []
-        while True:
-            list_elems2 = self._parse_list_elems2()
-            if not list_elems2:
-                break
-            list_elems2_list.append(list_elems2)
+        while self._curr_token().token_type == TokenType.COMMA:
+            # ','
+            list_elems2_comma = self._try_match_token(TokenType.COMMA)
+            if not list_elems2_comma:
+                return None
+
+            # value
+            list_elems2_value = self.parse_value()
+            if not list_elems2_value:
+                return None
+
+            list_elems2_list.append(ParserNode([list_elems2_comma, list_elems2_value]))
 
         return ParserNode([value, *list_elems2_list])
 
-    @_memoize
     def parse_list(self) -> Optional[TreeNode]:
         """
         list: '[' [value (',' value)*] ']'
         """
-        old_pos = self.pos
-
         # '['
-        lbracket = self._match_token_or_rollback(TokenType.LBRACKET, old_pos)
+        lbracket = self._try_match_token(TokenType.LBRACKET)
         if not lbracket:
             return None
 
         # [value (',' value)*]
-        list_elems = self._parse_list_elems()
+        list_elems = None
+        # TRUE, FALSE, NULL, LBRACKET, LBRACE, STRING, NUMBER
+        if (1 << self._curr_token().token_type) & 0xc5e:
+            list_elems = self._parse_list_elems()
+            if not list_elems:
+                return None
+
         # ']'
-        rbracket = self._match_token_or_rollback(TokenType.RBRACKET, old_pos)
+        rbracket = self._try_match_token(TokenType.RBRACKET)
         if not rbracket:
             return None
 
         return ParserNode([lbracket, list_elems, rbracket])
 
-    @_memoize
-    def _parse_dict_pairs2(self) -> Optional[TreeNode]:
+    def _parse_dict_pairs(self) -> Optional[TreeNode]:
         """
-        ',' pair
+        pair (',' pair)*
         """
-        old_pos = self.pos
-
-        # ','
-        comma = self._match_token_or_rollback(TokenType.COMMA, old_pos)
-        if not comma:
-            return None
-
         # pair
-        pair = self.parse_pair()
-        if not pair:
-            self.pos = old_pos
+        # STRING
+        pair_string = self._try_match_token(TokenType.STRING)
+        if not pair_string:
             return None
 
-        return ParserNode([comma, pair])
-
-    @_memoize
-    def _parse_dict_pairs(self) -> Optional[TreeNode]:
-        """
-        pair (',' pair)*
-        """
-        old_pos = self.pos
+        # ':'
+        pair_colon = self._try_match_token(TokenType.COLON)
+        if not pair_colon:
+            return None
 
-        # pair
-        pair = self.parse_pair()
-        if not pair:
-            self.pos = old_pos
+        # value
+        pair_value = self.parse_value()
+        if not pair_value:
             return None
 
+        pair = ParserNode([pair_string, pair_colon, pair_value])
+
         # (',' pair)*
         dict_pairs2_list: List[TreeNode] = []
-        while True:
-            dict_pairs2 = self._parse_dict_pairs2()
-            if not dict_pairs2:
-                break
-            dict_pairs2_list.append(dict_pairs2)
+        while self._curr_token().token_type == TokenType.COMMA:
+            # ','
+            dict_pairs2_comma = self._try_match_token(TokenType.COMMA)
+            if not dict_pairs2_comma:
+                return None
+
+            # pair
+            # STRING
+            dict_pairs2_pair_string = self._try_match_token(TokenType.STRING)
+            if not dict_pairs2_pair_string:
+                return None
+
+            # ':'
+            dict_pairs2_pair_colon = self._try_match_token(TokenType.COLON)
+            if not dict_pairs2_pair_colon:
+                return None
+
+            # value
+            dict_pairs2_pair_value = self.parse_value()
+            if not dict_pairs2_pair_value:
+                return None
+
+            dict_pairs2_pair = ParserNode([dict_pairs2_pair_string, dict_pairs2_pair_colon, dict_pairs2_pair_value])
+
+            dict_pairs2_list.append(ParserNode([dict_pairs2_comma, dict_pairs2_pair]))
 
         return ParserNode([pair, *dict_pairs2_list])
 
-    @_memoize
     def parse_dict(self) -> Optional[TreeNode]:
         """
         dict: '{' [pair (',' pair)*] '}'
         """
-        old_pos = self.pos
-
         # '{'
-        lbrace = self._match_token_or_rollback(TokenType.LBRACE, old_pos)
+        lbrace = self._try_match_token(TokenType.LBRACE)
         if not lbrace:
             return None
 
         # [pair (',' pair)*]
-        dict_pairs = self._parse_dict_pairs()
+        dict_pairs = None
+        if self._curr_token().token_type == TokenType.STRING:
+            dict_pairs = self._parse_dict_pairs()
+            if not dict_pairs:
+                return None
+
         # '}'
-        rbrace = self._match_token_or_rollback(TokenType.RBRACE, old_pos)
+        rbrace = self._try_match_token(TokenType.RBRACE)
         if not rbrace:
             return None
 
         return ParserNode([lbrace, dict_pairs, rbrace])
 
-    @_memoize
     def parse_pair(self) -> Optional[TreeNode]:
         """
         pair: STRING ':' value
         """
-        old_pos = self.pos
-
         # STRING
-        string = self._match_token_or_rollback(TokenType.STRING, old_pos)
+        string = self._try_match_token(TokenType.STRING)
         if not string:
             return None
 
         # ':'
-        colon = self._match_token_or_rollback(TokenType.COLON, old_pos)
+        colon = self._try_match_token(TokenType.COLON)
         if not colon:
             return None
 
         # value
         value = self.parse_value()
         if not value:
-            self.pos = old_pos
             return None
 
         return ParserNode([string, colon, value])
@@ -1,68 +1,73 @@
-import os
 import sys
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import click
-from lark import Lark, Tree
 
-from hwpg.ast import Grammar, ToAST
-from hwpg.config import Config, Lang, load, OutputType
-from hwpg.lexergen import TokensGen
-from hwpg.parsergen import ParserGen
-from hwpg.process import Process
-from hwpg.runtime.python.parser_codegen import PyParserCodeGen
-from hwpg.runtime.python.lexer_codegen import PyTokensCodeGen
+from hwpg.batch import expand_grammars, generate_all, Job, make_jobs
+from hwpg.config import Config, Lang, OutputType
+from hwpg.pipeline import analyze, generate, load_config, report
+from hwpg.timings import dumps_profile, Timings
+from hwpg.watch import Watcher
 
-_PARSER = "hwpg.lark"
 
+def _print_errors(errors: List[str]):
+    err = "\n".join(errors)
+    print(f"Errors:\n{err}")
 
-def _parse_grammar(filename: str) -> Tree:
-    # Read our grammar
-    with open(_PARSER, "r") as f:
-        parser = Lark(f, start="grammar", debug=True, parser="lalr", lexer="standard")
 
-    # Read and parse the user's grammar
-    with open(filename, "r") as f:
-        src = f.read()
+def _report(jobs: List[Job], cfg: Config, use_lark: bool, costs: bool):
+    failed = False
 
-    return parser.parse(src)
-
-
-def _gen_parser(grammar: Grammar, name: str, cfg: Config) -> Tuple[str, str]:
-    if cfg.lang == Lang.PYTHON:
-        codgen = PyParserCodeGen(name, cfg)
-    else:
-        raise AssertionError(f"Unknown or unsupported language: {cfg.lang}")
-
-    parser_str, _ = ParserGen(codgen).generate(grammar)
-    return parser_str, codgen.parser_filename
-
-
-def _gen_tokens(token_names: List[str], cfg: Config) -> Tuple[str, str]:
-    if cfg.lang == Lang.PYTHON:
-        codegen = PyTokensCodeGen(cfg.make_parse_tree)
-    else:
-        raise AssertionError(f"Unknown or unsupported language: {cfg.lang}")
-
-    return TokensGen(codegen).generate(token_names)
+    for filename, _ in jobs:
+        if costs:
+            errors, text = analyze(filename, cfg, use_lark)
+        else:
+            errors, text = report(filename, cfg, use_lark)
+        print(filename)
+        if errors:
+            failed = True
+            _print_errors(errors)
+        else:
+            print(text)
 
+    if failed:
+        sys.exit(1)
 
-def _save_output(code: str, path: str, filename: str):
-    try:
-        os.mkdir(path)
-    except FileExistsError:
-        pass
 
-    # Save parser
-    output_file = os.path.join(path, filename)
-    with open(output_file, "w") as f:
-        f.write(code)
+def _generate_timed(
+    jobs: List[Job],
+    cfg: Config,
+    config_src: str,
+    use_lark: bool,
+    force: bool,
+    show_timings: bool,
+    profile: Optional[str],
+):
+    all_timings = []
+    failed = False
+
+    for filename, output in jobs:
+        timings = Timings(filename)
+        errors = generate(filename, cfg, config_src, output, use_lark, force, timings)
+        all_timings.append(timings)
+
+        if errors:
+            failed = True
+            print(f"FAILED {filename}")
+            _print_errors(errors)
+        if show_timings:
+            print(timings.report())
+
+    if profile:
+        with open(profile, "w") as f:
+            f.write(dumps_profile(all_timings))
+
+    if failed:
+        sys.exit(1)
 
 
 @click.command()
-@click.argument(
-    "filename", metavar="<grammar.hwpg>", type=click.Path(exists=True, readable=True)
-)
+@click.argument("patterns", metavar="<grammar.hwpg>...", nargs=-1, required=True)
 @click.option(
     "--config",
     "-c",
@@ -77,16 +82,103 @@ def _save_output(code: str, path: str, filename: str):
     type=click.Path(dir_okay=True),
     help="The output directory in which to write the generated files. It defaults to "
     "a folder with the same base name as your grammer (located in the same folder "
-    "as your grammar)",
+    "as your grammar). With several grammars, each is written to a folder with its "
+    "base name inside this directory",
 )
-def hwpg(filename: str, config: str, output: str):
+@click.option(
+    "--lark",
+    "use_lark",
+    is_flag=True,
+    help="Parse the grammar with the Lark based front end instead of the "
+    "self-hosted one (normally only used as a fallback)",
+)
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Regenerate every rule instead of reusing unchanged ones from the "
+    "manifest of the previous run",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes used when generating several grammars "
+    "[default: number of CPUs]",
+)
+@click.option(
+    "--watch",
+    "-w",
+    is_flag=True,
+    help="Keep running, regenerating each grammar whenever it (or the config "
+    "file) changes",
+)
+@click.option(
+    "--timings",
+    "-t",
+    "show_timings",
+    is_flag=True,
+    help="Report the time and peak memory allocation of each phase, and the "
+    "slowest rules. Grammars are then generated one at a time, without a pool",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the timings of every grammar to this file as JSON (implies "
+    "collecting timings)",
+)
+@click.option(
+    "--report",
+    "-r",
+    "show_report",
+    is_flag=True,
+    help="Instead of generating, report which rules get predictive (LL(1)) "
+    "code, why the others fall back to backtracking and which functions are "
+    "memoized",
+)
+@click.option(
+    "--analyze",
+    "-a",
+    "show_analysis",
+    is_flag=True,
+    help="Instead of generating, report the estimated worst case work of each "
+    "rule as configured (exponential when backtracking can nest without "
+    "memoizing), and what would help the costliest rules most",
+)
+@click.option(
+    "--start",
+    "-s",
+    metavar="RULE",
+    multiple=True,
+    help="A rule the parser is entered through (repeat for several). Only these, "
+    "and the rules and tokens they use, are generated. Replaces any start rules "
+    "in the config",
+)
+def hwpg(
+    patterns: List[str],
+    config: Optional[str],
+    output: Optional[str],
+    use_lark: bool,
+    force: bool,
+    jobs: Optional[int],
+    watch: bool,
+    show_timings: bool,
+    profile: Optional[str],
+    show_report: bool,
+    show_analysis: bool,
+    start: Tuple[str, ...],
+):
     """
     "hand written" parser generator - generate parsers that look like they were
     written by hand
+
+    Each argument is a grammar file or a glob pattern (such as 'grammars/**/*.hwpg')
     """
 
     # First, load our configuration (either defaults or user supplied)
-    cfg = load(config)
+    cfg, config_src = load_config(config, start)
 
     if cfg.lang == Lang.GO:
         print("'Go' is not yet supported.")
@@ -99,48 +191,51 @@ def hwpg(filename: str, config: str, output: str):
         print("Only 'parser' generation is currently supported.")
         sys.exit(1)
 
-    # NOTE: We don't need the parse tree, but passing current transformer
-    # directly into parser yields an exception - no big deal, keep as is for now
-    # Parse the user's grammar
-    tree = _parse_grammar(filename)
-
-    # Then convert the user's parse tree into an AST
-    grammar = ToAST().transform(tree)
-
-    # Do post processing optimizing the AST and looking for errors
-    processor = Process(grammar)
-    new_grammar, token_names, errors = processor.process()
-    if errors:
-        err = "\n".join(errors)
-        print(f"Errors:\n{err}")
+    filenames, missing = expand_grammars(patterns)
+    for pattern in missing:
+        print(f"No grammar found matching: {pattern}")
+    if missing:
         sys.exit(1)
 
-    # Find the base name from the given grammar filename
-    name, _ = os.path.splitext(os.path.basename(filename))
-    # If no output path specified, create new folder in the directory of our grammar
-    # with the same name
-    if not output:
-        output = os.path.dirname(filename)
-        output = os.path.join(output, name)
-
-    # Special Python consideration, create __init__.py to make this a new package
-    if cfg.lang == Lang.PYTHON:
-        _save_output("", output, "__init__.py")
-
-    # Create tokens
-    tokens, tokens_file = _gen_tokens(token_names, cfg)
-    _save_output(tokens, output, tokens_file)
-
-    # Create Lexer, if needed
-    if cfg.output_type == OutputType.BOTH or cfg.output_type == OutputType.LEXER:
-        # TODO: Generate lexer here
-        pass
-
-    # Create parser, if needed
-    if cfg.output_type == OutputType.BOTH or cfg.output_type == OutputType.PARSER:
-        # Generate code for the parser
-        parser, parser_file = _gen_parser(new_grammar, name, cfg)
-        _save_output(parser, output, parser_file)
+    jobs_list = make_jobs(filenames, output)
+
+    if show_report or show_analysis:
+        _report(jobs_list, cfg, use_lark, show_analysis)
+        return
+
+    if watch:
+        Watcher(jobs_list, config, use_lark, force, start).run()
+        return
+
+    if show_timings or profile:
+        _generate_timed(
+            jobs_list, cfg, config_src, use_lark, force, show_timings, profile
+        )
+        return
+
+    # A single grammar is generated right here, without a pool
+    if len(jobs_list) == 1:
+        filename, output = jobs_list[0]
+        errors = generate(filename, cfg, config_src, output, use_lark, force)
+        if errors:
+            _print_errors(errors)
+            sys.exit(1)
+        return
+
+    failed = 0
+    for filename, errors in generate_all(
+        jobs_list, config, use_lark, force, jobs, start
+    ):
+        if errors:
+            failed += 1
+            print(f"FAILED {filename}")
+            _print_errors(errors)
+        else:
+            print(f"OK     {filename}")
+
+    print(f"{len(filenames) - failed} of {len(filenames)} grammars generated")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
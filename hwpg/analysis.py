@@ -0,0 +1,1055 @@
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from hwpg.ast import (
+    Alternatives,
+    Cut,
+    LeftRec,
+    MultipartBody,
+    Node,
+    NO_ID,
+    OneOrMore,
+    Rule,
+    RuleRef,
+    TokenRef,
+    ZeroOrMore,
+    ZeroOrOne,
+)
+
+_EMPTY: FrozenSet[int] = frozenset()
+_QUANTIFIERS = (ZeroOrOne, ZeroOrMore, OneOrMore)
+
+
+def children(node: Node) -> List[Node]:
+    if isinstance(node, (Alternatives, MultipartBody)):
+        return node.nodes
+    if isinstance(node, (ZeroOrMore, OneOrMore, ZeroOrOne)):
+        return [node.node]
+
+    return []
+
+
+def post_order(node: Node) -> List[Node]:
+    """
+    Returns the node and all nodes below it, each after all of its children.
+    It uses a stack rather than recursion, as rules can nest very deeply
+    """
+    order: List[Node] = []
+    stack = [node]
+
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(children(node))
+
+    # Reversed pre-order: every node now comes after everything below it
+    order.reverse()
+    return order
+
+
+class FirstSets:
+    """
+    Computes whether each node is nullable (can succeed without consuming a
+    token) and its FIRST set (the IDs of the tokens it can start with), storing
+    both on the nodes. Rules refer to each other, so rules are recomputed until
+    nothing changes, but only the rules referring to a rule that changed.
+    A node that isn't nullable can only succeed when the current token is in
+    its FIRST set, so the generated parser can skip it otherwise
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self._rules = rules
+        self._orders = [post_order(rule.node) for rule in rules]
+        self.nullable = [False] * len(rules)
+        self.first: List[FrozenSet[int]] = [_EMPTY] * len(rules)
+
+    def compute(self):
+        # Which rules to recompute when a rule changes: the ones referring to it
+        dependents: List[Set[int]] = [set() for _ in self._rules]
+        for idx, order in enumerate(self._orders):
+            for node in order:
+                if isinstance(node, RuleRef) and node.id != NO_ID:
+                    dependents[node.id].add(idx)
+
+        # Rules tend to refer to later rules, so start from the end
+        queue: Deque[int] = deque(reversed(range(len(self._rules))))
+        queued = [True] * len(self._rules)
+
+        while queue:
+            idx = queue.popleft()
+            queued[idx] = False
+
+            if self._compute_rule(idx):
+                for dependent in dependents[idx]:
+                    if not queued[dependent]:
+                        queued[dependent] = True
+                        queue.append(dependent)
+
+    def _compute_rule(self, idx: int) -> bool:
+        for node in self._orders[idx]:
+            self._compute_node(node)
+
+        node = self._rules[idx].node
+        changed = node.nullable != self.nullable[idx] or node.first != self.first[idx]
+        self.nullable[idx], self.first[idx] = node.nullable, node.first  # type: ignore
+        return changed
+
+    def _compute_node(self, node: Node):
+        if isinstance(node, Alternatives):
+            node.nullable = any(alt.nullable for alt in node.nodes)
+            node.first = frozenset().union(*[alt.first or _EMPTY for alt in node.nodes])
+        elif isinstance(node, MultipartBody):
+            first: Set[int] = set()
+            nullable = True
+
+            # Parts are only reached while all those before them are nullable
+            for part in node.nodes:
+                first.update(part.first or _EMPTY)
+                if not part.nullable:
+                    nullable = False
+                    break
+
+            node.nullable, node.first = nullable, frozenset(first)
+        elif isinstance(node, (ZeroOrMore, ZeroOrOne)):
+            node.nullable, node.first = True, node.node.first
+        elif isinstance(node, OneOrMore):
+            node.nullable, node.first = node.node.nullable, node.node.first
+        elif isinstance(node, RuleRef):
+            if node.id == NO_ID:
+                node.nullable, node.first = False, _EMPTY
+            else:
+                node.nullable, node.first = self.nullable[node.id], self.first[node.id]
+        elif isinstance(node, TokenRef):
+            node.nullable, node.first = False, frozenset([node.id])
+        elif isinstance(node, Cut):
+            node.nullable, node.first = True, _EMPTY
+        else:
+            # Unreplaced literals (an error) never match anything
+            node.nullable, node.first = False, _EMPTY
+
+
+def split_loop(rule: Rule) -> Tuple[List[MultipartBody], List[Node]]:
+    """
+    Splits the alternatives of a rule into those that start by calling the rule
+    itself (continuing its result, when parsed as a loop) and the others
+    """
+    alts = rule.node.nodes if isinstance(rule.node, Alternatives) else [rule.node]
+    recursive: List[MultipartBody] = []
+    others: List[Node] = []
+
+    for alt in alts:
+        first = alt.nodes[0] if isinstance(alt, MultipartBody) else None
+        if isinstance(first, RuleRef) and first.id == rule.id:
+            recursive.append(alt)  # type: ignore
+        else:
+            others.append(alt)
+
+    return recursive, others
+
+
+def rest_first(alt: Node, prefix: int) -> Tuple[bool, FrozenSet[int]]:
+    """
+    Returns whether the parts of an alternative after those it shares with the
+    others (see 'Alternatives.prefix') can match nothing, and the tokens they
+    can start with. The last alternative can be just the shared parts, with
+    nothing after them
+    """
+    first: Set[int] = set()
+    parts = alt.nodes[prefix:] if isinstance(alt, MultipartBody) else []
+    for part in parts:
+        first.update(part.first)  # type: ignore
+        if not part.nullable:
+            return False, frozenset(first)
+
+    return True, frozenset(first)
+
+
+def _lead(alt: Node) -> Node:
+    # The part an alternative starts with (or, for a group of them factored
+    # already, the first part they share)
+    if type(alt) is Alternatives and alt.prefix:  # type: ignore
+        alt = alt.nodes[0]  # type: ignore
+    return alt.nodes[0] if type(alt) is MultipartBody else alt  # type: ignore
+
+
+def _components(graph: List[Set[int]]) -> List[List[int]]:
+    # Tarjan's strongly connected components, with a stack of the edges still
+    # to visit per node instead of recursion
+    index = [-1] * len(graph)
+    low = [0] * len(graph)
+    on_stack = [False] * len(graph)
+    stack: List[int] = []
+    components: List[List[int]] = []
+    count = 0
+
+    for root in range(len(graph)):
+        if index[root] != -1:
+            continue
+
+        index[root] = low[root] = count
+        count += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(sorted(graph[root])))]
+
+        while work:
+            node, edges = work[-1]
+
+            for succ in edges:
+                if index[succ] == -1:
+                    index[succ] = low[succ] = count
+                    count += 1
+                    stack.append(succ)
+                    on_stack[succ] = True
+                    work.append((succ, iter(sorted(graph[succ]))))
+                    break
+                if on_stack[succ]:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+
+    return components
+
+
+def _acyclic(members: Set[int], graph: List[Set[int]]) -> bool:
+    # Whether the calls between these rules alone form no cycle
+    callers = {idx: 0 for idx in members}
+    for idx in members:
+        for callee in graph[idx] & members:
+            callers[callee] += 1
+
+    ready = [idx for idx, count in callers.items() if not count]
+    done = 0
+
+    while ready:
+        idx = ready.pop()
+        done += 1
+        for callee in graph[idx] & members:
+            callers[callee] -= 1
+            if not callers[callee]:
+                ready.append(callee)
+
+    return done == len(members)
+
+
+class LeftRecursion:
+    """
+    Finds the left recursive rules: those that can end up calling themselves
+    without consuming a token first, directly or through other rules. A rule
+    that only calls itself that way, at the start of its first alternatives,
+    is parsed as a loop. Otherwise one rule leads each group of rules calling
+    each other: it plants a failing seed in its memo and grows it by parsing
+    again for as long as that gets further. The other rules can't be memoized
+    while it grows, so the leader has to be in every cycle of the group (as
+    is any rule that could be a loop, when loops are turned off)
+    """
+
+    def __init__(self, rules: List[Rule], loops: bool = True):
+        self._rules = rules
+        self._use_loops = loops
+        # The names of the rules in each group, and in the ones without leader
+        self.groups: List[List[str]] = []
+        self.unled: List[List[str]] = []
+
+    def compute(self):
+        calls = [self._calls(rule) for rule in self._rules]
+        graph = [calls[idx][id(rule.node)] for idx, rule in enumerate(self._rules)]
+
+        for group in _components(graph):
+            idx = group[0]
+            if len(group) == 1 and idx not in graph[idx]:
+                continue
+
+            self.groups.append([self._rules[idx].name for idx in group])
+            if len(group) == 1:
+                rule = self._rules[idx]
+                loops = self._use_loops and self._loops(rule, calls[idx])
+                rule.left_rec = LeftRec.LOOP if loops else LeftRec.LEADER
+                continue
+
+            members = set(group)
+            leader = next(
+                (idx for idx in group if _acyclic(members - {idx}, graph)), None
+            )
+            if leader is None:
+                self.unled.append(self.groups[-1])
+                continue
+
+            for idx in group:
+                self._rules[idx].left_rec = LeftRec.INVOLVED
+            self._rules[leader].left_rec = LeftRec.LEADER
+
+    @staticmethod
+    def _calls(rule: Rule) -> Dict[int, Set[int]]:
+        # The rules each node can call before consuming a token, by node 'id'
+        calls: Dict[int, Set[int]] = {}
+
+        for node in post_order(rule.node):
+            found: Set[int] = set()
+
+            if isinstance(node, RuleRef):
+                if node.id != NO_ID:
+                    found.add(node.id)
+            elif isinstance(node, MultipartBody):
+                # Parts are only reached while all those before them are nullable
+                for part in node.nodes:
+                    found.update(calls[id(part)])
+                    if not part.nullable:
+                        break
+            else:
+                for child in children(node):
+                    found.update(calls[id(child)])
+
+            calls[id(node)] = found
+
+        return calls
+
+    @staticmethod
+    def _loops(rule: Rule, calls: Dict[int, Set[int]]) -> bool:
+        # Each time round, the loop continues the result with the first of the
+        # left recursive alternatives that matches. That is only what growing
+        # a seed does when they all come first and each consumes a token past
+        # the call, and the rule can't match nothing (or the call could be
+        # followed by another one at the same position)
+        node = rule.node
+        recursive, others = split_loop(rule)
+        if not isinstance(node, Alternatives) or node.nullable or not others:
+            return False
+
+        return (
+            all(alt is rec for alt, rec in zip(node.nodes, recursive))
+            and all(rule.id not in calls[id(alt)] for alt in others)
+            and all(
+                not all(part.nullable for part in alt.nodes[1:]) for alt in recursive
+            )
+        )
+
+
+class Conflict(NamedTuple):
+    """A decision that can't be made from the current token alone"""
+
+    rule: str
+    # The function the decision is in: the rule itself (empty) or a sub-rule
+    func: str
+    node: str
+    reason: str
+
+
+# Node, the root of its function, the tokens that can follow it (within the
+# rule or function being checked) and whether it can be last in there
+_Visit = Tuple[Node, Node, FrozenSet[int], bool]
+
+
+class Prediction:
+    """
+    Works out which generated functions can parse predictively: choosing every
+    alternative, optional part and repetition from the current token alone,
+    with no position to restore and nothing to memoize.
+
+    A decision only qualifies when the backtracking parser would fail in the
+    same way the predictive one does once its chosen branch fails. For
+    alternatives, no other alternative can start with the token (and none can
+    match nothing). For an optional part or repetition, what follows it can't
+    start with the token and can't match nothing, so falling back to skipping
+    the part fails anyway. What follows is only known within the rule, so a
+    part that can be last in the rule is never predicted, and a matched token
+    can't fail, so optional and repeated tokens always are. Each rule is
+    checked function by function first and then, if that fails, as a whole
+    """
+
+    def __init__(self, rules: List[Rule], token_names: List[str]):
+        self._rules = rules
+        self._token_names = token_names
+        self.conflicts: List[Conflict] = []
+        self.functions = 0
+        self.predictive = 0
+
+    def compute(self):
+        for rule in self._rules:
+            self._compute_rule(rule)
+
+        # Callers need to know whether the function they call restores the
+        # position itself on failure
+        for rule in self._rules:
+            for node in post_order(rule.node):
+                if isinstance(node, RuleRef) and node.id != NO_ID:
+                    node.predictive = self._rules[node.id].node.predictive
+
+    def report(self) -> str:
+        lines = [f"Predictive (LL(1)) functions: {self.predictive} of {self.functions}"]
+        if self.conflicts:
+            lines.append("Falling back to backtracking:")
+        rule = func = None
+
+        for conflict in self.conflicts:
+            if conflict.rule != rule:
+                rule, func = conflict.rule, None
+                lines.append(f"  {rule}")
+            if conflict.func != func:
+                func = conflict.func
+                if func:
+                    lines.append(f"    in ({func})")
+
+            indent = "      " if func else "    "
+            lines.append(f"{indent}{conflict.node}: {conflict.reason}")
+
+        return "\n".join(lines)
+
+    def _compute_rule(self, rule: Rule):
+        # Function by function first, as that is as far as most rules need
+        conflicts = self._check(rule, whole=False)
+        if conflicts and not self._check(rule, whole=True):
+            conflicts = []
+
+        # A left recursive rule gets a loop, or a memo growing its result, so
+        # its function always backtracks (and so do the continuations a loop
+        # passes its result to)
+        if rule.left_rec in (LeftRec.LOOP, LeftRec.LEADER):
+            conflicts = [
+                conflict for conflict in conflicts if conflict[0] is not rule.node
+            ]
+            conflicts.append((rule.node, (rule.name, "it is left recursive")))
+
+        failed = {id(func) for func, _ in conflicts}
+        if rule.left_rec == LeftRec.LOOP:
+            failed.update(id(alt) for alt in split_loop(rule)[0])
+        for node in post_order(rule.node):
+            if node is rule.node or isinstance(node, (Alternatives, MultipartBody)):
+                node.predictive = id(node) not in failed
+                self.functions += 1
+                self.predictive += node.predictive
+
+        for func, conflict in conflicts:
+            name = "" if func is rule.node else func.comment
+            self.conflicts.append(Conflict(rule.name, name, *conflict))
+
+    def _check(self, rule: Rule, whole: bool) -> List[Tuple[Node, Tuple[str, str]]]:
+        conflicts = []
+        stack: List[_Visit] = [(rule.node, rule.node, _EMPTY, True)]
+        # The parts shared by factored alternatives, which they don't parse
+        shared: Dict[int, int] = {}
+
+        while stack:
+            node, func, follow, last = stack.pop()
+
+            # Each nested group is a function of its own
+            if node is not rule.node and isinstance(
+                node, (Alternatives, MultipartBody)
+            ):
+                func = node
+                if not whole:
+                    follow, last = _EMPTY, True
+
+            reason = self._conflict(node, follow, last)
+            if reason:
+                conflicts.append((func, (node.comment, reason)))
+
+            if isinstance(node, Alternatives) and node.prefix:
+                # The shared parts are followed by what each alternative adds
+                for alt in node.nodes:
+                    # One that is just a shared part adds nothing to check
+                    if isinstance(alt, MultipartBody):
+                        shared[id(alt)] = node.prefix
+                        stack.append((alt, func, follow, last))
+
+                rests = [rest_first(alt, node.prefix) for alt in node.nodes]
+                first = frozenset().union(*[first for _, first in rests])
+                if any(nullable for nullable, _ in rests):
+                    follow = follow | first
+                else:
+                    follow, last = first, False
+
+                parts = node.nodes[0].nodes[: node.prefix]  # type: ignore
+                for part in reversed(parts):
+                    stack.append((part, func, follow, last))
+                    if part.nullable:
+                        follow = follow | part.first  # type: ignore
+                    else:
+                        follow, last = part.first, False  # type: ignore
+            elif isinstance(node, Alternatives):
+                stack.extend((alt, func, follow, last) for alt in node.nodes)
+            elif isinstance(node, MultipartBody):
+                # Each part is followed by the parts after it, up to the first
+                # one that can't match nothing
+                for part in reversed(node.nodes[shared.get(id(node), 0) :]):
+                    stack.append((part, func, follow, last))
+                    if part.nullable:
+                        follow = follow | part.first  # type: ignore
+                    else:
+                        follow, last = part.first, False  # type: ignore
+            elif isinstance(node, ZeroOrOne):
+                stack.append((node.node, func, follow, last))
+            elif isinstance(node, (ZeroOrMore, OneOrMore)):
+                stack.append((node.node, func, follow | node.node.first, last))  # type: ignore
+
+        return conflicts
+
+    def _names(self, ids: FrozenSet[int]) -> str:
+        return ", ".join(self._token_names[id] for id in sorted(ids))
+
+    def _conflict(
+        self, node: Node, follow: FrozenSet[int], last: bool
+    ) -> Optional[str]:
+        if isinstance(node, Alternatives):
+            seen: Set[int] = set()
+            overlap: Set[int] = set()
+
+            # Factored alternatives are chosen between after the shared parts
+            choices = [
+                (
+                    rest_first(alt, node.prefix)
+                    if node.prefix
+                    else (alt.nullable, alt.first)
+                )
+                for alt in node.nodes
+            ]
+            # The last of them can be just the shared parts, taken when none of
+            # the others starts with the token: like skipping an optional part
+            bare = bool(node.prefix) and choices[-1] == (True, _EMPTY)
+            if bare:
+                choices.pop()
+
+            for nullable, first in choices:
+                if nullable:
+                    return "an alternative can match nothing"
+                if not first:
+                    return "an alternative can never match"
+                overlap.update(seen.intersection(first))  # type: ignore
+                seen.update(first)  # type: ignore
+
+            if overlap:
+                return f"alternatives overlap on {self._names(frozenset(overlap))}"
+            if bare and last:
+                return "it can end with the shared parts, so what follows is unknown"
+            common = follow & seen if bare else _EMPTY
+            if common:
+                return f"what follows can also start with {self._names(common)}"
+        elif isinstance(node, (ZeroOrOne, ZeroOrMore, OneOrMore)):
+            part = node.node
+            if isinstance(part, TokenRef):
+                return None
+            if part.nullable:
+                return "it can match nothing"
+            if not part.first:
+                return "it can never match"
+            if last:
+                return "it can come last, so what follows is unknown"
+
+            common = part.first & follow
+            if common:
+                return f"what follows can also start with {self._names(common)}"
+
+        return None
+
+
+def _body(node: Node) -> Tuple[List[Node], bool]:
+    # The nodes a function parses in turn, and whether they are alternatives
+    if isinstance(node, Alternatives):
+        return node.nodes, True
+    if isinstance(node, MultipartBody):
+        return node.nodes, False
+
+    return [node], False
+
+
+class Memoization:
+    """
+    Works out which generated functions to memoize: the ones that can be
+    called again at the same position. That takes backtracking - a part that
+    is tried and fails (an alternative with others after it, an optional or
+    repeated part, or the body of a rule growing a left recursive result) may
+    have called a function that is then called again at the same position by
+    what is parsed next. A call at the start of a function is only made
+    again at a position when the function is called again there and isn't
+    memoized, while a later call can also come from the function starting
+    elsewhere. So a function is only called again when a tried part can reach
+    it and it has more than one caller, is called past the start of its
+    caller, or its caller is called again and not memoized. The decorators
+    '@memo' and '@nomemo' override this for the function of a rule
+    """
+
+    def __init__(self, rules: List[Rule], predictive: bool):
+        self._rules = rules
+        self._predictive = predictive
+        # Functions by node 'id': their nodes, their rules (and whether they are
+        # the functions of the rules), the functions they call and how many
+        # calls there are to them
+        self._funcs: Dict[int, Node] = {}
+        self._owners: Dict[int, Tuple[str, bool]] = {}
+        self._calls: Dict[int, List[int]] = {}
+        self._sites: Dict[int, int] = {}
+        # Functions with a call made after its caller may have moved on
+        self._shifted: Set[int] = set()
+        # Functions called by a tried part, those memoized (or not) because of
+        # their rule rather than analysis, and left recursive leaders
+        self._tried: Set[int] = set()
+        self._fixed: Dict[int, bool] = {}
+        self._leaders: Set[int] = set()
+        self.memoized: List[str] = []
+        # The functions that can be called again at the same position
+        self.again: Set[int] = set()
+
+    def compute(self):
+        for rule in self._rules:
+            self._add_rule(rule)
+
+        # Everything a tried part can reach, as nothing else is ever retried
+        reach = set(self._tried)
+        queue: Deque[int] = deque(reach)
+        while queue:
+            for callee in self._calls[queue.popleft()]:
+                if callee not in reach:
+                    reach.add(callee)
+                    queue.append(callee)
+
+        # A leader parses its rule again each time it grows its result, so it
+        # calls everything it calls again, like a function that isn't memoized
+        again = self.again
+        queue = deque(
+            key for key in reach if self._sites[key] > 1 or key in self._shifted
+        )
+        queue.extend(self._leaders)
+        while queue:
+            key = queue.popleft()
+            if key in again:
+                continue
+
+            again.add(key)
+            if not self._fixed.get(key, True):
+                queue.extend(self._calls[key])
+
+        for key, node in self._funcs.items():
+            node.memo = self._fixed.get(key, key in again)
+            if node.memo:
+                self.memoized.append(self.func_name(key))
+
+    def report(self) -> str:
+        lines = [f"Memoized functions: {len(self.memoized)} of {len(self._funcs)}"]
+        lines.extend(f"  {comment}" for comment in self.memoized)
+        return "\n".join(lines)
+
+    def func_name(self, key: int) -> str:
+        name, root = self._owners[key]
+        return name if root else f"{name} ({self._funcs[key].comment})"
+
+    def call_graph(
+        self,
+    ) -> Tuple[Dict[int, Node], Dict[int, Tuple[str, bool]], Dict[int, List[int]]]:
+        """
+        Returns the functions by node 'id', with their rules (and whether they
+        are the functions of the rules) and the functions each one calls (a
+        function once for each call to it)
+        """
+        return self._funcs, self._owners, self._calls
+
+    def _add_rule(self, rule: Rule):
+        root = rule.node
+        key = id(root)
+
+        if "memo" in rule.decorators:
+            self._fixed[key] = True
+        elif "nomemo" in rule.decorators:
+            self._fixed[key] = False
+
+        if rule.left_rec != LeftRec.LOOP:
+            nodes, choice = _body(root)
+            funcs = self._add_func(rule.name, root, nodes, choice)
+
+            # The functions of a left recursive cycle are parsed again each time
+            # its leader grows its result, so only the leader memoizes
+            if rule.left_rec in (LeftRec.LEADER, LeftRec.INVOLVED):
+                self._fixed.update((func, False) for func in funcs)
+            if rule.left_rec == LeftRec.LEADER:
+                self._leaders.add(key)
+            return
+
+        # A loop tries each tail in turn, after trying the seeds as alternatives.
+        # The tails take the result so far, so they can't be memoized
+        tails, seeds = split_loop(rule)
+        self._add_func(rule.name, root, seeds, choice=True)
+        for tail in tails:
+            self._call(key, tail, tried=True, first=False)
+            self._fixed[id(tail)] = False
+            self._add_func(rule.name, tail, tail.nodes[1:], choice=False)
+
+    def _add_func(
+        self, name: str, func: Node, nodes: List[Node], choice: bool
+    ) -> List[int]:
+        # Adds the function and its sub-functions, returning their keys
+        root = func
+        pending = [(func, nodes, choice)]
+        keys = []
+
+        while pending:
+            func, nodes, choice = pending.pop()
+            key = id(func)
+            keys.append(key)
+            self._funcs[key] = func
+            self._owners[key] = name, func is root
+            self._calls[key] = []
+
+            backtracks = not (self._predictive and func.predictive)
+            prefix = func.prefix if type(func) is Alternatives else 0  # type: ignore
+            if prefix:
+                # The shared parts come first, then each alternative carries on
+                # from their results in turn (so it can't be memoized)
+                last = len(nodes) - 1
+                for idx, alt in enumerate(nodes):
+                    # One that is just a shared part has no function of its own
+                    if type(alt) is not MultipartBody:
+                        continue
+
+                    self._call(key, alt, backtracks and idx < last, first=False)
+                    self._fixed[id(alt)] = False
+                    pending.append((alt, alt.nodes[prefix:], False))  # type: ignore
+
+                nodes, choice = nodes[0].nodes[:prefix], False  # type: ignore
+
+            last = len(nodes) - 1
+            stack = [
+                (node, backtracks and choice and idx < last, choice or not idx)
+                for idx, node in enumerate(nodes)
+            ]
+
+            while stack:
+                node, tried, first = stack.pop()
+                type_ = type(node)
+
+                if type_ is Alternatives or type_ is MultipartBody:
+                    # Each nested group is a function of its own
+                    self._call(key, node, tried, first)
+                    pending.append((node, *_body(node)))
+                elif type_ is RuleRef:
+                    if node.id != NO_ID:  # type: ignore
+                        rule = self._rules[node.id]  # type: ignore
+                        self._call(key, rule.node, tried, first)
+                elif type_ is ZeroOrOne:
+                    # The last attempt at an optional or repeated part fails
+                    stack.append((node.node, tried or backtracks, first))  # type: ignore
+                elif type_ is ZeroOrMore or type_ is OneOrMore:
+                    # ...and a repeated part moves on each time round
+                    stack.append((node.node, tried or backtracks, False))  # type: ignore
+
+        return keys
+
+    def _call(self, key: int, callee: Node, tried: bool, first: bool):
+        callee_key = id(callee)
+        self._calls[key].append(callee_key)
+        self._sites[callee_key] = self._sites.get(callee_key, 0) + 1
+        if tried:
+            self._tried.add(callee_key)
+        if not first:
+            self._shifted.add(callee_key)
+
+
+class Inlining:
+    """
+    Works out which functions are small enough to be parsed in place by their
+    callers, saving a call each time: the nested groups of parts, and the
+    rules whose parts, counted over every reference to them, stay within the
+    budget. Memoized functions keep their memo, and neither are left recursive
+    rules inlined, nor rules that could end up parsing themselves in place.
+    The code generator only parses a body in place when a failure in it fails
+    the caller, as the failed call would have
+    """
+
+    def __init__(self, rules: List[Rule], budget: int):
+        self._rules = rules
+        self._budget = budget
+
+    def compute(self):
+        refs = [0] * len(self._rules)
+        graph: List[Set[int]] = [set() for _ in self._rules]
+        sizes: List[int] = []
+
+        for idx, rule in enumerate(self._rules):
+            # The number of nodes below each node (its size in parts)
+            below: Dict[int, int] = {}
+            for node in post_order(rule.node):
+                count = sum(below[id(child)] + 1 for child in children(node))
+                below[id(node)] = count
+                type_ = type(node)
+
+                if type_ is RuleRef and node.id != NO_ID:  # type: ignore
+                    refs[node.id] += 1  # type: ignore
+                    graph[idx].add(node.id)  # type: ignore
+                elif type_ is MultipartBody and node is not rule.node:
+                    node.inline = not node.memo and count <= self._budget
+
+            sizes.append(below[id(rule.node)])
+
+        inline = {
+            idx
+            for idx, rule in enumerate(self._rules)
+            if type(rule.node) is MultipartBody
+            and not rule.node.memo
+            and rule.left_rec == LeftRec.NONE
+            and 0 < sizes[idx] * refs[idx] <= self._budget
+        }
+
+        # Parsing a rule in place can't end up parsing it in place again
+        inline_graph = [graph[idx] & inline for idx in range(len(graph))]
+        for group in _components(inline_graph):
+            if len(group) > 1 or group[0] in inline_graph[group[0]]:
+                inline.difference_update(group)
+
+        for idx in inline:
+            self._rules[idx].inline = True
+
+
+class Bound(NamedTuple):
+    """The estimated worst case work of parsing a rule"""
+
+    rule: str
+    # Whether the work can grow exponentially with the length of the input
+    exponential: bool
+    # Otherwise, how many times a function can parse the same position
+    parses: int
+    # The functions parsing positions again that cause it, unless linear
+    causes: List[str]
+
+
+class BacktrackCost:
+    """
+    Estimates the worst case work of parsing each rule. Only a function that
+    can be called again at the same position (see 'Memoization') and isn't
+    memoized parses a position more than once, up to once per call to it. If
+    such a function is in a cycle of functions calling each other that aren't
+    memoized, each level of nesting in the input can parse all the levels in
+    it again, so the work can grow exponentially. Otherwise the work stays
+    linear, multiplied by the calls to each function parsing positions again
+    on the way. It also lists where the parser backtracks, and suggests what
+    would help each rule: memoizing a function, factoring out the part its
+    alternatives start with (or why that can't be done) or more lookahead
+    """
+
+    def __init__(
+        self,
+        rules: List[Rule],
+        prediction: Prediction,
+        memoization: Memoization,
+        memoize: bool,
+        factor_prefixes: bool,
+    ):
+        self._rules = rules
+        self._prediction = prediction
+        self._memoization = memoization
+        self._memoize = memoize
+        self._factor_prefixes = factor_prefixes
+        self.bounds: List[Bound] = []
+        # Suggestions for each rule
+        self.suggestions: Dict[str, List[str]] = {}
+
+    def compute(self):
+        funcs, owners, calls = self._memoization.call_graph()
+        keys = list(funcs)
+        index = {key: idx for idx, key in enumerate(keys)}
+        graph = [{index[callee] for callee in calls[key]} for key in keys]
+
+        # Leaders grow their result in the memo even when memoizing is off
+        leaders = {
+            id(rule.node) for rule in self._rules if rule.left_rec == LeftRec.LEADER
+        }
+        memo = [funcs[key].memo and (self._memoize or key in leaders) for key in keys]
+        sites = [0] * len(keys)
+        for key in keys:
+            for callee in calls[key]:
+                sites[index[callee]] += 1
+
+        again = self._memoization.again
+        factor = [
+            sites[idx] if key in again and not memo[idx] else 1
+            for idx, key in enumerate(keys)
+        ]
+
+        # Cycles of functions that aren't memoized, parsing positions again
+        unmemoized: List[Set[int]] = [set() for _ in keys]
+        for idx, callees in enumerate(graph):
+            if not memo[idx]:
+                unmemoized[idx] = {callee for callee in callees if not memo[callee]}
+
+        explosive: Set[int] = set()
+        for group in _components(unmemoized):
+            cyclic = len(group) > 1 or group[0] in unmemoized[group[0]]
+            if cyclic and any(factor[idx] > 1 for idx in group):
+                explosive.update(idx for idx in group if factor[idx] > 1)
+
+        # Callees come first, so each group builds on those it calls
+        comp = [0] * len(keys)
+        work: List[int] = []
+        exponential: List[bool] = []
+        causes: List[Set[int]] = []
+        for num, group in enumerate(_components(graph)):
+            members = set(group)
+            below = {comp[callee] for idx in group for callee in graph[idx]}
+            below.discard(num)
+            for idx in group:
+                comp[idx] = num
+
+            product = 1
+            for idx in group:
+                product *= factor[idx]
+            work.append(product * max([work[c] for c in below], default=1))
+            exponential.append(
+                bool(members & explosive) or any(exponential[c] for c in below)
+            )
+            causes.append(
+                {idx for idx in group if factor[idx] > 1}.union(
+                    *[causes[c] for c in below]
+                )
+            )
+
+        func_name = self._memoization.func_name
+        for rule in self._rules:
+            idx = index[id(rule.node)]
+            num = comp[idx]
+            names = sorted(
+                func_name(keys[cause])
+                for cause in causes[num]
+                if cause in explosive or not exponential[num]
+            )
+            # Calls to the rule itself are up to its callers
+            parses = work[num] // factor[idx]
+            self.bounds.append(Bound(rule.name, exponential[num], parses, names))
+
+        for idx, key in enumerate(keys):
+            if factor[idx] > 1:
+                how = ", recursively" if idx in explosive else ""
+                self._suggest(
+                    owners[key][0],
+                    f"memoize {func_name(key)}: parsed up to {factor[idx]} times at "
+                    f"a position{how}",
+                )
+
+        for rule in self._rules:
+            self._find_backtracking(rule)
+
+    def _suggest(self, rule: str, suggestion: str):
+        # The same decision can be in more than one function of the rule
+        suggestions = self.suggestions.setdefault(rule, [])
+        if suggestion not in suggestions:
+            suggestions.append(suggestion)
+
+    def _find_backtracking(self, rule: Rule):
+        factored: Set[str] = set()
+        tails: Set[int] = set()
+        if rule.left_rec == LeftRec.LOOP:
+            tails = {id(tail) for tail in split_loop(rule)[0]}
+
+        for node in post_order(rule.node):
+            if isinstance(node, (ZeroOrMore, OneOrMore)) and node.node.nullable:
+                self._suggest(
+                    rule.name,
+                    f"make what {node.comment} repeats consume a token: as it can "
+                    "match nothing, the loop can go round in place",
+                )
+            if not isinstance(node, Alternatives) or node.prefix:
+                continue
+
+            # Alternatives starting with the same part only parse it once when
+            # they come next to each other and it is a token or rule (a group
+            # of them factored already starts with the part they share)
+            leads: Dict[str, List[Node]] = {}
+            for alt in node.nodes:
+                leads.setdefault(_lead(alt).comment, []).append(alt)
+
+            for lead, alts in leads.items():
+                if len(alts) < 2:
+                    continue
+
+                factored.add(node.comment)
+                # A loop carries on from its result, so never parses it again
+                if all(id(alt) in tails for alt in alts):
+                    continue
+
+                comments = " | ".join(alt.comment for alt in alts)
+                reason = self._unfactored(rule, node, alts)
+                if reason:
+                    self._suggest(
+                        rule.name,
+                        f"{comments} each parse {lead}, which can't be factored "
+                        f"out: {reason}",
+                    )
+                elif not self._factor_prefixes:
+                    self._suggest(
+                        rule.name,
+                        f"factor out {lead}, which {comments} start with, by "
+                        "turning on factor_prefixes",
+                    )
+
+        for conflict in self._prediction.conflicts:
+            if conflict.rule != rule.name or conflict.node in factored:
+                continue
+            if conflict.reason.startswith(("alternatives overlap", "what follows")):
+                self._suggest(
+                    rule.name, f"more lookahead for {conflict.node}: {conflict.reason}"
+                )
+
+    def _unfactored(self, rule: Rule, node: Alternatives, alts: List[Node]) -> str:
+        # Why the alternatives of the node starting with the same part don't
+        # share it when factored (see 'Process._factor'), or nothing if they do
+        lead = _lead(alts[0])
+        part = lead.node if type(lead) in _QUANTIFIERS else lead  # type: ignore
+        if type(part) not in (RuleRef, TokenRef):
+            return "only a token or rule is shared"
+        if type(part) is RuleRef and part.id == rule.id:  # type: ignore
+            return "a rule calling itself first is left as it is"
+        if any(_lead(alt).binding != lead.binding for alt in alts):
+            return f"{lead.comment} is bound differently in each"
+
+        for alt in alts:
+            if type(alt) is MultipartBody and any(
+                type(part) is Cut for part in alt.nodes  # type: ignore
+            ):
+                return f"{alt.comment} has a cut, which the others can't get past"
+
+        ids = [id(alt) for alt in node.nodes]
+        if ids.index(id(alts[-1])) - ids.index(id(alts[0])) >= len(alts):
+            return "they aren't next to each other"
+        for alt in alts[:-1]:
+            if _lead(alt) is alt:
+                return f"the one that is just {lead.comment} comes before the others"
+
+        return ""
+
+    def report(self) -> str:
+        memoize = "on" if self._memoize else "off"
+        lines = [f"Worst case work per rule (memoizing {memoize}):"]
+
+        for bound in self.bounds:
+            if bound.exponential:
+                cost = "O(2^n), as nested input parses "
+                cost += ", ".join(bound.causes) + " again"
+            elif bound.parses > 1:
+                cost = f"O(n), parsing a position up to {bound.parses} times"
+            else:
+                cost = "O(n)"
+            lines.append(f"  {bound.rule}: {cost}")
+
+        # The rules with the most to gain come first
+        ranked = sorted(
+            self.bounds, key=lambda bound: (not bound.exponential, -bound.parses)
+        )
+        ranked = [bound for bound in ranked if bound.rule in self.suggestions]
+        if ranked:
+            lines.append("Suggestions, most to gain first:")
+        for bound in ranked:
+            lines.append(f"  {bound.rule}")
+            lines.extend(
+                f"    {suggestion}" for suggestion in self.suggestions[bound.rule]
+            )
+
+        return "\n".join(lines)
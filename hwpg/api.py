@@ -0,0 +1,145 @@
+import sys
+from collections import OrderedDict
+from dataclasses import fields
+from threading import Lock
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+from hwpg.config import Config, Lang
+from hwpg.manifest import make_hash
+from hwpg.pipeline import render
+
+# Number of generated parsers kept loaded at once
+_CACHE_SIZE = 32
+
+_PKG_PREFIX = "_hwpg_mem_"
+
+
+class GrammarError(Exception):
+    """Raised when a grammar given to 'load_parser' has errors"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def _cache_key(src: str, name: str, cfg: Config, use_lark: bool) -> str:
+    # Action objects are arbitrary Python objects, so they are identified by
+    # 'id'. Each cache entry holds on to its config, so the ids can't be reused
+    settings = [
+        f"{field.name}={id(value) if field.name.endswith('_actions') else value!r}"
+        for field in fields(cfg)
+        for value in [getattr(cfg, field.name)]
+    ]
+    return make_hash(src, name, str(use_lark), *settings)
+
+
+def _make_module(name: str, code: str) -> ModuleType:
+    module = ModuleType(name)
+    module.__package__ = name.rpartition(".")[0]
+
+    # Registered before running it, just like a regular import (dataclasses
+    # and relative imports both look the module up by name)
+    sys.modules[name] = module
+    exec(compile(code, f"<hwpg {name}>", "exec"), module.__dict__)
+    return module
+
+
+def _load_package(pkg_name: str, files: Dict[str, str]) -> ModuleType:
+    pkg = ModuleType(pkg_name)
+    pkg.__path__ = []
+    pkg.__package__ = pkg_name
+    sys.modules[pkg_name] = pkg
+
+    try:
+        # The parser imports the tokens module, so it must come first
+        tokens_name, parser_name = "tokens", "parser"
+        for mod_name in (tokens_name, parser_name):
+            module = _make_module(f"{pkg_name}.{mod_name}", files[f"{mod_name}.py"])
+            setattr(pkg, mod_name, module)
+    except BaseException:
+        _unload_package(pkg_name)
+        raise
+
+    return getattr(pkg, parser_name)
+
+
+def _unload_package(pkg_name: str):
+    for mod_name in [pkg_name, f"{pkg_name}.tokens", f"{pkg_name}.parser"]:
+        sys.modules.pop(mod_name, None)
+
+
+class ParserCache:
+    """
+    Generates parsers straight into memory and loads them as modules, without
+    writing any files. Loaded parsers are cached by a hash of the grammar and
+    configuration, keeping only the most recently used ones
+    """
+
+    def __init__(self, size: int = _CACHE_SIZE):
+        self._size = size
+        self._lock = Lock()
+        self._modules: OrderedDict[str, Tuple[ModuleType, Config]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def load(
+        self,
+        src: str,
+        cfg: Optional[Config] = None,
+        name: str = "grammar",
+        use_lark: bool = False,
+    ) -> ModuleType:
+        """
+        Returns the parser module for the given grammar source, generating and
+        loading it first if it isn't already cached. It raises 'GrammarError'
+        if the grammar has errors
+        """
+        cfg = cfg or Config()
+        if cfg.lang != Lang.PYTHON:
+            raise ValueError(f"Only Python parsers can be loaded, not: {cfg.lang}")
+
+        key = _cache_key(src, name, cfg, use_lark)
+
+        with self._lock:
+            entry = self._modules.get(key)
+            if entry:
+                self._modules.move_to_end(key)
+                return entry[0]
+
+            errors, files = render(src, name, cfg, use_lark=use_lark)
+            if errors:
+                raise GrammarError(errors)
+
+            module = _load_package(_PKG_PREFIX + key[:24], files)
+            self._modules[key] = (module, cfg)
+
+            if len(self._modules) > self._size:
+                old_key, _ = self._modules.popitem(last=False)
+                _unload_package(_PKG_PREFIX + old_key[:24])
+
+            return module
+
+    def clear(self):
+        with self._lock:
+            for key in self._modules:
+                _unload_package(_PKG_PREFIX + key[:24])
+            self._modules.clear()
+
+
+_cache = ParserCache()
+
+
+def load_parser(
+    src: str,
+    cfg: Optional[Config] = None,
+    name: str = "grammar",
+    use_lark: bool = False,
+) -> Any:
+    """
+    Generates the parser for the given grammar source in memory and returns
+    its module (with the tokens module available as its sibling). Repeat calls
+    with the same grammar and config return the same, already loaded, module
+    """
+    return _cache.load(src, cfg, name, use_lark)
@@ -1,45 +1,87 @@
-from abc import abstractproperty, ABC
+from __future__ import annotations
+import sys
+from abc import ABC
 from dataclasses import dataclass
-from typing import Any, List, Optional, Union
+from enum import auto, Enum
+from typing import FrozenSet, List, Optional, Sequence, Tuple, TYPE_CHECKING, Union
 
-from lark import Token, Transformer
+if TYPE_CHECKING:
+    # Front ends produce Lark tokens or look-alikes (str subclasses with 'type'
+    # and 'value' attributes) - only used for type checking so Lark isn't
+    # imported unless the Lark front end is used. Tokens are only handed to the
+    # builders below, the AST itself holds plain strings
+    from lark import Token as LarkToken
 
+    from hwpg.frontend.bootstrap.tokens import Token as SelfHostedToken
 
-class Node(ABC):
-    @abstractproperty
-    def comment(self) -> str:
-        pass
+# The tokens of either front end (the self-hosted one's are typed as its
+# generated parser knows them: by their 'token_type' alone)
+Token = Union["LarkToken", "SelfHostedToken"]
+
+# Given to names that don't refer to any rule or token (until processing)
+NO_ID = -1
+
+# NOTE: Nodes are compact: they use slots, hold names as interned strings and
+# build their comment once, from the already built comments of their children.
+# The nodes must therefore be treated as immutable once created (other than the
+# IDs and analysis results, which are filled in by processing)
 
-    # TODO: Figure out how to add this - causes error with dataclass decorator
-    # @abstractproperty
-    # def binding(self) -> Optional[Token]:
-    #     pass
+
+class Node(ABC):
+    # Every node can be bound, so its binding is kept here for all of them
+    __slots__ = ("binding", "nullable", "first", "predictive", "memo", "inline")
+
+    binding: Optional[str]
+    comment: str
+
+    def __post_init__(self):
+        # Filled in by analysis: whether the node can match without consuming
+        # any tokens, and the IDs of the tokens it can start with
+        self.nullable = False
+        self.first: Optional[FrozenSet[int]] = None
+        # Whether the function generated for this node (or, for a rule
+        # reference, the function of the rule) parses predictively
+        self.predictive = False
+        # Whether the function generated for this node is memoized, as it can
+        # be called again at the same position
+        self.memo = False
+        # Whether a nested group is small enough for the code generator to
+        # parse it in place instead of calling a function of its own
+        self.inline = False
 
 
 class NodeContainer(Node):
-    pass
+    __slots__ = ()
 
 
 # rule_body
 @dataclass
 class Alternatives(NodeContainer):
-    binding: Optional[Token]
+    __slots__ = ("nodes", "comment", "prefix")
+
+    binding: Optional[str]
     nodes: List[Node]
 
-    @property
-    def comment(self) -> str:
-        return " | ".join([node.comment for node in self.nodes])
+    def __post_init__(self):
+        super().__post_init__()
+        self.comment = " | ".join([node.comment for node in self.nodes])
+        # Set by processing when the alternatives all start with the same parts
+        # (this many of them): those are parsed once, and each alternative then
+        # carries on from them in turn
+        self.prefix = 0
 
 
 # rule_body
 @dataclass
 class MultipartBody(NodeContainer):
-    binding: Optional[Token]
+    __slots__ = ("nodes", "comment")
+
+    binding: Optional[str]
     nodes: List[Node]
 
-    @property
-    def comment(self) -> str:
-        return " ".join(
+    def __post_init__(self):
+        super().__post_init__()
+        self.comment = " ".join(
             [
                 f"({node.comment})" if isinstance(node, Alternatives) else node.comment
                 for node in self.nodes
@@ -50,224 +92,270 @@ class MultipartBody(NodeContainer):
 # rule_part
 @dataclass
 class ZeroOrMore(NodeContainer):
-    binding: Optional[Token]
+    __slots__ = ("node", "comment")
+
+    binding: Optional[str]
     node: Node
 
-    @property
-    def comment(self) -> str:
+    def __post_init__(self):
+        super().__post_init__()
         # TODO: Generate parens for all containers, but to be really accurate, we'd
         # need to parse the parens and track whether we saw them or not
         if isinstance(self.node, NodeContainer):
-            return f"({self.node.comment})*"
+            self.comment = f"({self.node.comment})*"
         else:
-            return self.node.comment + "*"
+            self.comment = self.node.comment + "*"
 
 
 # rule_part
 @dataclass
 class OneOrMore(NodeContainer):
-    binding: Optional[Token]
+    __slots__ = ("node", "comment")
+
+    binding: Optional[str]
     node: Node
 
-    @property
-    def comment(self) -> str:
+    def __post_init__(self):
+        super().__post_init__()
         # TODO: Generate parens for all containers, but to be really accurate, we'd
         # need to parse the parens and track whether we saw them or not
         if isinstance(self.node, NodeContainer):
-            return f"({self.node.comment})+"
+            self.comment = f"({self.node.comment})+"
         else:
-            return self.node.comment + "+"
+            self.comment = self.node.comment + "+"
 
 
 # rule_part
 @dataclass
 class ZeroOrOne(NodeContainer):
-    binding: Optional[Token]
+    __slots__ = ("node", "brackets", "comment")
+
+    binding: Optional[str]
     node: Node
     brackets: bool
 
-    @property
-    def comment(self) -> str:
+    def __post_init__(self):
+        super().__post_init__()
         if self.brackets:
-            return "[" + self.node.comment + "]"
+            self.comment = "[" + self.node.comment + "]"
         else:
             # TODO: Generate parens for all containers, but to be really accurate, we'd
             # need to parse the parens and track whether we saw them or not
             if isinstance(self.node, NodeContainer):
-                return f"({self.node.comment})?"
+                self.comment = f"({self.node.comment})?"
             else:
-                return self.node.comment + "?"
+                self.comment = self.node.comment + "?"
 
 
 # RULE_NAME
 @dataclass
 class RuleRef(Node):
-    binding: Optional[Token]
-    name: Token
+    __slots__ = ("name", "comment", "id")
+
+    binding: Optional[str]
+    name: str
 
-    @property
-    def comment(self) -> str:
-        return self.name.value
+    def __post_init__(self):
+        super().__post_init__()
+        self.comment = self.name
+        self.id = NO_ID
 
 
 # TOKEN_NAME
 @dataclass
 class TokenRef(Node):
-    binding: Optional[Token]
-    name: Token
-    replaced_lit: Optional[Token] = None
+    __slots__ = ("name", "replaced_lit", "comment", "id")
+
+    binding: Optional[str]
+    name: str
+    replaced_lit: Optional[str]
 
-    @property
-    def comment(self) -> str:
-        return self.name.value if not self.replaced_lit else self.replaced_lit.value
+    def __post_init__(self):
+        super().__post_init__()
+        self.comment = self.name if not self.replaced_lit else self.replaced_lit
+        self.id = NO_ID
 
 
 # TOKEN_LIT
 @dataclass
 class TokenLit(Node):
-    binding: Optional[Token]
-    literal: Token
+    __slots__ = ("literal", "comment")
 
-    @property
-    def comment(self) -> str:
-        return '"' + self.literal.value + '"'
+    binding: Optional[str]
+    literal: str
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.comment = '"' + self.literal + '"'
+
+
+# TILDE
+@dataclass
+class Cut(Node):
+    __slots__ = ("comment",)
+
+    binding: Optional[str]
+
+    def __post_init__(self):
+        super().__post_init__()
+        # Matches nothing, but commits the parse to what comes before it: once
+        # past it, the parser never goes back there (it drops the tokens and
+        # memo results it holds for it), so failing after it fails for good
+        self.comment = "~"
+
+
+class LeftRec(Enum):
+    # Not left recursive
+    NONE = auto()
+    # Only calls itself first (directly), so parsed as a loop
+    LOOP = auto()
+    # Part of every left recursive cycle it is in, so it grows its result
+    # from a memoized seed
+    LEADER = auto()
+    # In a cycle led by another rule, so never memoized
+    INVOLVED = auto()
 
 
 # rule
 @dataclass
 class Rule:
-    name: Token
+    __slots__ = ("name", "node", "decorators", "comment", "id", "left_rec", "inline")
+
+    name: str
     node: Node
+    # Names given with '@' before the rule (such as 'memo')
+    decorators: Tuple[str, ...]
 
-    @property
-    def comment(self) -> str:
-        return f"{self.name.value}: {self.node.comment}"
+    def __post_init__(self):
+        decorators = "".join(f"@{name} " for name in self.decorators)
+        self.comment = f"{decorators}{self.name}: {self.node.comment}"
+        self.id = NO_ID
+        # Filled in by analysis
+        self.left_rec = LeftRec.NONE
+        # Whether its callers can parse the rule in place (see 'inline' above)
+        self.inline = False
 
 
 # token_rule
 @dataclass
 class TokenRule:
-    name: Token
+    __slots__ = ("name", "literal", "comment", "id")
+
+    name: str
     literal: TokenLit  # For now, will evolve into more
 
-    @property
-    def comment(self) -> str:
-        return f"{self.name.value}: {self.literal.comment}"
+    def __post_init__(self):
+        self.comment = f"{self.name}: {self.literal.comment}"
+        self.id = NO_ID
 
 
 # grammar
 @dataclass
 class Grammar:
+    __slots__ = ("rules", "token_rules", "token_names")
+
     rules: List[Rule]
     token_rules: List[TokenRule]
 
+    def __post_init__(self):
+        # The name of each token by ID, filled in by processing
+        self.token_names: List[str] = []
 
-def _wrap_token(node: Any) -> Node:
-    if isinstance(node, Token):
-        if node.type == "RULE_NAME":
-            return RuleRef(None, node)
-        if node.type == "TOKEN_NAME":
-            return TokenRef(None, node)
-        if node.type == "TOKEN_LIT":
-            return TokenLit(None, node)
 
-        raise AssertionError(f"Unknown token type: {node.type}")
+# Alternative in a rule body: its binding, if any, and its parts
+AltParts = Tuple[Optional["Token"], List[Node]]
 
-    return node
+
+def make_name(token: Union[str, Token]) -> str:
+    # Names repeat throughout a grammar, so keep a single copy of each one
+    return sys.intern(str(token))
+
+
+def _make_binding(token: Optional[Union[str, Token]]) -> Optional[str]:
+    return make_name(token) if token else None
+
+
+def _token_type(token: Token) -> str:
+    # The name of the token's type, as Lark gives it
+    if hasattr(token, "token_type"):
+        return token.token_type.name
+
+    return token.type
+
+
+def wrap_token(elem: Union[Node, Token]) -> Node:
+    if isinstance(elem, Node):
+        return elem
+
+    token_type = _token_type(elem)
+    if token_type == "RULE_NAME":
+        return RuleRef(None, make_name(elem))
+    if token_type == "TOKEN_NAME":
+        return TokenRef(None, make_name(elem), None)
+    if token_type == "TOKEN_LIT":
+        return TokenLit(None, make_name(elem))
+    if token_type == "TILDE":
+        return Cut(None)
+
+    raise AssertionError(f"Unknown token type: {token_type}")
 
 
 def _bind(binding: Optional[Token], node: Node) -> Node:
-    node.binding = binding
+    node.binding = _make_binding(binding)
     return node
 
 
-class ToAST(Transformer):
-    def RULE_NAME(self, token: Token) -> Token:
-        return token
+def make_grammar(entries: List[Union[Rule, TokenRule]]) -> Grammar:
+    parse_rules, token_rules = [], []
 
-    def TOKEN_NAME(self, token: Token) -> Token:
-        return token
+    for entry in entries:
+        if isinstance(entry, Rule):
+            parse_rules.append(entry)
+        elif isinstance(entry, TokenRule):
+            token_rules.append(entry)
+        else:
+            raise AssertionError("Unknown object")
 
-    def TOKEN_LIT(self, token: Token) -> Token:
-        return token
+    return Grammar(parse_rules, token_rules)
 
-    def grammar(self, rules: List[Union[Rule, TokenRule]]) -> Grammar:
-        parse_rules, token_rules = [], []
 
-        for rule in rules:
-            if isinstance(rule, Rule):
-                parse_rules.append(rule)
-            elif isinstance(rule, TokenRule):
-                token_rules.append(rule)
-            else:
-                raise AssertionError("Unknown object")
-
-        return Grammar(parse_rules, token_rules)
-
-    def entry(self, args: List[Union[Rule, TokenRule]]) -> Union[Rule, TokenRule]:
-        return args[0]
-
-    def token_rule(self, args: List[Any]) -> TokenRule:
-        return TokenRule(args[0], TokenLit(None, args[1]))
-
-    def rule(self, args: List[Any]) -> Rule:
-        return Rule(args[0], args[1])
-
-    def rule_body(self, parts: List[Node]) -> Node:
-        rules: List[Node] = []
-        alts: List[Node] = []
-        binding: Optional[Token] = None
-
-        for part in parts:
-            # If we find a binding then we are done with this part
-            if isinstance(part, List):
-                binding = part[0]
-                continue
-
-            # When we hit a pipe in the stream, end current alternative
-            if isinstance(part, Token) and "|" in part.value:
-                # If multiple rules, nest inside multipartbody otherwise just node itself
-                alts.append(
-                    MultipartBody(binding, rules)
-                    if len(rules) > 1
-                    else _bind(binding, rules[0])
-                )
-                binding = None
-                rules = []
-                continue
-
-            rules.append(part)
-
-        alts.append(
-            MultipartBody(binding, rules)
-            if len(rules) > 1
-            else _bind(binding, rules[0])
+def make_rule(name: Token, body: Node, decorators: Sequence[Token]) -> Rule:
+    return Rule(make_name(name), body, tuple(make_name(dec) for dec in decorators))
+
+
+def make_token_rule(name: Token, literal: Token) -> TokenRule:
+    return TokenRule(make_name(name), TokenLit(None, make_name(literal)))
+
+
+def make_rule_body(alts: List[AltParts]) -> Node:
+    nodes: List[Node] = []
+
+    for binding, parts in alts:
+        # If multiple rules, nest inside multipartbody otherwise just node itself
+        nodes.append(
+            MultipartBody(_make_binding(binding), parts)
+            if len(parts) > 1
+            else _bind(binding, parts[0])
         )
 
-        # NOTE: This doesn't get a binding here, but on a 2nd pass, if needed
-        return Alternatives(None, alts) if len(alts) > 1 else alts[0]
-
-    def binding(self, args: List[Token]) -> List[Token]:
-        return args
-
-    def rule_part(self, args: List[Any]) -> Node:
-        rule_len = len(args)
-
-        # Has no suffix, nor in square brackets - return wrapped (if token)
-        if rule_len == 1:
-            return _wrap_token(args[0])
-        elif rule_len == 2:
-            rule_elem, suffix = args
-            if suffix == "+":
-                return OneOrMore(None, _wrap_token(rule_elem))
-            if suffix == "*":
-                return ZeroOrMore(None, _wrap_token(rule_elem))
-            if suffix == "?":
-                return ZeroOrOne(None, _wrap_token(rule_elem), brackets=False)
-
-            raise AssertionError(f"Unknown suffix: {suffix}")
-        # rule body in between square brackets
-        elif rule_len == 3:
-            return ZeroOrOne(None, _wrap_token(args[1]), brackets=True)
-
-        raise AssertionError(f"Invalid rule length {rule_len}")
+    # NOTE: This doesn't get a binding here, but on a 2nd pass, if needed
+    return Alternatives(None, nodes) if len(nodes) > 1 else nodes[0]
+
+
+def make_rule_part(elem: Union[Node, Token], suffix: Optional[Token]) -> Node:
+    # Has no suffix - return wrapped (if token)
+    if not suffix:
+        return wrap_token(elem)
+    if suffix == "+":
+        return OneOrMore(None, wrap_token(elem))
+    if suffix == "*":
+        return ZeroOrMore(None, wrap_token(elem))
+    if suffix == "?":
+        return ZeroOrOne(None, wrap_token(elem), brackets=False)
+
+    raise AssertionError(f"Unknown suffix: {suffix}")
+
+
+def make_optional(body: Node) -> Node:
+    # rule body in between square brackets
+    return ZeroOrOne(None, body, brackets=True)
@@ -0,0 +1,101 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from hwpg.config import Config
+from hwpg.pipeline import default_output, generate, load_config
+
+# (grammar filename, output directory)
+Job = Tuple[str, str]
+Result = Tuple[str, List[str]]
+
+# Per worker process state, loaded once by the pool initializer
+_cfg = Config()
+_config_src = ""
+_use_lark = False
+_force = False
+
+
+def expand_grammars(patterns: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Expands the given grammar filenames and glob patterns, returning the
+    grammar files found (in order, without duplicates) and the patterns that
+    matched nothing
+    """
+    filenames: List[str] = []
+    missing: List[str] = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            missing.append(pattern)
+
+        for filename in matches:
+            if os.path.isfile(filename) and filename not in filenames:
+                filenames.append(filename)
+
+    return filenames, missing
+
+
+def make_jobs(filenames: List[str], output: Optional[str]) -> List[Job]:
+    """
+    Pairs each grammar with its output directory. A single grammar is written
+    to the output directory itself, several to a folder per grammar within it
+    """
+    if len(filenames) == 1 and output:
+        return [(filenames[0], output)]
+
+    jobs: List[Job] = []
+    for filename in filenames:
+        if output:
+            name, _ = os.path.splitext(os.path.basename(filename))
+            jobs.append((filename, os.path.join(output, name)))
+        else:
+            jobs.append((filename, default_output(filename)))
+
+    return jobs
+
+
+def _init_worker(
+    config: Optional[str], start: Sequence[str], use_lark: bool, force: bool
+):
+    global _cfg, _config_src, _use_lark, _force
+
+    # The config module (and its actions) are loaded here rather than pickled
+    # over from the parent, since user actions may not be picklable
+    _cfg, _config_src = load_config(config, start)
+    _use_lark = use_lark
+    _force = force
+
+
+def _run(job: Job) -> Result:
+    filename, output = job
+
+    # One bad grammar must not take down the rest of the batch
+    try:
+        errors = generate(filename, _cfg, _config_src, output, _use_lark, _force)
+    except Exception as e:
+        errors = [f"ERROR: {type(e).__name__}: {e}"]
+
+    return filename, errors
+
+
+def generate_all(
+    jobs: List[Job],
+    config: Optional[str],
+    use_lark: bool,
+    force: bool,
+    workers: Optional[int],
+    start: Sequence[str] = (),
+) -> Iterator[Result]:
+    """
+    Generates every grammar over a pool of worker processes. Results are
+    yielded in job order, each with the errors for that grammar (if any)
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(config, start, use_lark, force),
+    ) as executor:
+        yield from executor.map(_run, jobs)
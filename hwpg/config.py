@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum
 from importlib.util import module_from_spec, spec_from_file_location
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 
 from hwpg.lexergen import LexerActions
 from hwpg.parsergen import ParserActions
@@ -28,8 +28,42 @@ class Config:
 
     # Parser options
     make_parse_tree: bool = True
+    # Make each node of the tree an instance of a slotted class of its own rule
+    # (or part of one), with a named field for each part, instead of a
+    # 'ParserNode' holding a list of them
+    node_classes: bool = False
+    # Call the methods of a handler given to the parser as it goes: 'on_token'
+    # for each token matched, and 'enter_<rule>' and 'exit_<rule>' (given the
+    # result) around each rule matched. Events are held while the parser may
+    # still go back on them, so the handler only sees those of the final parse
+    events: bool = False
+    # Memoize the functions that can be called again at the same position
+    # (as found by analysis, or marked '@memo' in the grammar)
     memoize: bool = True
+    # Keep memo results only for this many positions behind the current one (0
+    # keeps them all), bounding the memo's memory on long inputs. Going back
+    # behind the window parses again what was dropped: the parser counts both
+    # ('memo_evicted' positions and 'memo_reparses')
+    memo_window: int = 0
+    # Release the tokens the parse can no longer go back to (those before where
+    # the outermost backtracking function running started), so an unbounded
+    # input is parsed holding a bounded number of tokens
+    stream_tokens: bool = False
     left_recursion: bool = True
+    # Generate rules (or their parts) that are LL(1) as predictive code, which
+    # picks its way from the current token without backtracking or memoizing
+    predictive: bool = True
+    # Parse nested groups and rules in place of calling their functions, as
+    # long as that adds at most this many parts to each caller (0 turns it off)
+    inline: int = 8
+    # Parse the parts that alternatives next to each other start with only once
+    factor_prefixes: bool = True
+    # The rules the parser is entered through. Only these, and the rules and
+    # tokens they use, are generated (by default, every rule is)
+    start: Sequence[str] = ()
+
+    # Directory for compiled (bytecode) file templates, if they are to be cached
+    template_cache_dir: Optional[str] = None
 
     lexer_actions: Optional[LexerActions] = None
     parser_actions: Optional[ParserActions] = None
@@ -0,0 +1,45 @@
+from typing import Optional
+
+from hwpg.ast import Grammar
+from hwpg.frontend.bootstrap.parser import HwpgParser
+from hwpg.frontend.bootstrap.tokens import TokenType
+from hwpg.frontend.lexer import Lexer
+from hwpg.timings import measure, Timings
+
+
+def _parse_self_hosted(src: str) -> Optional[Grammar]:
+    parser = HwpgParser(Lexer(src))
+    try:
+        grammar = parser.parse_grammar()
+    except RecursionError:
+        # Its functions call each other for each nested group, unlike Lark's
+        # LALR parser, so leave a very deeply nested grammar to Lark
+        return None
+
+    # Only a parse that consumed the whole file counts
+    if grammar and parser._curr_token().token_type == TokenType.EOF:
+        return grammar
+
+    return None
+
+
+def parse_grammar(
+    src: str, use_lark: bool = False, timings: Optional[Timings] = None
+) -> Grammar:
+    """
+    Parses grammar source directly into an AST with the self-hosted front end,
+    a parser generated by hwpg from its own grammar. The Lark front end is
+    used only when asked for or when the self-hosted front end rejects the
+    source (or nests too deeply for it) - it then either reports a detailed
+    error or, should the two ever disagree, produces the AST instead
+    """
+    if not use_lark:
+        with measure(timings, "parse"):
+            grammar = _parse_self_hosted(src)
+        if grammar:
+            return grammar
+
+    # Lark is slow to import, so only do so when needed
+    from hwpg.frontend import lark_parser
+
+    return lark_parser.parse_grammar(src, timings)
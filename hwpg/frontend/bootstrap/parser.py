@@ -0,0 +1,448 @@
+
+from typing import List, Optional
+from typing import Union
+
+from hwpg.ast import (
+    AltParts,
+    Grammar,
+    make_grammar,
+    make_optional,
+    make_rule,
+    make_rule_body,
+    make_rule_part,
+    make_token_rule,
+    Node,
+    Rule,
+    TokenRule,
+)
+
+from .tokens import Token, TokenType, Tokenizer
+
+
+class _Parser:
+    """Parser base class containing helper functions"""
+
+    def __init__(self, tokenizer: Tokenizer):
+        self._tok = tokenizer
+        self.pos = -1
+        self._tokens: List[Token] = []
+        self._next_token()
+
+    def _curr_token(self) -> Token:
+        return self._tokens[self.pos]
+
+    def _next_token(self) -> Token:
+        self.pos += 1
+
+        if self.pos < len(self._tokens):
+            return self._tokens[self.pos]
+
+        tok = self._tok.next_token()
+        self._tokens.append(tok)
+        return tok
+
+    def _match_token_or_rollback(self, tt: TokenType, old_pos: int) -> Optional[Token]:
+        tok = self._curr_token()
+
+        if tok.token_type != tt:
+            self.pos = old_pos
+            return None
+
+        self._next_token()
+        return tok
+
+    def _match_tokens_or_rollback(self, tt: TokenType, old_pos: int) -> List[Token]:
+        token = self._match_token_or_rollback(tt, old_pos)
+        if not token:
+            self.pos = old_pos
+            return []
+
+        tokens = self._try_match_tokens(tt)
+        return [token, *tokens]
+
+    def _try_match_token(self, tt: TokenType) -> Optional[Token]:
+        tok = self._curr_token()
+
+        if tok.token_type != tt:
+            return None
+
+        self._next_token()
+        return tok
+
+    def _try_match_tokens(self, tt: TokenType) -> List[Token]:
+        tokens: List[Token] = []
+        
+        while True:
+            tok = self._try_match_token(tt)
+            if not tok:
+                break
+            tokens.append(tok)
+
+        return tokens
+
+    def _try_match_token_in(self, mask: int) -> Optional[Token]:
+        # The mask has the bit '1 << token_type' set for each token to match
+        tok = self._curr_token()
+
+        if not (1 << tok.token_type) & mask:
+            return None
+
+        self._next_token()
+        return tok
+
+    def _try_match_tokens_in(self, mask: int) -> List[Token]:
+        tokens: List[Token] = []
+        tok = self._curr_token()
+
+        while (1 << tok.token_type) & mask:
+            tokens.append(tok)
+            tok = self._next_token()
+
+        return tokens
+
+
+
+class HwpgParser(_Parser):
+    """Primary parser class"""
+
+    def __init__(self, tokenizer: Tokenizer):
+        super().__init__(tokenizer)
+
+
+    def _parse_grammar_inner1(self) -> Optional[Union[Rule, TokenRule]]:
+        """
+        entry NL
+        """
+        # entry
+        entry = self.parse_entry()
+        if not entry:
+            return None
+
+        # NL
+        nl = self._try_match_token(TokenType.NL)
+        if not nl:
+            return None
+
+        return entry
+
+    def parse_grammar(self) -> Optional[Grammar]:
+        """
+        grammar: (entry NL)* entry?
+        """
+        old_pos = self.pos
+
+        # (entry NL)*
+        grammar_inner1_list: List[Union[Rule, TokenRule]] = []
+        while True:
+            pos = self.pos
+            grammar_inner1 = self._parse_grammar_inner1()
+            if not grammar_inner1:
+                self.pos = pos
+                break
+            grammar_inner1_list.append(grammar_inner1)
+
+        # entry?
+        pos = self.pos
+        entry = self.parse_entry()
+        if not entry:
+            self.pos = pos
+
+        entries = [*grammar_inner1_list, entry] if entry else grammar_inner1_list
+        return make_grammar(entries)
+
+    def parse_entry(self) -> Optional[Union[Rule, TokenRule]]:
+        """
+        entry: rule | token_rule
+        """
+        tt = self._curr_token().token_type
+
+        # AT, RULE_NAME
+        if (1 << tt) & 0x4800:
+            # rule
+            rule = self.parse_rule()
+            if rule:
+                return rule
+
+        if tt == TokenType.TOKEN_NAME:
+            # token_rule
+            token_rule = self.parse_token_rule()
+            if token_rule:
+                return token_rule
+
+        return None
+
+
+    def parse_rule(self) -> Optional[Rule]:
+        """
+        rule: decorator* RULE_NAME NL? ':' rule_body
+        """
+        # decorator*
+        decorator_list: List[Token] = []
+        while self._curr_token().token_type == TokenType.AT:
+            decorator = self.parse_decorator()
+            if not decorator:
+                return None
+            decorator_list.append(decorator)
+
+        # RULE_NAME
+        rule_name = self._try_match_token(TokenType.RULE_NAME)
+        if not rule_name:
+            return None
+
+        # NL?
+        nl = self._try_match_token(TokenType.NL)
+        # ':'
+        colon = self._try_match_token(TokenType.COLON)
+        if not colon:
+            return None
+
+        # rule_body
+        rule_body = self.parse_rule_body()
+        if not rule_body:
+            return None
+
+        return make_rule(rule_name, rule_body, decorator_list)
+
+    def parse_decorator(self) -> Optional[Token]:
+        """
+        decorator: '@' RULE_NAME NL?
+        """
+        # '@'
+        at = self._try_match_token(TokenType.AT)
+        if not at:
+            return None
+
+        # RULE_NAME
+        rule_name = self._try_match_token(TokenType.RULE_NAME)
+        if not rule_name:
+            return None
+
+        # NL?
+        nl = self._try_match_token(TokenType.NL)
+        return rule_name
+
+    def _parse_rule_body_inner1(self) -> Optional[AltParts]:
+        """
+        NL? '|' binding? rule_part+
+        """
+        old_pos = self.pos
+
+        # NL?
+        nl = self._try_match_token(TokenType.NL)
+        # '|'
+        pipe = self._match_token_or_rollback(TokenType.PIPE, old_pos)
+        if not pipe:
+            return None
+
+        # binding?
+        pos = self.pos
+        binding = self.parse_binding()
+        if not binding:
+            self.pos = pos
+
+        # rule_part+
+        rule_part_list: List[Node] = []
+        while True:
+            pos = self.pos
+            rule_part = self.parse_rule_part()
+            if not rule_part:
+                self.pos = pos
+                break
+            rule_part_list.append(rule_part)
+
+        if not rule_part_list:
+            self.pos = old_pos
+            return None
+
+        return binding, rule_part_list
+
+    def parse_rule_body(self) -> Optional[Node]:
+        """
+        rule_body: binding? rule_part+ (NL? '|' binding? rule_part+)*
+        """
+        old_pos = self.pos
+
+        # binding?
+        pos = self.pos
+        binding = self.parse_binding()
+        if not binding:
+            self.pos = pos
+
+        # rule_part+
+        rule_part_list: List[Node] = []
+        while True:
+            pos = self.pos
+            rule_part = self.parse_rule_part()
+            if not rule_part:
+                self.pos = pos
+                break
+            rule_part_list.append(rule_part)
+
+        if not rule_part_list:
+            self.pos = old_pos
+            return None
+
+        # (NL? '|' binding? rule_part+)*
+        rule_body_inner1_list: List[AltParts] = []
+        while True:
+            rule_body_inner1 = self._parse_rule_body_inner1()
+            if not rule_body_inner1:
+                break
+            rule_body_inner1_list.append(rule_body_inner1)
+
+        return make_rule_body([(binding, rule_part_list), *rule_body_inner1_list])
+
+    def parse_binding(self) -> Optional[Token]:
+        """
+        binding: RULE_NAME '='
+        """
+        # RULE_NAME
+        rule_name = self._try_match_token(TokenType.RULE_NAME)
+        if not rule_name:
+            return None
+
+        # '='
+        equals = self._try_match_token(TokenType.EQUALS)
+        if not equals:
+            return None
+
+        return rule_name
+
+    def _parse_rule_part_inner1(self) -> Optional[Node]:
+        """
+        rule_elem suffix?
+        """
+        old_pos = self.pos
+
+        # rule_elem
+        rule_elem = self.parse_rule_elem()
+        if not rule_elem:
+            self.pos = old_pos
+            return None
+
+        # suffix?
+        pos = self.pos
+        suffix = self.parse_suffix()
+        if not suffix:
+            self.pos = pos
+
+        return make_rule_part(rule_elem, suffix)
+
+    def _parse_rule_part_inner2(self) -> Optional[Node]:
+        """
+        '[' rule_body ']'
+        """
+        # '['
+        lbracket = self._try_match_token(TokenType.LBRACKET)
+        if not lbracket:
+            return None
+
+        # rule_body
+        rule_body = self.parse_rule_body()
+        if not rule_body:
+            return None
+
+        # ']'
+        rbracket = self._try_match_token(TokenType.RBRACKET)
+        if not rbracket:
+            return None
+
+        return make_optional(rule_body)
+
+    def parse_rule_part(self) -> Optional[Node]:
+        """
+        rule_part: rule_elem suffix? | '[' rule_body ']'
+        """
+        tt = self._curr_token().token_type
+
+        # LPAREN, TILDE, RULE_NAME, TOKEN_NAME, TOKEN_LIT
+        if (1 << tt) & 0x1d040:
+            # rule_elem suffix?
+            rule_part_inner1 = self._parse_rule_part_inner1()
+            if rule_part_inner1:
+                return rule_part_inner1
+
+        if tt == TokenType.LBRACKET:
+            # '[' rule_body ']'
+            rule_part_inner2 = self._parse_rule_part_inner2()
+            if rule_part_inner2:
+                return rule_part_inner2
+
+        return None
+
+
+    def _parse_rule_elem_inner1(self) -> Optional[Node]:
+        """
+        '(' rule_body ')'
+        """
+        # '('
+        lparen = self._try_match_token(TokenType.LPAREN)
+        if not lparen:
+            return None
+
+        # rule_body
+        rule_body = self.parse_rule_body()
+        if not rule_body:
+            return None
+
+        # ')'
+        rparen = self._try_match_token(TokenType.RPAREN)
+        if not rparen:
+            return None
+
+        return rule_body
+
+    def parse_rule_elem(self) -> Optional[Union[Node, Token]]:
+        """
+        rule_elem: '(' rule_body ')' | RULE_NAME | TOKEN_NAME | TOKEN_LIT | '~'
+        """
+        tt = self._curr_token().token_type
+
+        if tt == TokenType.LPAREN:
+            # '(' rule_body ')'
+            rule_elem_inner1 = self._parse_rule_elem_inner1()
+            if rule_elem_inner1:
+                return rule_elem_inner1
+
+        # TILDE, RULE_NAME, TOKEN_NAME, TOKEN_LIT
+        if (1 << tt) & 0x1d000:
+            # RULE_NAME | TOKEN_NAME | TOKEN_LIT | '~'
+            token = self._try_match_token_in(0x1d000)
+            if token:
+                return token
+
+        return None
+
+
+    def parse_suffix(self) -> Optional[Token]:
+        """
+        suffix: '+' | '*' | '?'
+        """
+        # '+' | '*' | '?'
+        token = self._try_match_token_in(0x700)
+        if token:
+            return token
+
+        return None
+
+
+    def parse_token_rule(self) -> Optional[TokenRule]:
+        """
+        token_rule: TOKEN_NAME ':' TOKEN_LIT
+        """
+        # TOKEN_NAME
+        token_name = self._try_match_token(TokenType.TOKEN_NAME)
+        if not token_name:
+            return None
+
+        # ':'
+        colon = self._try_match_token(TokenType.COLON)
+        if not colon:
+            return None
+
+        # TOKEN_LIT
+        token_lit = self._try_match_token(TokenType.TOKEN_LIT)
+        if not token_lit:
+            return None
+
+        return make_token_rule(token_name, token_lit)
@@ -0,0 +1,43 @@
+from enum import auto, IntEnum
+from typing import Protocol
+
+class TokenType(IntEnum):
+    """
+    All token types as found in the grammar
+    """
+
+    COLON = auto()
+    PIPE = auto()
+    EQUALS = auto()
+    LBRACKET = auto()
+    RBRACKET = auto()
+    LPAREN = auto()
+    RPAREN = auto()
+    PLUS = auto()
+    STAR = auto()
+    QUEST_MARK = auto()
+    AT = auto()
+    TILDE = auto()
+    NL = auto()
+    RULE_NAME = auto()
+    TOKEN_NAME = auto()
+    TOKEN_LIT = auto()
+    EOF = auto()
+    ILLEGAL = auto()
+
+
+class Token(Protocol):
+    """
+    Represents a single token emitted by the lexer and consumed by the parser
+    """
+
+    token_type: TokenType
+
+
+class Tokenizer(Protocol):
+    """
+    The interface required of the lexer that is consumed by the parser
+    """
+
+    def next_token(self) -> Token:
+        ...
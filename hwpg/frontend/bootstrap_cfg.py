@@ -0,0 +1,102 @@
+"""
+Configuration for the self-hosted front end. The parser in 'bootstrap' is
+generated by hwpg itself from the grammar format's own grammar (run from the
+repository root):
+
+    python hwpg.py -c hwpg/frontend/bootstrap_cfg.py -o hwpg/frontend/bootstrap
+        examples/hwpg.hwpg
+
+The actions build the AST directly, so no parse tree is ever created
+"""
+
+from typing import Tuple
+
+_IMPORTS = """from typing import Union
+
+from hwpg.ast import (
+    AltParts,
+    Grammar,
+    make_grammar,
+    make_optional,
+    make_rule,
+    make_rule_body,
+    make_rule_part,
+    make_token_rule,
+    Node,
+    Rule,
+    TokenRule,
+)
+"""
+
+_GRAMMAR = """        entries = [*grammar_inner1_list, entry] if entry else grammar_inner1_list
+        return make_grammar(entries)"""
+_GRAMMAR_INNER1 = "        return entry"
+_RULE = "        return make_rule(rule_name, rule_body, decorator_list)"
+_DECORATOR = "        return rule_name"
+_RULE_BODY = (
+    "        return make_rule_body([(binding, rule_part_list), *rule_body_inner1_list])"
+)
+_RULE_BODY_INNER1 = "        return binding, rule_part_list"
+_BINDING = "        return rule_name"
+_RULE_PART_INNER1 = "        return make_rule_part(rule_elem, suffix)"
+_RULE_PART_INNER2 = "        return make_optional(rule_body)"
+_RULE_ELEM_INNER1 = "        return rule_body"
+_TOKEN_RULE = "        return make_token_rule(token_name, token_lit)"
+
+
+class HwpgParserActions:
+    def import_code(self) -> str:
+        return _IMPORTS
+
+    def init_code(self) -> str:
+        return ""
+
+    def grammar(self) -> Tuple[str, str]:
+        return _GRAMMAR, "Grammar"
+
+    def grammar_inner1(self) -> Tuple[str, str]:
+        return _GRAMMAR_INNER1, "Union[Rule, TokenRule]"
+
+    def entry(self) -> Tuple[str, str]:
+        return "", "Union[Rule, TokenRule]"
+
+    def rule(self) -> Tuple[str, str]:
+        return _RULE, "Rule"
+
+    def decorator(self) -> Tuple[str, str]:
+        return _DECORATOR, "Token"
+
+    def rule_body(self) -> Tuple[str, str]:
+        return _RULE_BODY, "Node"
+
+    def rule_body_inner1(self) -> Tuple[str, str]:
+        return _RULE_BODY_INNER1, "AltParts"
+
+    def binding(self) -> Tuple[str, str]:
+        return _BINDING, "Token"
+
+    def rule_part(self) -> Tuple[str, str]:
+        return "", "Node"
+
+    def rule_part_inner1(self) -> Tuple[str, str]:
+        return _RULE_PART_INNER1, "Node"
+
+    def rule_part_inner2(self) -> Tuple[str, str]:
+        return _RULE_PART_INNER2, "Node"
+
+    def rule_elem(self) -> Tuple[str, str]:
+        return "", "Union[Node, Token]"
+
+    def rule_elem_inner1(self) -> Tuple[str, str]:
+        return _RULE_ELEM_INNER1, "Node"
+
+    def suffix(self) -> Tuple[str, str]:
+        return "", "Token"
+
+    def token_rule(self) -> Tuple[str, str]:
+        return _TOKEN_RULE, "TokenRule"
+
+
+parser_actions = HwpgParserActions()
+make_parse_tree = False
+memoize = False
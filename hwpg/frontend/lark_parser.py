@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from typing import Any, List, Optional, Union
+
+import lark
+from lark import Lark, Token, Transformer_NonRecursive
+
+from hwpg.ast import (
+    AltParts,
+    Grammar,
+    make_grammar,
+    make_optional,
+    make_rule,
+    make_rule_body,
+    make_rule_part,
+    make_token_rule,
+    Node,
+    Rule,
+    TokenRule,
+)
+from hwpg.timings import measure, Timings
+
+# Found next to the package, rather than in the current directory
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_PARSER = os.path.join(_ROOT, "hwpg.lark")
+_CACHE_DIR_ENV = "HWPG_CACHE_DIR"
+
+
+def _meta_parser_cache(grammar: str) -> Optional[str]:
+    # The LALR tables only depend on our grammar and the Lark version, so key the
+    # cache file on both. Editing either one yields a new file and a fresh build
+    data = f"{lark.__version__}\n{grammar}".encode("utf8")
+    key = hashlib.sha256(data).hexdigest()[:16]
+    cache_dir = os.environ.get(_CACHE_DIR_ENV) or tempfile.gettempdir()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+
+    return os.path.join(cache_dir, f".hwpg_meta_{key}.cache")
+
+
+def _build_meta_parser(grammar: str, cache: Union[str, bool]) -> Lark:
+    return Lark(
+        grammar,
+        start="grammar",
+        debug=True,
+        parser="lalr",
+        lexer="standard",
+        cache=cache,
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_meta_parser() -> Lark:
+    # Read our grammar
+    with open(_PARSER, "r") as f:
+        grammar = f.read()
+
+    # Lark serializes the parser tables to the cache file on first use and loads
+    # them on subsequent runs (it also verifies its own hash of the grammar)
+    cache = _meta_parser_cache(grammar)
+    if cache:
+        try:
+            return _build_meta_parser(grammar, cache)
+        except OSError:
+            # The cache is only there to save time, so do without it
+            pass
+
+    return _build_meta_parser(grammar, False)
+
+
+class ToAST(Transformer_NonRecursive):
+    def RULE_NAME(self, token: Token) -> Token:
+        return token
+
+    def TOKEN_NAME(self, token: Token) -> Token:
+        return token
+
+    def TOKEN_LIT(self, token: Token) -> Token:
+        return token
+
+    def grammar(self, rules: List[Union[Rule, TokenRule]]) -> Grammar:
+        return make_grammar(rules)
+
+    def entry(self, args: List[Union[Rule, TokenRule]]) -> Union[Rule, TokenRule]:
+        return args[0]
+
+    def token_rule(self, args: List[Any]) -> TokenRule:
+        return make_token_rule(args[0], args[1])
+
+    def rule(self, args: List[Any]) -> Rule:
+        # Any decorators come first
+        return make_rule(args[-2], args[-1], args[:-2])
+
+    def decorator(self, args: List[Token]) -> Token:
+        return args[0]
+
+    def rule_body(self, parts: List[Node]) -> Node:
+        alts: List[AltParts] = []
+        rules: List[Node] = []
+        binding: Optional[Token] = None
+
+        for part in parts:
+            # If we find a binding then we are done with this part
+            if isinstance(part, List):
+                binding = part[0]
+                continue
+
+            # When we hit a pipe in the stream, end current alternative
+            if isinstance(part, Token) and "|" in part.value:
+                alts.append((binding, rules))
+                binding = None
+                rules = []
+                continue
+
+            rules.append(part)
+
+        alts.append((binding, rules))
+        return make_rule_body(alts)
+
+    def binding(self, args: List[Token]) -> List[Token]:
+        return args
+
+    def rule_part(self, args: List[Any]) -> Node:
+        rule_len = len(args)
+
+        # Has no suffix, nor in square brackets
+        if rule_len == 1:
+            return make_rule_part(args[0], None)
+        elif rule_len == 2:
+            return make_rule_part(*args)
+        # rule body in between square brackets
+        elif rule_len == 3:
+            return make_optional(args[1])
+
+        raise AssertionError(f"Invalid rule length {rule_len}")
+
+
+def parse_grammar(src: str, timings: Optional[Timings] = None) -> Grammar:
+    """Parses the given grammar source with Lark and transforms it into an AST"""
+    # NOTE: We don't need the parse tree, but passing current transformer
+    # directly into parser yields an exception - no big deal, keep as is for now
+    with measure(timings, "lark parse"):
+        tree = _load_meta_parser().parse(src)
+
+    with measure(timings, "to ast"):
+        return ToAST().transform(tree)
@@ -0,0 +1,102 @@
+import re
+from typing import Iterator
+
+from hwpg.frontend.bootstrap.tokens import TokenType
+
+# Mirrors the terminals in hwpg.lark so both front ends agree on what a grammar
+# file contains. Newlines swallow any indentation that follows them and
+# comments swallow trailing whitespace (including newlines)
+_TOKENS = re.compile(
+    r"""
+    (?P<NL>(?:\r?\n)+\s*)
+    | (?P<WS>[ \t\f]+)
+    | (?P<COMMENT>\#[^\r\n]*\s*)
+    | (?P<TOKEN_LIT>["'].*?["'])
+    | (?P<TOKEN_NAME>[A-Z][A-Z0-9_]*)
+    | (?P<RULE_NAME>[a-z][a-z0-9_]*)
+    | (?P<COLON>:)
+    | (?P<PIPE>\|)
+    | (?P<EQUALS>=)
+    | (?P<LBRACKET>\[)
+    | (?P<RBRACKET>\])
+    | (?P<LPAREN>\()
+    | (?P<RPAREN>\))
+    | (?P<PLUS>\+)
+    | (?P<STAR>\*)
+    | (?P<QUEST_MARK>\?)
+    | (?P<AT>@)
+    | (?P<TILDE>~)
+    """,
+    re.VERBOSE,
+)
+
+_SKIP = {"WS", "COMMENT"}
+
+
+class Token(str):
+    """
+    A token from a grammar file. Like a Lark token, it is a string that also
+    carries its type (via 'type' and 'token_type') and position
+    """
+
+    token_type: TokenType
+    line: int
+    column: int
+
+    def __new__(cls, token_type: TokenType, value: str, line: int, column: int):
+        tok = super().__new__(cls, value)
+        tok.token_type = token_type
+        tok.line = line
+        tok.column = column
+        return tok
+
+    @property
+    def type(self) -> str:
+        return self.token_type.name
+
+    @property
+    def value(self) -> str:
+        return str(self)
+
+
+def _tokenize(src: str) -> Iterator[Token]:
+    pos, line, line_start = 0, 1, 0
+    src_len = len(src)
+
+    while pos < src_len:
+        match = _TOKENS.match(src, pos)
+        column = pos - line_start + 1
+
+        if not match:
+            yield Token(TokenType.ILLEGAL, src[pos], line, column)
+            pos += 1
+            continue
+
+        kind, value = match.lastgroup, match.group()
+        if kind not in _SKIP:
+            yield Token(TokenType[kind], value, line, column)  # type: ignore
+
+        newlines = value.count("\n")
+        if newlines:
+            line += newlines
+            line_start = pos + value.rindex("\n") + 1
+        pos = match.end()
+
+    yield Token(TokenType.EOF, "", line, pos - line_start + 1)
+
+
+class Lexer:
+    """Tokenizer for .hwpg grammar files, as consumed by the bootstrap parser"""
+
+    def __init__(self, src: str):
+        self._tokens = _tokenize(src)
+        self._eof: Token
+
+    def next_token(self) -> Token:
+        # Keep handing out EOF once input is exhausted
+        try:
+            self._eof = next(self._tokens)
+        except StopIteration:
+            pass
+
+        return self._eof
@@ -0,0 +1,82 @@
+import glob
+import os
+
+import pytest
+from lark.exceptions import UnexpectedInput
+
+from hwpg.frontend import _parse_self_hosted, parse_grammar
+from hwpg.frontend import lark_parser
+
+_GRAMMARS = sorted(glob.glob("examples/**/*.hwpg", recursive=True))
+
+_BINDINGS = """list: '[' [elems = value (elems2 = ',' value)*] ']'
+call: a = x y | b = (z = q)+ | [IDENT '='] r?
+
+LBRACKET: '['
+RBRACKET: ']'
+"""
+
+
+def _check_same(src: str):
+    grammar = _parse_self_hosted(src)
+
+    assert grammar is not None, "Self-hosted front end rejected the grammar"
+    assert grammar == lark_parser.parse_grammar(src), "Front ends disagree"
+
+
+@pytest.mark.parametrize("filename", _GRAMMARS)
+def test_front_ends_agree(filename: str):
+    with open(filename, "r") as f:
+        _check_same(f.read())
+
+
+def test_front_ends_agree_on_bindings():
+    _check_same(_BINDINGS)
+
+
+def test_invalid_grammar_falls_back_to_lark():
+    with pytest.raises(UnexpectedInput):
+        parse_grammar("rule: a = = b\n")
+
+
+def test_meta_parser_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("HWPG_CACHE_DIR", str(tmp_path))
+    lark_parser._load_meta_parser.cache_clear()
+
+    # Built once per process, with its tables saved for the next one
+    parser = lark_parser._load_meta_parser()
+    assert lark_parser._load_meta_parser() is parser
+    with open(lark_parser._PARSER, "r") as f:
+        grammar = f.read()
+    cache = lark_parser._meta_parser_cache(grammar)
+    assert os.path.dirname(cache) == str(tmp_path) and os.path.exists(cache)
+
+    # Changing the grammar rebuilds the tables in a file of their own
+    assert lark_parser._meta_parser_cache(grammar + "\n") != cache
+    lark_parser._load_meta_parser.cache_clear()
+
+
+@pytest.mark.parametrize("unusable", ["missing", "taken"])
+def test_meta_parser_without_cache(tmp_path, monkeypatch, unusable: str):
+    # The cache directory can't be made (under a file), or the cache file can't
+    # be written (a directory is in its way)
+    with open(lark_parser._PARSER, "r") as f:
+        grammar = f.read()
+    if unusable == "missing":
+        (tmp_path / "file").write_text("")
+        monkeypatch.setenv("HWPG_CACHE_DIR", str(tmp_path / "file" / "cache"))
+        assert lark_parser._meta_parser_cache(grammar) is None
+    else:
+        monkeypatch.setenv("HWPG_CACHE_DIR", str(tmp_path))
+        cache = lark_parser._meta_parser_cache(grammar)
+        assert cache
+        os.mkdir(cache)
+    lark_parser._load_meta_parser.cache_clear()
+
+    # The parser is built all the same, and still reports errors
+    try:
+        assert lark_parser._load_meta_parser()
+        with pytest.raises(UnexpectedInput):
+            parse_grammar("rule: a = = b\n")
+    finally:
+        lark_parser._load_meta_parser.cache_clear()
@@ -1,6 +1,6 @@
-from typing import Any, Dict, List, Protocol, Tuple
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from hwpg.templates import file_environment
 
 
 class TokensCodeGen(Protocol):
@@ -13,9 +13,14 @@ class TokensCodeGen(Protocol):
 
 
 class Jinja2TokensCodeGen:
-    def __init__(self, make_parse_tree: bool, templates: str, filename: str):
-        loader = FileSystemLoader(templates)
-        self._env = Environment(loader=loader, undefined=StrictUndefined)
+    def __init__(
+        self,
+        make_parse_tree: bool,
+        templates: str,
+        filename: str,
+        cache_dir: Optional[str] = None,
+    ):
+        self._env = file_environment(templates, cache_dir)
         self._main_templ = self._env.get_template(filename)
         self._vars: Dict[str, Any] = {"make_parse_tree": make_parse_tree}
 
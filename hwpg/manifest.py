@@ -0,0 +1,168 @@
+from __future__ import annotations
+import hashlib
+import inspect
+import json
+import os
+from dataclasses import fields
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from hwpg.ast import (
+    Alternatives,
+    Cut,
+    MultipartBody,
+    Node,
+    Rule,
+    RuleRef,
+    TokenLit,
+    TokenRef,
+    ZeroOrOne,
+)
+
+if TYPE_CHECKING:
+    from hwpg.config import Config
+
+MANIFEST_FILENAME = ".hwpg-manifest.json"
+
+# Bump whenever the layout of the manifest itself changes
+_VERSION = 2
+
+
+def make_hash(*parts: str) -> str:
+    data = hashlib.sha256()
+    for part in parts:
+        data.update(part.encode("utf8"))
+        data.update(b"\0")
+
+    return data.hexdigest()
+
+
+def fingerprint(cfg: Config, config_src: str, codegen: object) -> str:
+    """
+    Hashes everything besides the rules themselves that shapes the generated
+    functions: the settings, the config source (for the actions) and the
+    generator code
+    """
+    settings = [
+        f"{field.name}={getattr(cfg, field.name)!r}"
+        for field in fields(cfg)
+        if not field.name.endswith("_actions")
+    ]
+
+    # The modules of the codegen class and its bases hold the generator logic
+    # and the code snippet templates
+    filenames = {
+        inspect.getfile(cls) for cls in type(codegen).__mro__ if cls is not object
+    }
+
+    sources = []
+    for filename in sorted(filenames):
+        with open(filename, "r") as f:
+            sources.append(f.read())
+
+    return make_hash(*settings, config_src, *sources)
+
+
+def _rule_parts(rule: Rule, token_names: List[str]) -> Iterator[str]:
+    # Covers the whole processed rule: names, bindings and structure, plus the
+    # analysis results (which also depend on other rules). Rules can nest very
+    # deeply, so it walks them with a stack instead of recursion
+    yield rule.name
+    yield " ".join(rule.decorators)
+    yield rule.left_rec.name
+    stack: List[Node] = [rule.node]
+
+    while stack:
+        node = stack.pop()
+        yield type(node).__name__
+        yield node.binding or ""
+        yield str(node.nullable)
+        yield str(node.predictive)
+        yield str(node.memo)
+        yield str(node.inline)
+        if node.first is not None:
+            yield ",".join(f"{id}:{token_names[id]}" for id in sorted(node.first))
+
+        if isinstance(node, (Alternatives, MultipartBody)):
+            yield str(len(node.nodes))
+            if isinstance(node, Alternatives):
+                yield str(node.prefix)
+            stack.extend(reversed(node.nodes))
+        elif isinstance(node, RuleRef):
+            yield node.name
+        elif isinstance(node, TokenRef):
+            yield node.name
+            yield node.replaced_lit or ""
+        elif isinstance(node, TokenLit):
+            yield node.literal
+        elif not isinstance(node, Cut):
+            if isinstance(node, ZeroOrOne):
+                yield str(node.brackets)
+            stack.append(node.node)  # type: ignore
+
+
+def rule_hash(rule: Rule, token_names: List[str]) -> str:
+    return make_hash(*_rule_parts(rule, token_names))
+
+
+class Manifest:
+    """
+    Record of the code generated for each rule, stored next to the generated
+    files. Its fingerprint covers everything other than the rule itself that
+    shapes the code (configuration, actions, generator), so when it matches,
+    any rule whose hash is unchanged can reuse its previously generated code
+    """
+
+    def __init__(self, fingerprint: str, rules: Optional[Dict[str, Any]] = None):
+        self.fingerprint = fingerprint
+        self._rules: Dict[str, Any] = rules or {}
+        self._used: Dict[str, Any] = {}
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> Manifest:
+        """Loads the manifest from the given directory (or starts a new one)"""
+        try:
+            with open(os.path.join(path, MANIFEST_FILENAME), "r") as f:
+                return cls.loads(f.read(), fingerprint)
+        except OSError:
+            return cls(fingerprint)
+
+    @classmethod
+    def loads(cls, src: str, fingerprint: str) -> Manifest:
+        try:
+            data = json.loads(src)
+        except ValueError:
+            return cls(fingerprint)
+
+        # Code generated under different settings can't be reused
+        if data.get("version") != _VERSION or data.get("fingerprint") != fingerprint:
+            return cls(fingerprint)
+
+        return cls(fingerprint, data.get("rules"))
+
+    def lookup(
+        self, name: str, key: str
+    ) -> Optional[Tuple[List[str], List[Tuple[str, str]]]]:
+        """
+        Returns the functions previously generated for this rule, along with
+        the node classes they make (each one's name and code), if unchanged
+        """
+        entry = self._rules.get(name)
+        if not entry or entry["hash"] != key:
+            return None
+
+        self._used[name] = entry
+        return entry["funcs"], entry["classes"]
+
+    def store(
+        self, name: str, key: str, funcs: List[str], classes: List[Tuple[str, str]]
+    ):
+        self._used[name] = {"hash": key, "funcs": funcs, "classes": classes}
+
+    def dumps(self) -> str:
+        """
+        Serializes only the rules looked up or stored since loading, so rules
+        no longer in the grammar are dropped
+        """
+        data = {"version": _VERSION, "fingerprint": self.fingerprint}
+        data["rules"] = self._used
+        return json.dumps(data)
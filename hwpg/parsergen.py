@@ -1,14 +1,21 @@
 from __future__ import annotations
+import textwrap
 from abc import ABC, abstractmethod
 from enum import auto, Enum
-from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple, TYPE_CHECKING
+from time import perf_counter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Protocol, Sequence
+from typing import Set, Tuple, TYPE_CHECKING
 
-from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+from jinja2 import Template
 
+from hwpg.analysis import post_order, rest_first, split_loop
 from hwpg.ast import (
     Alternatives,
+    Cut,
     Grammar,
+    LeftRec,
     MultipartBody,
+    NO_ID,
     Node,
     OneOrMore,
     Rule,
@@ -18,11 +25,32 @@ from hwpg.ast import (
     ZeroOrMore,
     ZeroOrOne,
 )
+from hwpg.manifest import make_hash, rule_hash
+from hwpg.templates import compile_snippet, file_environment
+from hwpg.timings import measure, Timings
+from hwpg.trampoline import run, Step
 
 TemplData = Dict[str, Any]
 
+# Tokens a node can start with: each one's name and ID
+TokenSet = List[Tuple[str, int]]
+
+# Arguments a function is generated to take: each one's name and type
+FuncArgs = Sequence[Tuple[str, str]]
+
+
+class Memo(Enum):
+    """How a generated function is memoized"""
+
+    OFF = auto()
+    ON = auto()
+    # Grows a left recursive result from a failing seed planted in the memo
+    LEFT_REC = auto()
+
+
 if TYPE_CHECKING:
     from hwpg.config import Config
+    from hwpg.manifest import Manifest
 
 
 class ParserActions(Protocol):
@@ -42,6 +70,8 @@ class ParserFuncCodeGen(Protocol):
     comment: str
     ret_type: str
     early_ret: bool
+    # The classes of the nodes the function makes: each one's name and code
+    classes: List[Tuple[str, str]]
 
     def generate(self) -> str:
         ...
@@ -58,16 +88,63 @@ class ParserFuncCodeGen(Protocol):
     def match_token_one_or_more(self, name: str, comment: str):
         ...
 
+    def match_token_set(
+        self, name: str, tokens: TokenSet, match: Match, comment: str
+    ):
+        ...
+
     def parse_rule(self, name: str, comment: str):
         ...
 
-    def parse_rule_zero_or_one(self, name: str, comment: str):
+    def parse_rule_zero_or_one(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ):
         ...
 
-    def parse_rule_zero_or_more(self, name: str, comment: str):
+    def parse_rule_zero_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ):
         ...
 
-    def parse_rule_one_or_more(self, name: str, comment: str):
+    def parse_rule_one_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ):
+        ...
+
+    def start_guard(self, tokens: TokenSet):
+        ...
+
+    def end_guard(self):
+        ...
+
+    def start_inline(
+        self,
+        name: str,
+        comment: str,
+        body: str,
+        match: Match,
+        tokens: Optional[TokenSet],
+    ) -> bool:
+        ...
+
+    def end_inline(self):
+        ...
+
+    def end_prefix(self, restore: bool) -> FuncArgs:
+        ...
+
+    def parse_rest(self, name: str, comment: str, restore: bool):
+        ...
+
+    def return_prefix(self, comment: str):
+        ...
+
+    def cut(self, comment: str):
+        ...
+
+    def grow_left_rec(
+        self, seed: str, seed_comment: str, tails: List[str], comment: str
+    ):
         ...
 
 
@@ -85,10 +162,35 @@ class ParserCodeGen(Protocol):
     def parser_filename(self) -> str:
         ...
 
-    def start_func(self, name: str, early_ret: bool, comment: str) -> ParserFuncCodeGen:
+    def start_func(
+        self,
+        name: str,
+        rule: str,
+        early_ret: bool,
+        predictive: bool,
+        memo: Memo,
+        comment: str,
+        left: str = "",
+        args: FuncArgs = (),
+    ) -> ParserFuncCodeGen:
+        ...
+
+    def end_func(self, codegen: ParserFuncCodeGen) -> str:
         ...
 
-    def end_func(self, codegen: ParserFuncCodeGen):
+    def add_func(self, func: str):
+        ...
+
+    def add_class(self, name: str, code: str):
+        ...
+
+    def use_memo(self):
+        ...
+
+    def use_left_rec(self):
+        ...
+
+    def use_cut(self):
         ...
 
 
@@ -96,64 +198,176 @@ class Jinja2ParserFuncCodeGen(ABC):
     """Base class for parser function code generator subclasses"""
 
     _default_action: Tuple[str, str]
+    # The action of a parser calling a handler instead of making a tree: it
+    # only tells the caller the function matched
+    _matched_action: Tuple[str, str]
     _func_start_templ: str
     _early_ret_templ: str
     _match_token_templ: str
     _match_token_zero_or_one_templ: str
     _match_token_zero_or_more_templ: str
     _match_token_one_or_more_templ: str
+    _match_token_set_templ: str
     _parse_rule_templ: str
     _parse_rule_zero_or_one_templ: str
     _parse_rule_zero_or_more_templ: str
     _parse_rule_one_or_more_templ: str
+    _predict_rule_zero_or_one_templ: str
+    _predict_rule_zero_or_more_templ: str
+    _predict_rule_one_or_more_templ: str
+    _guard_templ: str
+    _inline_start_templ: str
+    _inline_end_templ: str
+    _end_prefix_templ: str
+    _parse_rest_templ: str
+    _return_prefix_templ: str
+    _cut_templ: str
+    _grow_left_rec_templ: str
+
+    # Compiled templates, keyed by source. Each subclass gets its own registry,
+    # shared by every function it generates
+    _templates: Dict[str, Template]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._templates = {}
 
     def __init__(
         self,
         name: str,
         attr_name: str,
+        rule: str,
         early_ret: bool,
+        predictive: bool,
+        memo: Memo,
+        hold_tokens: bool,
         make_parse_tree: bool,
+        node_classes: bool,
+        events: bool,
         comment: str,
         actions: Optional[ParserActions],
+        left: str,
+        args: FuncArgs,
     ):
         self.name = name
+        # The rule the function is generated for (its sub functions are named
+        # after it)
+        self.rule = rule
         self.early_ret = early_ret
+        # A predictive function never backtracks: once it fails it leaves the
+        # position where it is, so the caller has to restore it if need be
+        self.predictive = predictive
+        self.memo = memo
+        # Whether a parser releasing tokens has to hold on to those from where
+        # the function starts, as it may go back there
+        self.hold_tokens = hold_tokens
         self.comment = comment
         self._actions = actions
         self._make_parse_tree = make_parse_tree
+        self._node_classes = node_classes
+        # Whether the parser calls a handler as it goes, so the rule functions
+        # (which make its events) are never parsed in place
+        self.events = events
+        self._default = (
+            self._matched_action
+            if events and not make_parse_tree
+            else self._default_action
+        )
         self._action, self.ret_type = self._func_actions(attr_name)
+        self.classes: List[Tuple[str, str]] = []
 
+        # The names in order, plus the last suffix used for each base name, so
+        # picking a free name doesn't rescan the names already taken
         self._vars: List[str] = []
+        # The name of the field each var is kept in, by a node of its own class
+        self._fields: List[str] = []
+        self._var_set: Set[str] = set()
+        self._var_suffixes: Dict[str, int] = {}
+        # The type of each var, for passing it on to another function
+        self._types: Dict[str, str] = {}
         self._func_parts: List[str] = []
 
+        # Code inside a guard is indented one more level
+        self._indent = ""
+        self._token_var: Optional[str] = None
+        self._pos_var: Optional[str] = None
+        # Whether a failed alternative has put the position back where the
+        # function started (where the others leave it when they fail), so it
+        # needn't be put back again at the end
+        self._restored = False
+        # Whether the function has returned its result itself (as a left
+        # recursive loop does), so it has no end
+        self._ended = False
+        # For each body being parsed in place: how it is matched, the prefix
+        # of its var names, its vars and their fields, and the data it started
+        # with
+        self._inlines: List[Tuple[Match, str, List[str], List[str], TemplData]] = []
+        # The vars of the parts shared by factored alternatives, once parsed
+        self._prefix: FuncArgs = []
+
+        # The result of the left recursive rule this function continues, passed
+        # in by the loop parsing the rule
+        self.left_type = self._func_actions(left)[1] if left else ""
+        self.left = self._new_var(left, self.left_type) if left else ""
+        # The results of the parts shared with other alternatives, passed in by
+        # the function that parsed them (see 'end_prefix'). They are the first
+        # vars, named as they would be had this function parsed them itself
+        self.args = [(self._new_var(arg, type_), type_) for arg, type_ in args]
+
         vars = self._start_func()
         self._render_templ(self._func_start_templ, vars)
 
     def _func_actions(self, name: str) -> Tuple[str, str]:
         if not self._actions:
-            return self._default_action
+            return self._default
 
         try:
             func = getattr(self._actions, name)
         except AttributeError:
-            if not self._make_parse_tree:
+            if not self._make_parse_tree and not self.events:
                 raise RuntimeError(f"Parser actions missing function '{name}'")
 
-            return self._default_action
+            return self._default
 
         return func()
 
-    def _new_var(self, name: str) -> str:
-        new_name = name
-        idx = 1
+    def _new_var(self, name: str, type_: str, field: str = "") -> str:
+        # The vars of a body parsed in place make up its own result, so they are
+        # prefixed to keep clear of the names the function's action expects
+        if self._inlines:
+            _, prefix, vars, fields, _ = self._inlines[-1]
+            new_name = self._new_name(f"{prefix}_{name}")
+            vars.append(new_name)
+        else:
+            new_name = self._new_name(name)
+            vars, fields = self._vars, self._fields
+            vars.append(new_name)
+
+        fields.append(field or name)
 
-        while new_name in self._vars:
+        self._types[new_name] = type_
+        return new_name
+
+    def _new_name(self, name: str) -> str:
+        # A name not used by any var in this function (but not itself a var)
+        idx = self._var_suffixes.get(name, 1)
+        new_name = name + str(idx) if idx > 1 else name
+
+        while new_name in self._var_set:
             idx += 1
             new_name = name + str(idx)
 
-        self._vars.append(new_name)
+        self._var_suffixes[name] = idx
+        self._var_set.add(new_name)
         return new_name
 
+    def _saved_pos_var(self) -> str:
+        # Holds the position before a call that may not restore it on failure
+        if not self._pos_var:
+            self._pos_var = self._new_name("pos")
+
+        return self._pos_var
+
     @abstractmethod
     def _start_func(self) -> TemplData:
         pass
@@ -162,6 +376,10 @@ class Jinja2ParserFuncCodeGen(ABC):
     def _end_func(self) -> TemplData:
         pass
 
+    @abstractmethod
+    def _end_func_early_ret(self) -> TemplData:
+        pass
+
     @abstractmethod
     def _match_token(self, name: str, comment: str) -> TemplData:
         pass
@@ -178,30 +396,97 @@ class Jinja2ParserFuncCodeGen(ABC):
     def _match_token_one_or_more(self, name: str, comment: str) -> TemplData:
         pass
 
+    @abstractmethod
+    def _match_token_set(
+        self, name: str, tokens: TokenSet, match: Match, comment: str
+    ) -> TemplData:
+        pass
+
     @abstractmethod
     def _parse_rule(self, name: str, comment: str) -> TemplData:
         pass
 
     @abstractmethod
-    def _parse_rule_zero_or_one(self, name: str, comment: str) -> TemplData:
+    def _parse_rule_zero_or_one(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _parse_rule_zero_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _parse_rule_one_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _guard(self, tokens: TokenSet, token_var: str, first: bool) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _start_inline(
+        self,
+        name: str,
+        comment: str,
+        body: str,
+        match: Match,
+        tokens: Optional[TokenSet],
+    ) -> Optional[TemplData]:
+        pass
+
+    @abstractmethod
+    def _end_inline(
+        self, match: Match, vars: List[str], fields: List[str], start: TemplData
+    ) -> TemplData:
         pass
 
     @abstractmethod
-    def _parse_rule_zero_or_more(self, name: str, comment: str) -> TemplData:
+    def _end_prefix(self, restore: bool) -> TemplData:
         pass
 
     @abstractmethod
-    def _parse_rule_one_or_more(self, name: str, comment: str) -> TemplData:
+    def _parse_rest(self, name: str, comment: str, restore: bool) -> TemplData:
         pass
 
+    @abstractmethod
+    def _return_prefix(self, comment: str) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _cut(self, comment: str) -> TemplData:
+        pass
+
+    @abstractmethod
+    def _grow_left_rec(
+        self, seed: str, seed_comment: str, tails: List[str], comment: str
+    ) -> TemplData:
+        pass
+
+    @classmethod
+    def _compile_templ(cls, templ_str: str) -> Template:
+        templ = cls._templates.get(templ_str)
+        if not templ:
+            templ = compile_snippet(templ_str)
+            cls._templates[templ_str] = templ
+
+        return templ
+
     def _render_templ(self, templ_str: str, vars: Dict[str, Any]):
-        templ = Template(templ_str)
-        self._func_parts.append(templ.render(**vars))
+        templ = self._compile_templ(templ_str)
+        code = templ.render(**vars)
+        self._func_parts.append(
+            textwrap.indent(code, self._indent) if self._indent else code
+        )
 
     def generate(self) -> str:
-        if self.early_ret:
-            self._func_parts.append(self._early_ret_templ)
-        else:
+        if not self._ended and self.early_ret:
+            self._render_templ(self._early_ret_templ, self._end_func_early_ret())
+        elif not self._ended:
             templ, vars = self._action, self._end_func()
             self._render_templ(templ, vars)
 
@@ -223,45 +508,224 @@ class Jinja2ParserFuncCodeGen(ABC):
         vars = self._match_token_one_or_more(name, comment)
         self._render_templ(self._match_token_one_or_more_templ, vars)
 
+    def match_token_set(
+        self, name: str, tokens: TokenSet, match: Match, comment: str
+    ):
+        """
+        Matches any one of the given tokens (or, repeated, a run of them) with a
+        single test of the current token. It takes the place of the function
+        of the given name (its alternatives), or of alternatives of this
+        function when no name is given
+        """
+        vars = self._match_token_set(name, tokens, match, comment)
+        self._render_templ(self._match_token_set_templ, vars)
+
     def parse_rule(self, name: str, comment: str):
         vars = self._parse_rule(name, comment)
         self._render_templ(self._parse_rule_templ, vars)
 
-    def parse_rule_zero_or_one(self, name: str, comment: str):
-        vars = self._parse_rule_zero_or_one(name, comment)
-        self._render_templ(self._parse_rule_zero_or_one_templ, vars)
+    def parse_rule_zero_or_one(
+        self,
+        name: str,
+        comment: str,
+        tokens: Optional[TokenSet] = None,
+        restore: bool = False,
+    ):
+        vars = self._parse_rule_zero_or_one(name, comment, tokens, restore)
+        if self.early_ret and restore:
+            self._restored = True
+        templ = (
+            self._predict_rule_zero_or_one_templ
+            if tokens
+            else self._parse_rule_zero_or_one_templ
+        )
+        self._render_templ(templ, vars)
+
+    def parse_rule_zero_or_more(
+        self,
+        name: str,
+        comment: str,
+        tokens: Optional[TokenSet] = None,
+        restore: bool = False,
+    ):
+        vars = self._parse_rule_zero_or_more(name, comment, tokens, restore)
+        templ = (
+            self._predict_rule_zero_or_more_templ
+            if tokens
+            else self._parse_rule_zero_or_more_templ
+        )
+        self._render_templ(templ, vars)
+
+    def parse_rule_one_or_more(
+        self,
+        name: str,
+        comment: str,
+        tokens: Optional[TokenSet] = None,
+        restore: bool = False,
+    ):
+        vars = self._parse_rule_one_or_more(name, comment, tokens, restore)
+        templ = (
+            self._predict_rule_one_or_more_templ
+            if tokens
+            else self._parse_rule_one_or_more_templ
+        )
+        self._render_templ(templ, vars)
 
-    def parse_rule_zero_or_more(self, name: str, comment: str):
-        vars = self._parse_rule_zero_or_more(name, comment)
-        self._render_templ(self._parse_rule_zero_or_more_templ, vars)
+    def start_guard(self, tokens: TokenSet):
+        """
+        Only runs the code that follows (until 'end_guard') when the current
+        token, as of the first guard in the function, is one of the given ones
+        """
+        first = not self._token_var
+        if not self._token_var:
+            self._token_var = self._new_name("tt")
 
-    def parse_rule_one_or_more(self, name: str, comment: str):
-        vars = self._parse_rule_one_or_more(name, comment)
-        self._render_templ(self._parse_rule_one_or_more_templ, vars)
+        vars = self._guard(tokens, self._token_var, first)
+        self._render_templ(self._guard_templ, vars)
+        self._indent += "    "
+
+    def end_guard(self):
+        self._indent = self._indent[:-4]
+
+    def start_inline(
+        self,
+        name: str,
+        comment: str,
+        body: str,
+        match: Match,
+        tokens: Optional[TokenSet],
+    ) -> bool:
+        """
+        Parses the body of the given function (as commented in the function)
+        in place of a call to it, with the code that follows (until
+        'end_inline') parsing its parts. That takes a function whose result
+        comes from the default action: for any other, it generates nothing and
+        returns False
+        """
+        start = self._start_inline(name, comment, body, match, tokens)
+        if start is None:
+            return False
+
+        self._render_templ(self._inline_start_templ, start)
+        # An optional or repeated body goes inside an 'if' or a loop
+        if match != Match.ONCE:
+            self._indent += "    "
+
+        self._inlines.append((match, start["prefix"], [], [], start))
+        return True
+
+    def end_inline(self):
+        match, _, vars, fields, start = self._inlines.pop()
+        end = self._end_inline(match, vars, fields, start)
+        self._render_templ(self._inline_end_templ, end)
+        if match != Match.ONCE:
+            self._indent = self._indent[:-4]
+
+    def end_prefix(self, restore: bool) -> FuncArgs:
+        """
+        Ends the parts shared by factored alternatives, which the function has
+        parsed so far without returning early. From here on it does, as each
+        alternative is tried in turn (see 'parse_rest'), and the position after
+        the shared parts is kept if it has to be restored between them. It
+        returns the vars of the shared parts, to be passed to each alternative
+        """
+        self._prefix = [(var, self._types[var]) for var in self._vars]
+        self._render_templ(self._end_prefix_templ, self._end_prefix(restore))
+        self.early_ret = True
+        return self._prefix
+
+    def parse_rest(self, name: str, comment: str, restore: bool):
+        vars = self._parse_rest(name, comment, restore)
+        self._render_templ(self._parse_rest_templ, vars)
+
+    def return_prefix(self, comment: str):
+        """
+        Returns the result of the one part shared by factored alternatives, for
+        the last alternative, which is just that part. This ends the function
+        """
+        vars = self._return_prefix(comment)
+        self._render_templ(self._return_prefix_templ, vars)
+        self._ended = True
+
+    def cut(self, comment: str):
+        """
+        Commits the parse to everything before the current position, dropping
+        the tokens and memo results the parser holds for it
+        """
+        vars = self._cut(comment)
+        self._render_templ(self._cut_templ, vars)
+
+    def grow_left_rec(
+        self, seed: str, seed_comment: str, tails: List[str], comment: str
+    ):
+        """
+        Parses a left recursive rule as a loop: the result of the seed function
+        is passed to the first of the tail functions continuing it, and so on
+        for as long as one does. This makes up the whole function
+        """
+        vars = self._grow_left_rec(seed, seed_comment, tails, comment)
+        self._render_templ(self._grow_left_rec_templ, vars)
+        self._ended = True
 
 
 class Jinja2ParserCodeGen:
     """Base class for parser code generator subclasses"""
 
     _parser_func_codegen: Callable[
-        [str, bool, bool, str, Optional[ParserActions]], ParserFuncCodeGen
+        [
+            str,
+            str,
+            bool,
+            bool,
+            Memo,
+            bool,
+            bool,
+            bool,
+            bool,
+            str,
+            Optional[ParserActions],
+            str,
+            FuncArgs,
+        ],
+        ParserFuncCodeGen,
     ]
     _templ_dir: str
     _parser_templ: str
 
     def __init__(self, name: str, cfg: Config):
-        loader = FileSystemLoader(type(self)._templ_dir)
-        self._env = Environment(loader=loader, undefined=StrictUndefined)
+        self._env = file_environment(type(self)._templ_dir, cfg.template_cache_dir)
         self._main_templ = self._env.get_template(type(self)._parser_templ)
         self._actions = cfg.parser_actions
+        self._memoize = cfg.memoize
+        self._stream_tokens = cfg.stream_tokens
+        self._node_classes = cfg.node_classes
+        self._events = cfg.events
         self.name = name
 
         self._vars: Dict[str, Any] = {
             "make_parse_tree": cfg.make_parse_tree,
-            "memoize": cfg.memoize,
+            "memo_window": cfg.memo_window,
+            "stream": cfg.stream_tokens,
+            "events": cfg.events,
+            # Set once a function is memoized
+            "memoize": False,
+            # Set once a function grows a left recursive result in the memo
+            "left_rec": False,
+            # Set once a function passes a cut
+            "cut": False,
             "name": self._name,
+            "import_code": self._actions_code("import_code"),
+            "init_code": self._actions_code("init_code"),
         }
         self._funcs: List[str] = []
+        # The node classes by name (a body parsed in place makes the same nodes
+        # as its function, so the class can come up more than once)
+        self._classes: Dict[str, str] = {}
+
+    def _actions_code(self, name: str) -> str:
+        # These are optional, so not every actions class implements them
+        func = getattr(self._actions, name, None)
+        return func().rstrip() if func else ""
 
     @classmethod
     def parser_filename(cls) -> str:
@@ -271,17 +735,69 @@ class Jinja2ParserCodeGen:
     def _name(self):
         return self.name
 
-    def start_func(self, name: str, early_ret: bool, comment: str) -> ParserFuncCodeGen:
+    def start_func(
+        self,
+        name: str,
+        rule: str,
+        early_ret: bool,
+        predictive: bool,
+        memo: Memo,
+        comment: str,
+        left: str = "",
+        args: FuncArgs = (),
+    ) -> ParserFuncCodeGen:
+        # Left recursion needs the memo, even when memoizing is turned off
+        if memo == Memo.ON and not self._memoize:
+            memo = Memo.OFF
+
         return type(self)._parser_func_codegen(
-            name, early_ret, self._vars["make_parse_tree"], comment, self._actions
+            name,
+            rule,
+            early_ret,
+            predictive,
+            memo,
+            # Only a backtracking function goes back to where it started
+            self._stream_tokens and not predictive,
+            self._vars["make_parse_tree"],
+            self._node_classes,
+            self._events,
+            comment,
+            self._actions,
+            left,
+            args,
         )
 
-    def end_func(self, codegen: ParserFuncCodeGen):
-        self._vars["ret_type"] = codegen.ret_type
-        self._funcs.append(codegen.generate())
+    def end_func(self, codegen: ParserFuncCodeGen) -> str:
+        func = codegen.generate()
+        self._funcs.append(func)
+        for name, code in codegen.classes:
+            self.add_class(name, code)
+
+        return func
+
+    def add_func(self, func: str):
+        # Previously generated function code
+        self._funcs.append(func)
+
+    def add_class(self, name: str, code: str):
+        # The first code for a class is kept: any other makes the same nodes
+        self._classes.setdefault(name, code)
+
+    def use_memo(self):
+        # Memoized functions need the memo helper (unless memoizing is off)
+        self._vars["memoize"] = self._memoize
+
+    def use_left_rec(self):
+        # Functions growing left recursive results need the memo helper
+        self._vars["left_rec"] = True
+
+    def use_cut(self):
+        # Cuts need the token buffer to drop the tokens before them
+        self._vars["cut"] = True
 
     def generate(self) -> str:
         self._vars["functions"] = self._funcs
+        self._vars["node_classes"] = list(self._classes.values())
         return self._main_templ.render(**self._vars)
 
 
@@ -300,16 +816,30 @@ class _ParserFuncGen:
         name: str,
         codegen: ParserCodeGen,
         debugs: List[str],
+        funcs: List[str],
+        classes: List[Tuple[str, str]],
+        rules: List[Rule],
+        token_names: List[str],
+        predict: bool,
         sub: int = 0,
         depth: int = 0,
     ):
         self._name = name
         self._codegen = codegen
         self._debugs = debugs
+        self._funcs = funcs
+        self._classes = classes
+        self._rules = rules
+        self._token_names = token_names
+        self._predict = predict
         self._next_sub = sub
         self._depth = depth
 
         self._func_codegen: ParserFuncCodeGen
+        self._predictive = False
+        # How many parts of a multipart body were parsed before the function was
+        # called (the left recursive result, or parts shared by alternatives)
+        self._skip = 0
         self._debug_pieces: List[str] = []
 
     def _debug(self, msg: str):
@@ -317,121 +847,408 @@ class _ParserFuncGen:
         self._debug_pieces.append(msg)
 
     def generate(
-        self, node: Node, comment: str, binding: Optional[str] = None
+        self, node: Node, comment: str, memo: Optional[Memo] = None
     ) -> Tuple[str, int]:
         """
-        Generates a new parser function. It returns a tuple of the generated
-        function string and the next sub #
+        Generates a new parser function, memoized as given (by default, as
+        analysis decided). It returns a tuple of the generated function string
+        and the next sub #
+        """
+        return run(self._generate(node, comment, memo))
+
+    def generate_loop(self, rule: Rule) -> Tuple[str, int]:
         """
+        Generates the function parsing a directly left recursive rule as a
+        loop, along with the functions for its seed and the tails continuing
+        it. It returns a tuple of the generated function string and the next
+        sub #
+        """
+        return run(self._generate_loop(rule))
+
+    def _start_func(
+        self,
+        node: Node,
+        comment: str,
+        memo: Optional[Memo],
+        left: str = "",
+        args: FuncArgs = (),
+        skip: int = 0,
+    ) -> str:
         # Figure out name for new function before starting function itself
-        binding = node.binding.value if node.binding else ""
+        binding = node.binding or ""
         func_name = self._codegen.make_func_name(self._name, binding, self._next_sub)
 
-        # Only a multipart body disallows early return
-        early_ret = not isinstance(node, MultipartBody)
-        self._func_codegen = self._codegen.start_func(func_name, early_ret, comment)
+        # Only a multipart body disallows early return (as do the shared parts
+        # of factored alternatives, until they are parsed)
+        early_ret = not isinstance(node, MultipartBody) and not (
+            isinstance(node, Alternatives) and node.prefix
+        )
+        self._predictive = self._predict and node.predictive
+        self._skip = skip
+
+        # A function taking the left recursive result (or the results of shared
+        # parts) can't be memoized by position alone
+        if memo is None:
+            memo = Memo.ON if node.memo and not left and not args else Memo.OFF
+
+        self._func_codegen = self._codegen.start_func(
+            func_name, self._name, early_ret, self._predictive, memo, comment, left, args
+        )
         func_name = self._func_codegen.name
         self._next_sub += 1
         self._debug_pieces = []
-        self._debug(f"Start func: {func_name}\n")
-
-        self._gen_node(node, node.comment, top_level=True)
+        predictive = " (predictive)" if self._predictive else ""
+        self._debug(f"Start func: {func_name}{predictive}\n")
+        return func_name
 
-        # End new function
+    def _end_func(self, func_name: str) -> Tuple[str, int]:
         self._debug(f"End func: {func_name}\n")
-        self._codegen.end_func(self._func_codegen)
+        self._funcs.append(self._codegen.end_func(self._func_codegen))
+        self._classes.extend(self._func_codegen.classes)
 
         # Store func str and debugs at the end so sub functions are added first
         self._debugs.append("".join(self._debug_pieces))
         return func_name, self._next_sub
 
+    def _generate(
+        self,
+        node: Node,
+        comment: str,
+        memo: Optional[Memo] = None,
+        left: str = "",
+        args: FuncArgs = (),
+        skip: int = 0,
+    ) -> Step:
+        func_name = self._start_func(node, comment, memo, left, args, skip)
+        yield self._gen_node(node, node.comment, top_level=True)
+        return self._end_func(func_name)
+
+    def _generate_loop(self, rule: Rule) -> Step:
+        func_name = self._start_func(rule.node, rule.comment, None)
+        tails, seeds = split_loop(rule)
+
+        # Each tail is a function taking the result so far, in place of its
+        # first part (the call to the rule itself)
+        tail_names = []
+        for tail in tails:
+            self._debug(f"Left recursive tail: {tail.comment}\n")
+            tail_name, self._next_sub = yield self._sub_func()._generate(
+                tail, tail.comment, left=rule.name, skip=1
+            )
+            tail_names.append(tail_name)
+
+        seed = seeds[0] if len(seeds) == 1 else Alternatives(None, seeds)
+        if isinstance(seed, RuleRef):
+            seed_name = self._codegen.make_func_name(seed.name)
+        else:
+            seed_name, self._next_sub = yield self._sub_func()._generate(
+                seed, seed.comment
+            )
+
+        self._debug(f"Left recursive seed: {seed_name}\n")
+        comment = " | ".join(tail.comment for tail in tails)
+        self._func_codegen.grow_left_rec(seed_name, seed.comment, tail_names, comment)
+        return self._end_func(func_name)
+
+    def _sub_func(self) -> _ParserFuncGen:
+        return _ParserFuncGen(
+            self._name,
+            self._codegen,
+            self._debugs,
+            self._funcs,
+            self._classes,
+            self._rules,
+            self._token_names,
+            self._predict,
+            self._next_sub,
+            self._depth + 1,
+        )
+
     def _gen_node(
         self,
         node: Node,
         comment: str,
         match: Match = Match.ONCE,
         top_level: bool = False,
-    ):
+        tokens: Optional[TokenSet] = None,
+    ) -> Step:
         type_ = type(node)
 
         if type_ is Alternatives:
-            if top_level:
-                self._gen_alternatives(node)  # type: ignore
+            if top_level and node.prefix:  # type: ignore
+                yield self._gen_factored(node)  # type: ignore
+            elif top_level:
+                yield self._gen_alternatives(node)  # type: ignore
             else:
                 # Always generate a sub-rule for nested alternative rules
-                self._gen_sub_rule_ref(node, match, comment)
+                yield self._gen_sub_rule_ref(node, match, comment, tokens)
         elif type_ is MultipartBody:
             if top_level:
-                self._gen_multipart_body(node)  # type: ignore
+                yield self._gen_multipart_body(node)  # type: ignore
             else:
                 # Always generate a sub-rule for nested multipart rules
-                self._gen_sub_rule_ref(node, match, comment)
+                yield self._gen_sub_rule_ref(node, match, comment, tokens)
         elif type_ is ZeroOrMore:
-            self._gen_zero_or_more(node)  # type: ignore
+            yield self._gen_zero_or_more(node)  # type: ignore
         elif type_ is OneOrMore:
-            self._gen_one_or_more(node)  # type: ignore
+            yield self._gen_one_or_more(node)  # type: ignore
         elif type_ is ZeroOrOne:
-            self._gen_zero_or_one(node)  # type: ignore
+            yield self._gen_zero_or_one(node)  # type: ignore
         elif type_ is RuleRef:
-            self._gen_rule_ref(node, match, comment)  # type: ignore
+            yield self._gen_rule_ref(node, match, comment, tokens)  # type: ignore
         elif type_ is TokenRef:
             self._gen_token_ref(node, match, comment)  # type: ignore
         elif type_ is TokenLit:
             self._gen_token_lit(node, match, comment)  # type: ignore
+        elif type_ is Cut:
+            self._debug("Cut\n")
+            self._func_codegen.cut(comment)
         else:
             raise AssertionError(f"Unknown node type: {type_}")
 
-    def _gen_alternatives(self, alts: Alternatives):
-        for alt in alts.nodes:
-            self._gen_node(alt, alt.comment, Match.ZERO_OR_ONCE)
+    def _token_set(self, ids: FrozenSet[int]) -> TokenSet:
+        return [(self._token_names[id], id) for id in sorted(ids)]
+
+    def _guard_tokens(self, node: Node) -> Optional[TokenSet]:
+        # Only a node that can't match without a token can be skipped based on
+        # the token (and only once analysis has worked out its FIRST set)
+        if node.nullable or not node.first:
+            return None
+
+        return self._token_set(node.first)
+
+    def _predicted_tokens(self, node: Node) -> Optional[TokenSet]:
+        # In a predictive function, the tokens deciding whether an optional or
+        # repeated part is parsed (a token part decides that by itself)
+        if not self._predictive or isinstance(node, TokenRef):
+            return None
+
+        return self._token_set(node.first)  # type: ignore
+
+    def _restore(self, callee: Node, match: Match) -> bool:
+        # A predictive function leaves the position where it failed, so a
+        # backtracking caller that carries on after the call has to restore it
+        return (
+            self._predict
+            and callee.predictive
+            and not self._predictive
+            and match != Match.ONCE
+        )
 
-    def _gen_multipart_body(self, body: MultipartBody):
-        for part in body.nodes:
-            self._gen_node(part, part.comment, Match.ONCE)
+    def _token_alts(self, nodes: List[Node]) -> Optional[TokenSet]:
+        # The tokens of alternatives that are all tokens, to match as a set
+        if len(nodes) < 2 or any(type(node) is not TokenRef for node in nodes):
+            return None
+
+        return self._token_set(frozenset(node.id for node in nodes))  # type: ignore
+
+    def _gen_alternatives(self, alts: Alternatives) -> Step:
+        nodes = alts.nodes
+        idx = 0
+        # Alternatives one after the other starting with the same tokens share
+        # the test of the token
+        guard: Optional[TokenSet] = None
+
+        while idx < len(nodes):
+            # A run of token alternatives is one test of the current token
+            end = idx
+            while end < len(nodes) and type(nodes[end]) is TokenRef:
+                end += 1
+
+            run = nodes[idx:end]
+            token_set = self._token_alts(run)
+            if token_set:
+                # A predictive function doesn't go back after a failed
+                # alternative, so the set is only tried on the token all of
+                # them were chosen by
+                tokens = token_set if self._predictive and idx > 0 else None
+                guard = self._switch_guard(guard, tokens)
+
+                self._debug(f"Token set {[name for name, _ in token_set]}\n")
+                comment = " | ".join(node.comment for node in run)
+                self._func_codegen.match_token_set(
+                    "", token_set, Match.ZERO_OR_ONCE, comment
+                )
+                idx = end
+                continue
+
+            # Skip straight past alternatives that can't start with this token
+            alt = nodes[idx]
+            guard = self._switch_guard(guard, self._guard_tokens(alt))
+
+            yield self._gen_node(alt, alt.comment, Match.ZERO_OR_ONCE)
+            idx += 1
 
-    def _gen_zero_or_more(self, zom: ZeroOrMore):
+        self._switch_guard(guard, None)
+
+    def _switch_guard(
+        self, guard: Optional[TokenSet], tokens: Optional[TokenSet]
+    ) -> Optional[TokenSet]:
+        # Ends the current guard and starts one on the given tokens, unless it
+        # is on the same ones already
+        if guard == tokens:
+            return guard
+
+        if guard:
+            self._func_codegen.end_guard()
+        if tokens:
+            self._debug(f"Guard {[name for name, _ in tokens]}\n")
+            self._func_codegen.start_guard(tokens)
+
+        return tokens
+
+    def _gen_factored(self, alts: Alternatives) -> Step:
+        # The shared parts are parsed once, then each alternative carries on
+        # from their results in a function of its own
+        prefix = alts.prefix
+        for part in alts.nodes[0].nodes[:prefix]:  # type: ignore
+            yield self._gen_node(part, part.comment, Match.ONCE)
+
+        restores = [self._restore(alt, Match.ZERO_OR_ONCE) for alt in alts.nodes]
+        args = self._func_codegen.end_prefix(any(restores))
+
+        for alt, restore in zip(alts.nodes, restores):
+            # The last one can be just the shared part, which is then the result
+            if type(alt) is not MultipartBody:
+                self._func_codegen.return_prefix(alt.comment)
+                break
+
+            rest_name, self._next_sub = yield self._sub_func()._generate(
+                alt, alt.comment, args=args, skip=prefix
+            )
+
+            # Skip straight past alternatives that can't go on with this token
+            nullable, first = rest_first(alt, prefix)
+            tokens = self._token_set(first) if not nullable and first else None
+            if tokens:
+                self._debug(f"Guard {[name for name, _ in tokens]}\n")
+                self._func_codegen.start_guard(tokens)
+
+            self._debug(f"Rest {rest_name}\n")
+            self._func_codegen.parse_rest(rest_name, alt.comment, restore)
+
+            if tokens:
+                self._func_codegen.end_guard()
+
+    def _gen_multipart_body(self, body: MultipartBody) -> Step:
+        # Skips the parts parsed by the caller, passed in instead
+        parts = body.nodes[self._skip :] if self._skip else body.nodes
+        for part in parts:
+            yield self._gen_node(part, part.comment, Match.ONCE)
+
+    def _gen_zero_or_more(self, zom: ZeroOrMore) -> Step:
         self._debug("ZeroOrMore\n")
-        self._gen_node(zom.node, zom.comment, Match.ZERO_OR_MORE)
+        tokens = self._predicted_tokens(zom.node)
+        yield self._gen_node(zom.node, zom.comment, Match.ZERO_OR_MORE, tokens=tokens)
 
-    def _gen_one_or_more(self, oom: OneOrMore):
+    def _gen_one_or_more(self, oom: OneOrMore) -> Step:
         self._debug("OneOrMore\n")
-        self._gen_node(oom.node, oom.comment, Match.ONCE_OR_MORE)
+        tokens = self._predicted_tokens(oom.node)
+        yield self._gen_node(oom.node, oom.comment, Match.ONCE_OR_MORE, tokens=tokens)
 
-    def _gen_zero_or_one(self, zoo: ZeroOrOne):
+    def _gen_zero_or_one(self, zoo: ZeroOrOne) -> Step:
         self._debug("ZeroOrOne\n")
-        self._gen_node(zoo.node, zoo.comment, Match.ZERO_OR_ONCE)
+        tokens = self._predicted_tokens(zoo.node)
+        yield self._gen_node(zoo.node, zoo.comment, Match.ZERO_OR_ONCE, tokens=tokens)
+
+    def _gen_rule_match(
+        self,
+        name: str,
+        match: Match,
+        comment: str,
+        tokens: Optional[TokenSet],
+        restore: bool,
+    ):
+        codegen = self._func_codegen
 
-    def _gen_rule_match(self, name: str, match: Match, comment: str):
         if match == Match.ONCE:
-            self._func_codegen.parse_rule(name, comment)
+            codegen.parse_rule(name, comment)
         elif match == Match.ZERO_OR_ONCE:
-            self._func_codegen.parse_rule_zero_or_one(name, comment)
+            codegen.parse_rule_zero_or_one(name, comment, tokens, restore)
         elif match == Match.ZERO_OR_MORE:
-            self._func_codegen.parse_rule_zero_or_more(name, comment)
+            codegen.parse_rule_zero_or_more(name, comment, tokens, restore)
         elif match == Match.ONCE_OR_MORE:
-            self._func_codegen.parse_rule_one_or_more(name, comment)
+            codegen.parse_rule_one_or_more(name, comment, tokens, restore)
         else:
             raise AssertionError(f"Unknown match value: {match}")
 
-    def _gen_sub_rule_ref(self, node: Node, match: Match, comment: str):
+    def _can_inline(self, body: Node, match: Match, tokens: Optional[TokenSet]) -> bool:
+        # The body is parsed in place of the call, so failing in it has to fail
+        # this function, as the failed call would. A predictive function fails
+        # on any part failing, but can only parse a predictive body in place,
+        # while a backtracking one can parse any body but only fails on a part
+        # that has to match
+        if self._func_codegen.early_ret:
+            return False
+        if self._predictive:
+            # ...and has to decide on the token whether to parse it at all
+            return body.predictive and (match == Match.ONCE or bool(tokens))
+        return match == Match.ONCE
+
+    def _gen_inline(self, func_name: str, body: Node) -> Step:
+        # Once 'start_inline' has agreed to parse the body in place
+        self._debug(f"Inline {func_name}\n")
+        for part in body.nodes:  # type: ignore
+            yield self._gen_node(part, part.comment, Match.ONCE)
+
+        self._func_codegen.end_inline()
+
+    def _gen_sub_rule_ref(
+        self, node: Node, match: Match, comment: str, tokens: Optional[TokenSet]
+    ) -> Step:
+        # Named the same either way, so the other sub-rules keep their names
+        binding = node.binding or ""
+        func_name = self._codegen.make_func_name(self._name, binding, self._next_sub)
+
+        # Alternatives that are all tokens are one test of the current token
+        token_set = None
+        if type(node) is Alternatives:
+            token_set = self._token_alts(node.nodes)  # type: ignore
+        if token_set:
+            self._next_sub += 1
+            self._debug(f"Token set {func_name} ({match})\n")
+            self._func_codegen.match_token_set(func_name, token_set, match, comment)
+            return
+
+        if (
+            node.inline
+            and self._can_inline(node, match, tokens)
+            and self._func_codegen.start_inline(
+                func_name, comment, node.comment, match, tokens
+            )
+        ):
+            self._next_sub += 1
+            yield self._gen_inline(func_name, node)
+            return
+
         # Before handling current level, generate the nested function
-        sub_func = _ParserFuncGen(
-            self._name,
-            self._codegen,
-            self._debugs,
-            self._next_sub,
-            self._depth + 1,
-        )
-        sub_name, self._next_sub = sub_func.generate(node, node.comment)
+        sub_name, self._next_sub = yield self._sub_func()._generate(node, node.comment)
 
         self._debug(f"Sub-rule {sub_name} ({match}\n")
-        self._gen_rule_match(sub_name, match, comment)
+        restore = self._restore(node, match)
+        self._gen_rule_match(sub_name, match, comment, tokens, restore)
 
-    def _gen_rule_ref(self, rr: RuleRef, match: Match, comment: str):
-        name = rr.name.value
-        self._debug(f"RuleRef {name} ({match}\n")
+    def _gen_rule_ref(
+        self, rr: RuleRef, match: Match, comment: str, tokens: Optional[TokenSet]
+    ) -> Step:
+        name = rr.name
         func_name = self._codegen.make_func_name(name)
-        self._gen_rule_match(func_name, match, comment)
+
+        rule = self._rules[rr.id] if rr.id != NO_ID else None
+        if (
+            rule
+            and rule.inline
+            and self._can_inline(rule.node, match, tokens)
+            and self._func_codegen.start_inline(
+                func_name, comment, rule.comment, match, tokens
+            )
+        ):
+            yield self._gen_inline(func_name, rule.node)
+            return
+
+        self._debug(f"RuleRef {name} ({match}\n")
+        restore = self._restore(rr, match)
+        self._gen_rule_match(func_name, match, comment, tokens, restore)
 
     def _gen_token_match(self, name: str, match: Match, comment: str):
         if match == Match.ONCE:
@@ -446,7 +1263,7 @@ class _ParserFuncGen:
             raise AssertionError(f"Unknown match value: {match}")
 
     def _gen_token_ref(self, tr: TokenRef, match: Match, comment: str):
-        name = tr.name.value
+        name = tr.name
         self._debug(f"TokenRef {name} ({match})\n")
         self._gen_token_match(name, match, comment)
 
@@ -459,9 +1276,21 @@ class _ParserFuncGen:
 class ParserGen:
     """Language agnostic parser generator"""
 
-    def __init__(self, codegen: ParserCodeGen):
+    def __init__(
+        self,
+        codegen: ParserCodeGen,
+        manifest: Optional[Manifest] = None,
+        timings: Optional[Timings] = None,
+        predictive: bool = False,
+    ):
         self._codegen = codegen
+        self._manifest = manifest
+        self._timings = timings
+        self._predictive = predictive
         self._debugs: List[str] = []
+        self._rules: List[Rule] = []
+        self._token_names: List[str] = []
+        self._hashes: Dict[int, str] = {}
 
     def generate(self, grammar: Grammar) -> Tuple[str, str]:
         """
@@ -469,20 +1298,101 @@ class ParserGen:
         returns a tuple of the parser and debug string
         """
         self._debugs = []
-        self._gen_grammar(grammar)
-        return self._codegen.generate(), "".join(self._debugs)
+        self._rules = grammar.rules
+        self._token_names = grammar.token_names
+        self._hashes = {}
+        with measure(self._timings, "generate"):
+            self._gen_grammar(grammar)
+
+        with measure(self._timings, "render"):
+            return self._codegen.generate(), "".join(self._debugs)
 
     def _gen_grammar(self, grammar: Grammar):
         self._debugs.append("Grammar\n")
 
+        nodes = [node for rule in grammar.rules for node in post_order(rule.node)]
+        if any(node.memo for node in nodes):
+            self._codegen.use_memo()
+        if any(rule.left_rec == LeftRec.LEADER for rule in grammar.rules):
+            self._codegen.use_left_rec()
+        if any(type(node) is Cut for node in nodes):
+            self._codegen.use_cut()
+
         for rule in grammar.rules:
-            self._gen_rule(rule)
+            if self._timings:
+                start = perf_counter()
+                self._gen_rule(rule)
+                self._timings.add_rule(rule.name, perf_counter() - start)
+            else:
+                self._gen_rule(rule)
+
+    def _rule_hash(self, rule: Rule) -> str:
+        hash = self._hashes.get(rule.id)
+        if hash is None:
+            hash = rule_hash(rule, self._token_names)
+            self._hashes[rule.id] = hash
+
+        return hash
+
+    def _rule_key(self, rule: Rule) -> str:
+        # The code of a rule also covers the rules it may parse in place
+        hashes = [self._rule_hash(rule)]
+        seen = {rule.id}
+        stack = [rule]
+
+        while stack:
+            for node in post_order(stack.pop().node):
+                idx = node.id if type(node) is RuleRef else NO_ID  # type: ignore
+                if idx != NO_ID and idx not in seen:
+                    callee = self._rules[idx]
+                    seen.add(callee.id)
+                    if callee.inline:
+                        hashes.append(self._rule_hash(callee))
+                        stack.append(callee)
+
+        return make_hash(*hashes) if len(hashes) > 1 else hashes[0]
 
     def _gen_rule(self, rule: Rule):
-        name = rule.name.value
+        name = rule.name
         self._debugs.append(f"\nRule start: {name}\n")
 
-        func = _ParserFuncGen(name, self._codegen, self._debugs)
-        func.generate(rule.node, rule.comment)
+        # Reuse the previous code for this rule if the rule is unchanged
+        key = self._rule_key(rule) if self._manifest else ""
+        if self._manifest:
+            found = self._manifest.lookup(name, key)
+            if found is not None:
+                for func_str in found[0]:
+                    self._codegen.add_func(func_str)
+                for class_name, class_str in found[1]:
+                    self._codegen.add_class(class_name, class_str)
+
+                self._debugs.append(f"Rule unchanged: {name}\n\n")
+                return
+
+        funcs: List[str] = []
+        classes: List[Tuple[str, str]] = []
+        func = _ParserFuncGen(
+            name,
+            self._codegen,
+            self._debugs,
+            funcs,
+            classes,
+            self._rules,
+            self._token_names,
+            self._predictive,
+        )
+
+        # The leader of a left recursive cycle grows its result in its memo (the
+        # first result it plants there is a failure, to stop the recursion)
+        left_rec = rule.left_rec
+        if left_rec == LeftRec.LOOP:
+            func.generate_loop(rule)
+        elif left_rec == LeftRec.LEADER:
+            func.generate(rule.node, rule.comment, Memo.LEFT_REC)
+        else:
+            func.generate(rule.node, rule.comment)
+
+        if self._manifest:
+            self._manifest.store(name, key, funcs, classes)
 
         self._debugs.append(f"Rule end: {name}\n\n")
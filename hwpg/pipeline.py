@@ -0,0 +1,240 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from hwpg.analysis import BacktrackCost
+from hwpg.ast import Grammar
+from hwpg.config import Config, Lang, load, OutputType
+from hwpg.frontend import parse_grammar
+from hwpg.lexergen import TokensGen
+from hwpg.manifest import fingerprint, Manifest, MANIFEST_FILENAME
+from hwpg.parsergen import ParserGen
+from hwpg.process import Process
+from hwpg.runtime.python.parser_codegen import PyParserCodeGen
+from hwpg.runtime.python.lexer_codegen import PyTokensCodeGen
+from hwpg.timings import measure, Timings
+
+
+def _read_grammar(filename: str) -> str:
+    with open(filename, "r") as f:
+        return f.read()
+
+
+def _gen_parser(
+    grammar: Grammar,
+    name: str,
+    cfg: Config,
+    config_src: str,
+    output: Optional[str],
+    force: bool,
+    timings: Optional[Timings],
+) -> Tuple[str, str, Optional[str]]:
+    if cfg.lang == Lang.PYTHON:
+        codgen = PyParserCodeGen(name, cfg)
+    else:
+        raise AssertionError(f"Unknown or unsupported language: {cfg.lang}")
+
+    # Without an output directory there is no previous run to reuse
+    if output is None:
+        gen = ParserGen(codgen, timings=timings, predictive=cfg.predictive)
+        parser_str, _ = gen.generate(grammar)
+        return parser_str, codgen.parser_filename(), None
+
+    # The manifest lets us reuse the code of every rule unchanged since last run
+    fp = fingerprint(cfg, config_src, codgen)
+    with measure(timings, "manifest"):
+        manifest = Manifest(fp) if force else Manifest.load(output, fp)
+
+    gen = ParserGen(codgen, manifest, timings, cfg.predictive)
+    parser_str, _ = gen.generate(grammar)
+    return parser_str, codgen.parser_filename(), manifest.dumps()
+
+
+def _gen_tokens(token_names: List[str], cfg: Config) -> Tuple[str, str]:
+    if cfg.lang == Lang.PYTHON:
+        codegen = PyTokensCodeGen(cfg.make_parse_tree, cfg.template_cache_dir)
+    else:
+        raise AssertionError(f"Unknown or unsupported language: {cfg.lang}")
+
+    return TokensGen(codegen).generate(token_names)
+
+
+def _save_output(code: str, path: str, filename: str):
+    os.makedirs(path, exist_ok=True)
+    output_file = os.path.join(path, filename)
+
+    # Leave the file (and its timestamp) alone if the contents are unchanged,
+    # so downstream .pyc files and build caches stay valid
+    try:
+        with open(output_file, "r") as f:
+            if f.read() == code:
+                return
+    except FileNotFoundError:
+        pass
+
+    # Save parser
+    with open(output_file, "w") as f:
+        f.write(code)
+
+
+def load_config(
+    filename: Optional[str], start: Sequence[str] = ()
+) -> Tuple[Config, str]:
+    """
+    Loads the configuration, returning it along with its source code. Any
+    start rules given take the place of those in the configuration
+    """
+    src = ""
+    if filename:
+        with open(filename, "r") as f:
+            src = f.read()
+
+    cfg = load(filename)
+    if start:
+        cfg.start = list(start)
+
+    return cfg, src
+
+
+def _processor(grammar: Grammar, cfg: Config) -> Process:
+    return Process(
+        grammar,
+        cfg.left_recursion,
+        # Each time a left recursive rule is continued is an event of its own,
+        # which only growing its result in the memo makes
+        not cfg.events,
+        cfg.predictive,
+        cfg.inline,
+        cfg.factor_prefixes,
+        cfg.start,
+    )
+
+
+def default_output(filename: str) -> str:
+    # A new folder in the directory of the grammar with the same base name
+    name, _ = os.path.splitext(os.path.basename(filename))
+    return os.path.join(os.path.dirname(filename), name)
+
+
+def render(
+    src: str,
+    name: str,
+    cfg: Config,
+    config_src: str = "",
+    output: Optional[str] = None,
+    use_lark: bool = False,
+    force: bool = False,
+    timings: Optional[Timings] = None,
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Runs the pipeline for the source of one grammar without writing anything.
+    It returns any errors found in the grammar, along with the code of each
+    output file by filename. The output directory is only read, for the
+    manifest of the previous run
+    """
+    # Parse the user's grammar directly into an AST
+    grammar = parse_grammar(src, use_lark, timings)
+
+    # Do post processing optimizing the AST and looking for errors
+    with measure(timings, "process"):
+        processor = _processor(grammar, cfg)
+        new_grammar, token_names, errors = processor.process()
+    if errors:
+        return errors, {}
+
+    files: Dict[str, str] = {}
+
+    # Special Python consideration, create __init__.py to make this a new package
+    if cfg.lang == Lang.PYTHON:
+        files["__init__.py"] = ""
+
+    # Create tokens
+    with measure(timings, "tokens"):
+        tokens, tokens_file = _gen_tokens(token_names, cfg)
+    files[tokens_file] = tokens
+
+    # Create Lexer, if needed
+    if cfg.output_type == OutputType.BOTH or cfg.output_type == OutputType.LEXER:
+        # TODO: Generate lexer here
+        pass
+
+    # Create parser, if needed
+    if cfg.output_type == OutputType.BOTH or cfg.output_type == OutputType.PARSER:
+        # Generate code for the parser
+        parser, parser_file, manifest = _gen_parser(
+            new_grammar, name, cfg, config_src, output, force, timings
+        )
+        files[parser_file] = parser
+        if manifest is not None:
+            files[MANIFEST_FILENAME] = manifest
+
+    return [], files
+
+
+def report(filename: str, cfg: Config, use_lark: bool = False) -> Tuple[List[str], str]:
+    """
+    Processes one grammar as configured, without generating anything. It
+    returns any errors found in the grammar, along with a report on which rules
+    can be parsed predictively and why the others need backtracking, and on
+    which functions are memoized
+    """
+    grammar = parse_grammar(_read_grammar(filename), use_lark)
+    processor = _processor(grammar, cfg)
+    _, _, errors = processor.process()
+    if errors or not processor.prediction or not processor.memoization:
+        return errors, ""
+
+    return [], f"{processor.prediction.report()}\n{processor.memoization.report()}"
+
+
+def analyze(
+    filename: str, cfg: Config, use_lark: bool = False
+) -> Tuple[List[str], str]:
+    """
+    Processes one grammar as configured, without generating anything. It
+    returns any errors found in the grammar, along with a report on the worst
+    case work of parsing each rule, where the parser backtracks and what would
+    make the costliest rules cheaper
+    """
+    grammar = parse_grammar(_read_grammar(filename), use_lark)
+    processor = _processor(grammar, cfg)
+    new_grammar, _, errors = processor.process()
+    if errors or not processor.prediction or not processor.memoization:
+        return errors, ""
+
+    cost = BacktrackCost(
+        new_grammar.rules,
+        processor.prediction,
+        processor.memoization,
+        cfg.memoize,
+        cfg.factor_prefixes,
+    )
+    cost.compute()
+    return [], cost.report()
+
+
+def generate(
+    filename: str,
+    cfg: Config,
+    config_src: str,
+    output: str,
+    use_lark: bool = False,
+    force: bool = False,
+    timings: Optional[Timings] = None,
+) -> List[str]:
+    """
+    Runs the whole pipeline for one grammar: parse, process, generate and
+    write the output files. It returns any errors found in the grammar
+    """
+    with measure(timings, "read"):
+        src = _read_grammar(filename)
+
+    # Find the base name from the given grammar filename
+    name, _ = os.path.splitext(os.path.basename(filename))
+
+    errors, files = render(src, name, cfg, config_src, output, use_lark, force, timings)
+
+    with measure(timings, "write"):
+        for output_file, code in files.items():
+            _save_output(code, output, output_file)
+
+    return errors
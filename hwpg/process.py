@@ -1,11 +1,20 @@
-from typing import Dict, List, Optional, Tuple
-
-from lark.lexer import Token
-
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from hwpg.analysis import (
+    FirstSets,
+    Inlining,
+    LeftRecursion,
+    Memoization,
+    post_order,
+    Prediction,
+)
 from hwpg.ast import (
     Alternatives,
+    Cut,
     Grammar,
+    LeftRec,
     MultipartBody,
+    NO_ID,
     Node,
     NodeContainer,
     OneOrMore,
@@ -17,110 +26,369 @@ from hwpg.ast import (
     ZeroOrMore,
     ZeroOrOne,
 )
+from hwpg.trampoline import run, Step
 
 _EOF = "EOF"
 _ILLEGAL = "ILLEGAL"
+_DECORATORS = ("memo", "nomemo")
+_QUANTIFIERS = (ZeroOrOne, ZeroOrMore, OneOrMore)
+
+
+def _same_part(part: Node, other: Node) -> bool:
+    # Only parts that are parsed without a function of their own are shared: a
+    # token or rule, possibly optional or repeated
+    if type(part) is not type(other) or part.binding != other.binding:
+        return False
+    if type(part) in _QUANTIFIERS:
+        part, other = part.node, other.node  # type: ignore
+        if type(part) is not type(other):
+            return False
+
+    if type(part) is TokenRef:
+        return part.name == other.name  # type: ignore
+    if type(part) is RuleRef:
+        return part.name == other.name  # type: ignore
+    return False
+
+
+def _has_cut(alt: Node) -> bool:
+    # Parsing the parts a cut comes after once for several alternatives would
+    # let the next alternative carry on from there, instead of going back
+    return any(type(part) is Cut for part in alt.nodes)  # type: ignore
 
 
 class Process:
-    def __init__(self, grammar: Grammar):
+    def __init__(
+        self,
+        grammar: Grammar,
+        left_recursion: bool = True,
+        loops: bool = True,
+        predictive: bool = True,
+        inline: int = 8,
+        factor_prefixes: bool = True,
+        start: Sequence[str] = (),
+    ):
         self._grammar = grammar
-
-        # A set would be better, but I want to keep ordering as much as possible
-        self._token_names: List[str] = []
-        self._literals: Dict[str, Tuple[Token, Optional[TokenRef]]] = {}
+        self._left_recursion = left_recursion
+        self._loops = loops
+        self._predictive = predictive
+        self._inline = inline
+        self._factor_prefixes = factor_prefixes
+        self._start = start
+        # The ID of the rule being processed
+        self._rule_id = NO_ID
+
+        # Names by ID. Token IDs are assigned in the order names are first seen
+        self._rule_ids: Dict[str, int] = {}
+        self._token_ids: Dict[str, int] = {}
+        self._literals: Dict[str, Tuple[str, Optional[TokenRef]]] = {}
         self._errors: List[str] = []
+        self.prediction: Optional[Prediction] = None
+        self.memoization: Optional[Memoization] = None
 
     def _log_error(self, msg: str):
         self._errors.append(f"ERROR: {msg}")
 
     def process(self) -> Tuple[Grammar, List[str], List[str]]:
+        # Only what the start rules use is processed (and so generated)
+        if self._start:
+            self._grammar = self._shake(self._grammar)
+
         # Process tokens first to ensure all literals are there by time parser
         # tree processing starts
         token_rules = [
             self._process_token_rule(rule) for rule in self._grammar.token_rules
         ]
+        for idx, rule in enumerate(self._grammar.rules):
+            self._rule_ids.setdefault(rule.name, idx)
         rules = [self._process_rule(rule) for rule in self._grammar.rules]
 
         # Ensure these special tokens are always in the list
-        if _EOF not in self._token_names:
-            self._token_names.append(_EOF)
+        self._token_id(_EOF)
+        self._token_id(_ILLEGAL)
+
+        token_names = list(self._token_ids)
+
+        # Analysis for the code generator (the nodes themselves hold the results)
+        FirstSets(rules).compute()
+        self._process_left_rec(rules)
+        self._process_cuts(rules)
+        self.prediction = Prediction(rules, token_names)
+        self.prediction.compute()
+        self._process_decorators(rules)
+        self.memoization = Memoization(rules, self._predictive)
+        self.memoization.compute()
+        Inlining(rules, self._inline).compute()
+
+        grammar = Grammar(rules, token_rules)
+        grammar.token_names = token_names
+        return grammar, grammar.token_names, self._errors
+
+    def _shake(self, grammar: Grammar) -> Grammar:
+        # Keeps the rules reachable from the start rules, and the token rules
+        # they refer to by name or literal, in their original order (so the
+        # token IDs still follow it)
+        by_name = {rule.name: rule for rule in grammar.rules}
+        for name in self._start:
+            if name not in by_name:
+                self._log_error(f"Start rule '{name}' is not defined")
+
+        reached: Set[str] = set()
+        tokens: Set[str] = set()
+        literals: Set[str] = set()
+        stack = [name for name in self._start if name in by_name]
+
+        while stack:
+            name = stack.pop()
+            if name in reached:
+                continue
+
+            reached.add(name)
+            for node in post_order(by_name[name].node):
+                if type(node) is RuleRef and node.name in by_name:  # type: ignore
+                    stack.append(node.name)  # type: ignore
+                elif type(node) is TokenRef:
+                    tokens.add(node.name)  # type: ignore
+                elif type(node) is TokenLit:
+                    literals.add(node.literal[1:-1])  # type: ignore
+
+        rules = [rule for rule in grammar.rules if rule.name in reached]
+        token_rules = [
+            rule
+            for rule in grammar.token_rules
+            if rule.name in tokens or rule.literal.literal[1:-1] in literals
+        ]
+        return Grammar(rules, token_rules)
 
-        if _ILLEGAL not in self._token_names:
-            self._token_names.append(_ILLEGAL)
+    def _process_left_rec(self, rules: List[Rule]):
+        left_rec = LeftRecursion(rules, self._loops)
+        left_rec.compute()
 
-        return Grammar(rules, token_rules), self._token_names, self._errors
+        if not self._left_recursion:
+            for names in left_rec.groups:
+                self._log_error(
+                    "Left recursive rules need the 'left_recursion' option: "
+                    + ", ".join(names)
+                )
+            return
+
+        for names in left_rec.unled:
+            self._log_error(
+                f"Left recursive rules {', '.join(names)} have no rule in every "
+                "cycle between them to lead them"
+            )
+
+    def _process_cuts(self, rules: List[Rule]):
+        # A leader parses its rule again from the same position each time it
+        # grows its result, so it can't reach a cut, past which it can't go back
+        cuts = {
+            rule.id
+            for rule in rules
+            if any(type(node) is Cut for node in post_order(rule.node))
+        }
+        if not cuts:
+            return
+
+        for rule in rules:
+            if rule.left_rec != LeftRec.LEADER:
+                continue
+
+            reached = {rule.id}
+            stack = [rule]
+            while stack:
+                for node in post_order(stack.pop().node):
+                    idx = node.id if type(node) is RuleRef else NO_ID  # type: ignore
+                    if idx != NO_ID and idx not in reached:
+                        reached.add(idx)
+                        stack.append(rules[idx])
+
+            names = [rules[idx].name for idx in sorted(reached & cuts)]
+            if names:
+                self._log_error(
+                    f"Rule '{rule.name}' can't reach a cut (in {', '.join(names)}): "
+                    "it grows a left recursive result by parsing it again"
+                )
+
+    def _process_decorators(self, rules: List[Rule]):
+        for rule in rules:
+            decorators = rule.decorators
+            for name in decorators:
+                if name not in _DECORATORS:
+                    self._log_error(
+                        f"Unknown decorator '@{name}' on rule '{rule.name}'"
+                    )
+
+            if "memo" in decorators and "nomemo" in decorators:
+                self._log_error(
+                    f"Rule '{rule.name}' can't be both '@memo' and '@nomemo'"
+                )
+            elif "memo" in decorators and rule.left_rec == LeftRec.INVOLVED:
+                self._log_error(
+                    f"Rule '{rule.name}' can't be '@memo': it is parsed again while "
+                    "another rule grows a left recursive result"
+                )
+            elif "nomemo" in decorators and rule.left_rec == LeftRec.LEADER:
+                self._log_error(
+                    f"Rule '{rule.name}' can't be '@nomemo': it grows a left "
+                    "recursive result in its memo"
+                )
+
+    def _token_id(self, name: str) -> int:
+        # Add to our master token name list if first time seen
+        return self._token_ids.setdefault(name, len(self._token_ids))
 
     def _process_token_rule(self, rule: TokenRule) -> TokenRule:
         # TODO: Adapt this as TokenRule evolves
         # Add to dict so we can validate against literals in our grammar
         # Strip quotes - either ' or " before compare
-        lit_str = rule.literal.literal.value[1:-1]
+        lit_str = rule.literal.literal[1:-1]
         self._literals[lit_str] = rule.name, None
 
         # Add names to master token name list
-        self._token_names.append(rule.name.value)
+        rule.id = self._token_id(rule.name)
         return rule
 
     def _process_rule(self, rule: Rule) -> Rule:
-        body = self._process_node(rule.node)
-        if body is rule.node:
-            return rule
+        self._rule_id = self._rule_ids[rule.name]
+        body = run(self._process_node(rule.node))
+        if body is not rule.node:
+            rule = Rule(rule.name, body, rule.decorators)
 
-        return Rule(rule.name, body)
+        rule.id = self._rule_ids[rule.name]
+        return rule
 
-    def _process_node(self, node: Node, parent: Optional[NodeContainer] = None) -> Node:
+    def _process_node(self, node: Node, parent: Optional[NodeContainer] = None) -> Step:
         # Top level bindings don't work right now (and I can't think what good
         # they do? Just change the rule name....), so disallow them
         if not parent and node.binding:
-            self._log_error(f"Top level binding '{node.binding.value}' is not allowed")
+            self._log_error(f"Top level binding '{node.binding}' is not allowed")
 
         type_ = type(node)
 
         if type_ is Alternatives:
-            return self._process_alternatives(node, parent)  # type: ignore
+            return (yield self._process_alternatives(node, parent))  # type: ignore
         elif type_ is MultipartBody:
-            return self._process_multipart_body(node, parent)  # type: ignore
+            return (yield self._process_multipart_body(node, parent))  # type: ignore
         elif type_ is ZeroOrMore:
-            return self._process_zero_or_more(node, parent)  # type: ignore
+            return (yield self._process_zero_or_more(node, parent))  # type: ignore
         elif type_ is OneOrMore:
-            return self._process_one_or_more(node, parent)  # type: ignore
+            return (yield self._process_one_or_more(node, parent))  # type: ignore
         elif type_ is ZeroOrOne:
-            return self._process_zero_or_one(node, parent)  # type: ignore
+            return (yield self._process_zero_or_one(node, parent))  # type: ignore
         elif type_ is RuleRef:
             return self._process_rule_ref(node, parent)  # type: ignore
         elif type_ is TokenRef:
             return self._process_token_ref(node, parent)  # type: ignore
         elif type_ is TokenLit:
             return self._process_token_lit(node, parent)  # type: ignore
+        elif type_ is Cut:
+            return self._process_cut(node, parent)  # type: ignore
         else:
             raise AssertionError(f"Unknown node type: {type_}")
 
     def _process_alternatives(
         self, alts: Alternatives, parent: Optional[NodeContainer]
-    ) -> Alternatives:
+    ) -> Step:
         changed = False
         new_alts: List[Node] = []
 
         for alt in alts.nodes:
-            new_alt = self._process_node(alt, parent=alts)
+            new_alt = yield self._process_node(alt, parent=alts)
             if new_alt is not alt:
                 changed = True
             new_alts.append(new_alt)
 
-        if not changed:
+        if changed:
+            alts = Alternatives(alts.binding, new_alts)
+
+        return self._factor(alts) if self._factor_prefixes else alts
+
+    def _factor(self, alts: Alternatives) -> Alternatives:
+        # Each run of alternatives starting with the same parts becomes a group
+        # that parses them once (or the whole node does, if the run is all of
+        # them). The alternatives themselves are kept as they are, so their
+        # bindings, actions and results don't change
+        nodes: List[Node] = []
+        idx = 0
+
+        while idx < len(alts.nodes):
+            end, prefix = self._shared_run(alts.nodes, idx)
+            if end - idx < 2:
+                nodes.append(alts.nodes[idx])
+                idx += 1
+                continue
+
+            if end - idx == len(alts.nodes):
+                group = Alternatives(alts.binding, alts.nodes)
+                group.prefix = prefix
+                return group
+
+            group = Alternatives(None, alts.nodes[idx:end])
+            group.prefix = prefix
+            nodes.append(group)
+            idx = end
+
+        if len(nodes) == len(alts.nodes):
             return alts
 
-        return Alternatives(alts.binding, new_alts)
+        return Alternatives(alts.binding, nodes)
+
+    def _shared_run(self, alts: List[Node], start: int) -> Tuple[int, int]:
+        # The end of the run of alternatives from 'start' on sharing at least one
+        # leading part, and how many parts they all share. Every alternative has
+        # to keep a part of its own, but the last one, which can be just the
+        # shared parts (the result of parsing them alone, should the others all
+        # fail). A rule calling itself first is left alone, so it can still be
+        # parsed as a loop
+        first = alts[start]
+        if type(first) is not MultipartBody:
+            return start + 1, 0
+
+        parts = first.nodes  # type: ignore
+        if _has_cut(first):
+            return start + 1, 0
+
+        lead = parts[0]
+        if type(lead) in _QUANTIFIERS:
+            lead = lead.node  # type: ignore
+        if type(lead) is RuleRef and lead.id == self._rule_id:
+            return start + 1, 0
+
+        prefix = len(parts) - 1
+        end = start + 1
+
+        while end < len(alts):
+            other = alts[end]
+            if type(other) is MultipartBody and not _has_cut(other):
+                others = other.nodes  # type: ignore
+            elif type(other) in (RuleRef, TokenRef):
+                others = [other]
+            else:
+                break
+
+            count = 0
+            limit = min(prefix, len(others))
+            while count < limit and _same_part(parts[count], others[count]):
+                count += 1
+
+            if not count:
+                break
+
+            prefix = count
+            end += 1
+            if count == len(others):
+                break
+
+        return end, prefix
 
     def _process_multipart_body(
         self, body: MultipartBody, parent: Optional[NodeContainer]
-    ) -> MultipartBody:
+    ) -> Step:
         changed = False
         new_parts: List[Node] = []
 
         for part in body.nodes:
-            new_part = self._process_node(part, parent=body)
+            new_part = yield self._process_node(part, parent=body)
             if new_part is not part:
                 changed = True
             new_parts.append(new_part)
@@ -132,8 +400,8 @@ class Process:
 
     def _process_zero_or_more(
         self, zom: ZeroOrMore, parent: Optional[NodeContainer]
-    ) -> ZeroOrMore:
-        node = self._process_node(zom.node, parent=zom)
+    ) -> Step:
+        node = yield self._process_node(zom.node, parent=zom)
         if node is zom.node:
             return zom
 
@@ -141,8 +409,8 @@ class Process:
 
     def _process_one_or_more(
         self, oom: OneOrMore, parent: Optional[NodeContainer]
-    ) -> OneOrMore:
-        node = self._process_node(oom.node, parent=oom)
+    ) -> Step:
+        node = yield self._process_node(oom.node, parent=oom)
         if node is oom.node:
             return oom
 
@@ -150,8 +418,8 @@ class Process:
 
     def _process_zero_or_one(
         self, zoo: ZeroOrOne, parent: Optional[NodeContainer]
-    ) -> ZeroOrOne:
-        node = self._process_node(zoo.node, parent=zoo)
+    ) -> Step:
+        node = yield self._process_node(zoo.node, parent=zoo)
         if node is zoo.node:
             return zoo
 
@@ -160,15 +428,13 @@ class Process:
     def _process_rule_ref(
         self, ref: RuleRef, parent: Optional[NodeContainer]
     ) -> RuleRef:
+        ref.id = self._rule_ids.get(ref.name, NO_ID)
         return ref
 
     def _process_token_ref(
         self, ref: TokenRef, parent: Optional[NodeContainer]
     ) -> TokenRef:
-        # Add to our master token name list if first time seen
-        token_name = ref.name.value
-        if token_name not in self._token_names:
-            self._token_names.append(token_name)
+        ref.id = self._token_id(ref.name)
 
         return ref
 
@@ -188,6 +454,19 @@ class Process:
         # If TokenRef not already created, do so and store for future
         if not ref:
             ref = TokenRef(lit.binding, name, lit.literal)
+            ref.id = self._token_id(name)
             self._literals[lit_str] = name, ref
 
         return ref
+
+    def _process_cut(self, cut: Cut, parent: Optional[NodeContainer]) -> Cut:
+        # It commits to the parts of its alternative before it, so it has to be
+        # one of them
+        if type(parent) is not MultipartBody:
+            name = self._grammar.rules[self._rule_id].name
+            self._log_error(
+                f"Cut in rule '{name}' has to be a part of an alternative (it "
+                "can't be one by itself, optional or repeated)"
+            )
+
+        return cut
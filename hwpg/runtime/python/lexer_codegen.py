@@ -1,9 +1,15 @@
+import os
+from typing import Optional
+
 from hwpg.lexergen import Jinja2TokensCodeGen
+from hwpg.templates import TEMPLATE_DIR
+
+_TEMPL_FOLDER = os.path.join(TEMPLATE_DIR, "python")
 
 
 class PyTokensCodeGen(Jinja2TokensCodeGen):
-    def __init__(self, make_parse_tree: bool):
-        super().__init__(make_parse_tree, "templates/python", "tokens.py.j2")
+    def __init__(self, make_parse_tree: bool, cache_dir: Optional[str] = None):
+        super().__init__(make_parse_tree, _TEMPL_FOLDER, "tokens.py.j2", cache_dir)
 
     @property
     def tokens_filename(self) -> str:
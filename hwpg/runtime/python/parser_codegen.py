@@ -1,31 +1,46 @@
+import os
+import re
+from keyword import iskeyword
 from hwpg.config import Config
-from typing import Optional
+from typing import List, Optional
 
 from hwpg.parsergen import (
+    FuncArgs,
     Jinja2ParserCodeGen,
     Jinja2ParserFuncCodeGen,
+    Match,
+    Memo,
     ParserActions,
     TemplData,
+    TokenSet,
 )
+from hwpg.templates import TEMPLATE_DIR
 
-_TEMPL_FOLDER = "templates/python"
+_TEMPL_FOLDER = os.path.join(TEMPLATE_DIR, "python")
 _PARSER_TEMPL = "parser.py.j2"
 
-_FUNC_START = '''    def {{ name }}(self) -> Optional[{{ ret_type }}]:
+_FUNC_START = '''{% if events and not predictive %}    @_defer_events
+{% endif %}{% if memoize %}    @_memoize
+{% elif left_rec %}    @_memoize_left_rec
+{% endif %}{% if hold_tokens %}    @_hold_tokens
+{% endif %}{% if rule_events %}    @_rule_events
+{% elif events and predictive %}    @_keep_events
+{% endif %}    def {{ name }}(self{% if left %}, {{ left }}: {{ left_type }}{% endif %}{% for arg, type in args %}, {{ arg }}: {{ type }}{% endfor %}) -> Optional[{{ ret_type }}]:
         """
         {{ comment }}
         """
-        old_pos = self.pos
-
+{% if not predictive %}        old_pos = self.pos
 
+{% endif %}
 '''
 
-_FUNC_END_EARLY_RET = """        self.pos = old_pos
-        return None
+_FUNC_END_EARLY_RET = """{% if not predictive and not restored %}        self.pos = old_pos
+{% endif %}        return None
+
 """
 
 _MATCH_TOKEN = """        # {{ comment }}
-        {{ var }} = self._match_token_or_rollback(TokenType.{{ name }}, old_pos)
+        {{ var }} = self.{{ func }}(TokenType.{{ name }}{{ args }})
 {%- if early_ret %}
         return {{ var }} if {{ var }} else None
 {% else %}
@@ -54,7 +69,7 @@ _MATCH_TOKEN_ZERO_OR_MORE = """        # {{ comment }}
 """
 
 _MATCH_TOKEN_ONE_OR_MORE = """        # {{ comment }}
-        {{ var }} = self._match_tokens_or_rollback(TokenType.{{ name }}, old_pos)
+        {{ var }} = self.{{ func }}(TokenType.{{ name }}{{ args }})
 {%- if early_ret %}
         return {{ var }} if {{ var }} else None
 {% else %}
@@ -64,10 +79,30 @@ _MATCH_TOKEN_ONE_OR_MORE = """        # {{ comment }}
 
 """
 
+# Any one of a set of tokens (or a run of them), tested as a bitmask of their
+# types (see '_token_cond')
+
+_MATCH_TOKEN_SET = """        # {{ comment }}
+        {{ var }} = self.{{ func }}({{ mask }})
+{%- if early_ret %}
+        if {{ var }}:
+            return {{ var }}
+{% elif required %}
+        if not {{ var }}:
+{%- if not predictive %}
+            self.pos = old_pos
+{%- endif %}
+            return None
+{% endif %}
+
+"""
+
 _MATCH_RULE = """        # {{ comment }}
         {{ var }} = self.{{ func }}()
         if not {{ var }}:
+{%- if not predictive %}
             self.pos = old_pos
+{%- endif %}
             return None
 {% if early_ret %}
         return {{ var }}
@@ -76,10 +111,17 @@ _MATCH_RULE = """        # {{ comment }}
 """
 
 _MATCH_RULE_ZERO_OR_ONE = """        # {{ comment }}
-        {{ var }} = self.{{ func }}()
+{% if restore and not early_ret %}        {{ pos_var }} = self.pos
+{% endif %}        {{ var }} = self.{{ func }}()
 {%- if early_ret %}
         if {{ var }}:
             return {{ var }}
+{%- if restore %}
+        self.pos = old_pos
+{%- endif %}
+{% elif restore %}
+        if not {{ var }}:
+            self.pos = {{ pos_var }}
 {% endif %}
 
 """
@@ -87,9 +129,11 @@ _MATCH_RULE_ZERO_OR_ONE = """        # {{ comment }}
 _MATCH_RULE_ZERO_OR_MORE = """        # {{ comment }}
         {{ var }}: List[{{ ret_type }}] = []
         while True:
-            {{ temp_var }} = self.{{ func }}()
+{% if restore %}            {{ pos_var }} = self.pos
+{% endif %}            {{ temp_var }} = self.{{ func }}()
             if not {{ temp_var }}:
-                break
+{% if restore %}                self.pos = {{ pos_var }}
+{% endif %}                break
             {{ var }}.append({{ temp_var }})
 {% if early_ret %}
         if {{ var }}:
@@ -101,9 +145,11 @@ _MATCH_RULE_ZERO_OR_MORE = """        # {{ comment }}
 _MATCH_RULE_ONE_OR_MORE = """        # {{ comment }}
         {{ var }}: List[{{ ret_type }}] = []
         while True:
-            {{ temp_var }} = self.{{ func }}()
+{% if restore %}            {{ pos_var }} = self.pos
+{% endif %}            {{ temp_var }} = self.{{ func }}()
             if not {{ temp_var }}:
-                break
+{% if restore %}                self.pos = {{ pos_var }}
+{% endif %}                break
             {{ var }}.append({{ temp_var }})
 
         if not {{ var }}:
@@ -115,90 +161,548 @@ _MATCH_RULE_ONE_OR_MORE = """        # {{ comment }}
 
 """
 
+# The parts below are only in predictive functions. Each one is parsed (again)
+# based on the current token alone, and failing then fails the whole function
+
+_PREDICT_RULE_ZERO_OR_ONE = """        # {{ comment }}
+        {{ var }} = None
+{% if names|length > 1 %}        # {{ names|join(", ") }}
+{% endif %}        if {{ cond }}:
+            {{ var }} = self.{{ func }}()
+            if not {{ var }}:
+                return None
+
+
+"""
+
+_PREDICT_RULE_ZERO_OR_MORE = """        # {{ comment }}
+        {{ var }}: List[{{ ret_type }}] = []
+{% if names|length > 1 %}        # {{ names|join(", ") }}
+{% endif %}        while {{ cond }}:
+            {{ temp_var }} = self.{{ func }}()
+            if not {{ temp_var }}:
+                return None
+            {{ var }}.append({{ temp_var }})
+
+
+"""
+
+_PREDICT_RULE_ONE_OR_MORE = """        # {{ comment }}
+        {{ var }}: List[{{ ret_type }}] = []
+        while True:
+            {{ temp_var }} = self.{{ func }}()
+            if not {{ temp_var }}:
+                return None
+            {{ var }}.append({{ temp_var }})
+{% if names|length > 1 %}            # {{ names|join(", ") }}
+{% endif %}            if {{ cond }}:
+                break
+
+
+"""
+
+# A function whose body is parsed in place of calling it: its parts follow the
+# start (indented when it is optional or repeated), then the end makes its
+# result from their vars, as the default action would have
+
+_INLINE_START = """        # {{ comment }}
+{% if repeated %}        {{ var }}: List[{{ ret_type }}] = []
+{% elif optional %}        {{ var }} = None
+{% endif %}{% if cond and names|length > 1 %}        # {{ names|join(", ") }}
+{% endif %}{% if optional %}        if {{ cond }}:
+{% elif repeated and cond %}        while {{ cond }}:
+{% elif repeated %}        while True:
+{% endif %}
+"""
+
+_INLINE_END = """{% if repeated %}        {{ var }}.append({{ node }})
+{% else %}        {{ var }} = {{ node }}
+{% endif %}{% if cond %}{% if names|length > 1 %}        # {{ names|join(", ") }}
+{% endif %}        if {{ cond }}:
+            break
+{% endif %}
+
+"""
+
+# Factored alternatives parse the parts they share first, then pass the results
+# on to each alternative in turn
+
+_END_PREFIX = """{% if pos_var %}        {{ pos_var }} = self.pos
+
+{% endif %}"""
+
+_PARSE_REST = """        # {{ comment }}
+        {{ var }} = self.{{ func }}({{ args }})
+{%- if predictive %}
+        return {{ var }}
+{% else %}
+        if {{ var }}:
+            return {{ var }}
+{% if restore %}        self.pos = {{ pos_var }}
+{% endif %}{% endif %}
+
+"""
+
+_RETURN_PREFIX = """        # {{ comment }}
+        return {{ var }}
+
+"""
+
+_CUT = """        # {{ comment }}
+        self._cut()
+
+
+"""
+
+_GROW_LEFT_REC = """        # {{ seed_comment }}
+        {{ var }} = self.{{ seed }}()
+        if not {{ var }}:
+            self.pos = old_pos
+            return None
+
+        # {{ comment }}
+        while True:
+{% if tails|length > 1 %}            {{ tail_var }} = (
+                self.{{ tails[0] }}({{ var }})
+{% for tail in tails[1:] %}                or self.{{ tail }}({{ var }})
+{% endfor %}            )
+{% else %}            {{ tail_var }} = self.{{ tails[0] }}({{ var }})
+{% endif %}            if not {{ tail_var }}:
+                return {{ var }}
+            {{ var }} = {{ tail_var }}
+"""
+
+_GUARD = """{% if first %}        {{ var }} = self._curr_token().token_type
+
+{% endif %}{% if names|length > 1 %}        # {{ names|join(", ") }}
+{% endif %}        if {{ cond }}:
+
+"""
+
+
+# The nodes a function makes, with 'node_classes' on: their fields are named for
+# the vars the function makes its result from, in the same order
+
+_NODE_CLASS = '''class {{ name }}(_RuleNode):
+    """
+    {{ comment }}
+    """
+
+    __slots__ = {{ slots }}
+
+    def __init__(self{% for field, type in params %}, {{ field }}: {{ type }}{% endfor %}):
+{% for field, _ in params %}        self.{{ field }} = {{ field }}
+{% else %}        pass
+{% endfor %}'''
+
+# Names the node classes would otherwise take from the parser module
+_RESERVED_CLASSES = {"ParserNode", "TreeNode"}
+
 
 def _strip_func_prefix(name: str) -> str:
     # Remove 'parse_' (6 chars) or '_parse_' prefix (7 chars)
     return name[6:] if name.startswith("parse_") else name[7:]
 
 
+def _node_class_name(name: str) -> str:
+    # 'parse_list_elems' makes 'ListElemsNode' ('_parse_...' a private class).
+    # Rule names are lower case, so no two functions make the same name
+    base = re.sub("_([a-z])", lambda m: m.group(1).upper(), _strip_func_prefix(name))
+    private = "_" if name.startswith("_") else ""
+    class_name = f"{private}{base[0].upper()}{base[1:]}Node"
+    return class_name + "_" if class_name in _RESERVED_CLASSES else class_name
+
+
+def _node_fields(fields: List[str]) -> List[str]:
+    # Fields have to be valid attribute names (other than 'nodes', which lists
+    # them all) and differ from each other
+    names: List[str] = []
+    for field in fields:
+        if iskeyword(field) or field == "nodes":
+            field += "_"
+
+        name, idx = field, 1
+        while name in names:
+            idx += 1
+            name = f"{field}{idx}"
+        names.append(name)
+
+    return names
+
+
 class PyParserFuncCodeGen(Jinja2ParserFuncCodeGen):
-    _default_action = "        return ParserNode([{{ vars }}])", "TreeNode"
+    _default_action = "        return {{ node }}", "TreeNode"
+    _matched_action = "        return True", "bool"
     _func_start_templ = _FUNC_START
     _early_ret_templ = _FUNC_END_EARLY_RET
     _match_token_templ = _MATCH_TOKEN
     _match_token_zero_or_one_templ = _MATCH_TOKEN_ZERO_OR_ONE
     _match_token_zero_or_more_templ = _MATCH_TOKEN_ZERO_OR_MORE
     _match_token_one_or_more_templ = _MATCH_TOKEN_ONE_OR_MORE
+    _match_token_set_templ = _MATCH_TOKEN_SET
     _parse_rule_templ = _MATCH_RULE
     _parse_rule_zero_or_one_templ = _MATCH_RULE_ZERO_OR_ONE
     _parse_rule_zero_or_more_templ = _MATCH_RULE_ZERO_OR_MORE
     _parse_rule_one_or_more_templ = _MATCH_RULE_ONE_OR_MORE
+    _predict_rule_zero_or_one_templ = _PREDICT_RULE_ZERO_OR_ONE
+    _predict_rule_zero_or_more_templ = _PREDICT_RULE_ZERO_OR_MORE
+    _predict_rule_one_or_more_templ = _PREDICT_RULE_ONE_OR_MORE
+    _guard_templ = _GUARD
+    _inline_start_templ = _INLINE_START
+    _inline_end_templ = _INLINE_END
+    _end_prefix_templ = _END_PREFIX
+    _parse_rest_templ = _PARSE_REST
+    _return_prefix_templ = _RETURN_PREFIX
+    _cut_templ = _CUT
+    _grow_left_rec_templ = _GROW_LEFT_REC
 
     def __init__(
         self,
         name: str,
+        rule: str,
         early_ret: bool,
+        predictive: bool,
+        memo: Memo,
+        hold_tokens: bool,
         make_parse_tree: bool,
+        node_classes: bool,
+        events: bool,
         comment: str,
         actions: Optional[ParserActions],
+        left: str,
+        args: FuncArgs,
     ):
         super().__init__(
-            name, _strip_func_prefix(name), early_ret, make_parse_tree, comment, actions
+            name,
+            _strip_func_prefix(name),
+            rule,
+            early_ret,
+            predictive,
+            memo,
+            hold_tokens,
+            make_parse_tree,
+            node_classes,
+            events,
+            comment,
+            actions,
+            left,
+            args,
         )
 
     def _start_func(self) -> TemplData:
-        return dict(name=self.name, ret_type=self.ret_type, comment=self.comment)
+        return dict(
+            name=self.name,
+            ret_type=self.ret_type,
+            comment=self.comment,
+            memoize=self.memo == Memo.ON,
+            left_rec=self.memo == Memo.LEFT_REC,
+            hold_tokens=self.hold_tokens,
+            events=self.events,
+            rule_events=self.events and self.name == f"parse_{self.rule}",
+            predictive=self.predictive,
+            left=self.left,
+            left_type=self.left_type,
+            args=self.args,
+        )
 
     def _end_func(self) -> TemplData:
-        return dict(vars=", ".join(self._vars))
+        vars = ", ".join(self._vars)
+        if self._action != self._default[0]:
+            return dict(vars=vars)
+
+        node = self._make_node(self.name, self.comment, self._vars, self._fields)
+        return dict(vars=vars, node=node)
+
+    def _end_func_early_ret(self) -> TemplData:
+        return dict(predictive=self.predictive, restored=self._restored)
+
+    def _field(self, name: str) -> str:
+        # The result of one of the rule's own sub functions is named for what
+        # follows the rule name (its binding, or 'inner' and its sub #)
+        prefix = f"_parse_{self.rule}_"
+        if name.startswith(prefix):
+            return name[len(prefix) :]
+
+        return _strip_func_prefix(name)
+
+    def _make_node(
+        self, name: str, comment: str, vars: List[str], fields: List[str]
+    ) -> str:
+        # The expression making the node of the given function from its vars
+        if self._default == self._matched_action:
+            return "True"
+        if not self._node_classes:
+            return f"ParserNode([{', '.join(vars)}])"
+
+        class_name = _node_class_name(name)
+        params = [
+            (field, self._types[var]) for var, field in zip(vars, _node_fields(fields))
+        ]
+        slots = ", ".join(f'"{field}"' for field, _ in params)
+        code = self._compile_templ(_NODE_CLASS).render(
+            name=class_name,
+            comment=comment,
+            slots=f"({slots},)" if len(params) == 1 else f"({slots})",
+            params=params,
+        )
+        self.classes.append((class_name, code.rstrip()))
+        return f"{class_name}({', '.join(vars)})"
+
+    def _match_token_func(self, func: str) -> TemplData:
+        # Predictive functions never roll back, so they only try to match
+        if self.predictive:
+            return dict(func=f"_try_{func}", args="")
+
+        return dict(func=f"_{func}_or_rollback", args=", old_pos")
+
+    @staticmethod
+    def _token_mask(tokens: TokenSet) -> str:
+        # 'TokenType' is an IntEnum numbered from 1 in token ID order (see
+        # tokens.py.j2), so a token set is also a bitmask of token types
+        mask = 0
+        for _, id in tokens:
+            mask |= 1 << (id + 1)
+
+        return hex(mask)
+
+    def _token_cond(self, tokens: TokenSet, var: str, negate: bool = False) -> str:
+        if len(tokens) == 1:
+            op = "!=" if negate else "=="
+            return f"{var} {op} TokenType.{tokens[0][0]}"
+
+        not_ = "not " if negate else ""
+        return f"{not_}(1 << {var}) & {self._token_mask(tokens)}"
+
+    def _predict_vars(self, tokens: Optional[TokenSet], negate: bool) -> TemplData:
+        if not tokens:
+            return {}
+
+        cond = self._token_cond(tokens, "self._curr_token().token_type", negate)
+        return dict(cond=cond, names=[name for name, _ in tokens])
 
     def _match_token(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(name.lower())
-        return dict(name=name, var=var, early_ret=self.early_ret, comment=comment)
+        var = self._new_var(name.lower(), "Optional[Token]")
+        return dict(
+            name=name,
+            var=var,
+            early_ret=self.early_ret,
+            comment=comment,
+            **self._match_token_func("match_token"),
+        )
 
     def _match_token_zero_or_one(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(name.lower())
+        var = self._new_var(name.lower(), "Optional[Token]")
         return dict(name=name, var=var, early_ret=self.early_ret, comment=comment)
 
     def _match_token_zero_or_more(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(name.lower() + "_list")
+        var = self._new_var(name.lower() + "_list", "List[Token]")
         return dict(name=name, var=var, early_ret=self.early_ret, comment=comment)
 
     def _match_token_one_or_more(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(name.lower() + "_list")
-        return dict(name=name, var=var, early_ret=self.early_ret, comment=comment)
+        var = self._new_var(name.lower() + "_list", "List[Token]")
+        return dict(
+            name=name,
+            var=var,
+            early_ret=self.early_ret,
+            comment=comment,
+            **self._match_token_func("match_tokens"),
+        )
+
+    def _match_token_set(
+        self, name: str, tokens: TokenSet, match: Match, comment: str
+    ) -> TemplData:
+        # Named as the result of the function it replaces would be
+        base = _strip_func_prefix(name) if name else "token"
+        field = self._field(name) if name else base
+        repeated = match in (Match.ZERO_OR_MORE, Match.ONCE_OR_MORE)
+        if repeated:
+            var = self._new_var(base + "_list", "List[Token]", field + "_list")
+        else:
+            var = self._new_var(base, "Optional[Token]", field)
+
+        return dict(
+            var=var,
+            func="_try_match_tokens_in" if repeated else "_try_match_token_in",
+            mask=self._token_mask(tokens),
+            early_ret=self.early_ret,
+            required=match in (Match.ONCE, Match.ONCE_OR_MORE),
+            predictive=self.predictive,
+            comment=comment,
+        )
 
     def _parse_rule(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(_strip_func_prefix(name))
-        return dict(var=var, func=name, early_ret=self.early_ret, comment=comment)
+        base = _strip_func_prefix(name)
+        type_ = f"Optional[{self._func_actions(base)[1]}]"
+        var = self._new_var(base, type_, self._field(name))
+        return dict(
+            var=var,
+            func=name,
+            early_ret=self.early_ret,
+            predictive=self.predictive,
+            comment=comment,
+        )
 
-    def _parse_rule_zero_or_one(self, name: str, comment: str) -> TemplData:
-        var = self._new_var(_strip_func_prefix(name))
-        return dict(var=var, func=name, early_ret=self.early_ret, comment=comment)
+    def _parse_rule_zero_or_one(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        base = _strip_func_prefix(name)
+        type_ = f"Optional[{self._func_actions(base)[1]}]"
+        var = self._new_var(base, type_, self._field(name))
+        pos_var = self._saved_pos_var() if restore and not self.early_ret else ""
 
-    def _parse_rule_zero_or_more(self, name: str, comment: str) -> TemplData:
-        temp_var = _strip_func_prefix(name)
-        var = self._new_var(temp_var + "_list")
+        return dict(
+            var=var,
+            func=name,
+            early_ret=self.early_ret,
+            restore=restore,
+            pos_var=pos_var,
+            comment=comment,
+            **self._predict_vars(tokens, negate=False),
+        )
+
+    def _parse_rule_zero_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        # The item var must not overwrite an earlier var of the same name
+        base = _strip_func_prefix(name)
+        ret_type = self._func_actions(base)[1]
+        field = self._field(name) + "_list"
+        var = self._new_var(base + "_list", f"List[{ret_type}]", field)
+        temp_var = self._new_name(base)
 
         return dict(
             temp_var=temp_var,
             var=var,
             func=name,
             early_ret=self.early_ret,
-            ret_type=self.ret_type,
+            restore=restore,
+            pos_var=self._saved_pos_var() if restore else "",
+            ret_type=ret_type,
             comment=comment,
+            **self._predict_vars(tokens, negate=False),
         )
 
-    def _parse_rule_one_or_more(self, name: str, comment: str) -> TemplData:
-        temp_var = _strip_func_prefix(name)
-        var = self._new_var(temp_var + "_list")
+    def _parse_rule_one_or_more(
+        self, name: str, comment: str, tokens: Optional[TokenSet], restore: bool
+    ) -> TemplData:
+        # The item var must not overwrite an earlier var of the same name
+        base = _strip_func_prefix(name)
+        ret_type = self._func_actions(base)[1]
+        field = self._field(name) + "_list"
+        var = self._new_var(base + "_list", f"List[{ret_type}]", field)
+        temp_var = self._new_name(base)
 
         return dict(
             temp_var=temp_var,
             var=var,
             func=name,
             early_ret=self.early_ret,
-            ret_type=self.ret_type,
+            restore=restore,
+            pos_var=self._saved_pos_var() if restore else "",
+            ret_type=ret_type,
+            comment=comment,
+            **self._predict_vars(tokens, negate=True),
+        )
+
+    def _guard(self, tokens: TokenSet, token_var: str, first: bool) -> TemplData:
+        names = [name for name, _ in tokens]
+        cond = self._token_cond(tokens, token_var)
+        return dict(var=token_var, names=names, cond=cond, first=first)
+
+    def _start_inline(
+        self,
+        name: str,
+        comment: str,
+        body: str,
+        match: Match,
+        tokens: Optional[TokenSet],
+    ) -> Optional[TemplData]:
+        # Only the default action makes the result from the vars alone, and a
+        # rule's events come from its own function
+        if self.events and name.startswith("parse_"):
+            return None
+
+        base = _strip_func_prefix(name)
+        action, ret_type = self._func_actions(base)
+        if action != self._default[0]:
+            return None
+
+        # The item of a repeated body must not overwrite an earlier var either
+        repeated = match in (Match.ZERO_OR_MORE, Match.ONCE_OR_MORE)
+        field = self._field(name)
+        if repeated:
+            var = self._new_var(base + "_list", f"List[{ret_type}]", field + "_list")
+            prefix = self._new_name(base)
+        else:
+            var = prefix = self._new_var(base, f"Optional[{ret_type}]", field)
+
+        # One or more times only checks the token after the first time round
+        predict = {}
+        if match != Match.ONCE_OR_MORE:
+            predict = self._predict_vars(tokens, negate=False)
+
+        return dict(
+            name=name,
+            body=body,
+            var=var,
+            prefix=prefix,
+            ret_type=ret_type,
+            repeated=repeated,
+            optional=match == Match.ZERO_OR_ONCE,
+            comment=comment,
+            tokens=tokens,
+            **predict,
+        )
+
+    def _end_inline(
+        self, match: Match, vars: List[str], fields: List[str], start: TemplData
+    ) -> TemplData:
+        predict = {}
+        if match == Match.ONCE_OR_MORE:
+            predict = self._predict_vars(start["tokens"], negate=True)
+
+        return dict(
+            var=start["var"],
+            node=self._make_node(start["name"], start["body"], vars, fields),
+            repeated=start["repeated"],
+            **predict,
+        )
+
+    def _end_prefix(self, restore: bool) -> TemplData:
+        return dict(pos_var=self._saved_pos_var() if restore else "")
+
+    def _parse_rest(self, name: str, comment: str, restore: bool) -> TemplData:
+        base = _strip_func_prefix(name)
+        var = self._new_var(base, f"Optional[{self._func_actions(base)[1]}]")
+        return dict(
+            var=var,
+            func=name,
+            args=", ".join(arg for arg, _ in self._prefix),
+            restore=restore,
+            pos_var=self._pos_var,
+            predictive=self.predictive,
+            comment=comment,
+        )
+
+    def _return_prefix(self, comment: str) -> TemplData:
+        return dict(var=self._prefix[-1][0], comment=comment)
+
+    def _cut(self, comment: str) -> TemplData:
+        return dict(comment=comment)
+
+    def _grow_left_rec(
+        self, seed: str, seed_comment: str, tails: List[str], comment: str
+    ) -> TemplData:
+        base = _strip_func_prefix(self.name)
+        var = self._new_var(base, self.ret_type)
+        tail_var = self._new_name(base + "_tail")
+
+        return dict(
+            var=var,
+            tail_var=tail_var,
+            seed=seed,
+            tails=tails,
+            seed_comment=seed_comment,
             comment=comment,
         )
 
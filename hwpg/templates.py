@@ -0,0 +1,36 @@
+import os
+from functools import lru_cache
+from typing import Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from jinja2 import StrictUndefined, Template
+
+# The file templates, found from the package rather than the current directory
+TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates"
+)
+
+# Snippets are rendered with the same settings 'Template(...)' would use
+_SNIPPET_ENV = Environment()
+
+
+def compile_snippet(templ_str: str) -> Template:
+    return _SNIPPET_ENV.from_string(templ_str)
+
+
+@lru_cache(maxsize=None)
+def file_environment(templ_dir: str, cache_dir: Optional[str] = None) -> Environment:
+    """
+    Returns the environment for the main file templates. It is created once
+    per process and shared, so each template is only loaded and compiled once.
+    When a cache directory is given, compiled templates are also stored there
+    as bytecode and reused by later runs (until the template source changes)
+    """
+    loader = FileSystemLoader(templ_dir)
+    bcc = None
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bcc = FileSystemBytecodeCache(cache_dir)
+
+    return Environment(loader=loader, undefined=StrictUndefined, bytecode_cache=bcc)
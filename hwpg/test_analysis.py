@@ -0,0 +1,356 @@
+from hwpg.analysis import BacktrackCost, post_order
+from hwpg.ast import LeftRec, RuleRef
+from hwpg.frontend import parse_grammar
+from hwpg.process import Process
+
+_GRAMMAR = """value: NUMBER | list
+list: '[' [elems = value (',' value)*] ']'
+pair: key? NUMBER
+key: NUMBER ':'
+
+LBRACKET: '['
+RBRACKET: ']'
+COMMA: ','
+COLON: ':'
+"""
+
+
+def _process(src: str, **kwargs):
+    processor = Process(parse_grammar(src), **kwargs)
+    grammar, token_names, errors = processor.process()
+
+    assert not errors
+    return grammar, token_names, processor.prediction
+
+
+def test_first_sets():
+    grammar, token_names, _ = _process(_GRAMMAR)
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    value = rules["value"].node
+    assert not value.nullable
+    assert {token_names[id] for id in value.first} == {"NUMBER", "LBRACKET"}
+
+    # The optional elements can be skipped, so the list body can't
+    elems = rules["list"].node.nodes[1]
+    assert elems.nullable
+
+
+def test_compact_ast():
+    grammar = parse_grammar(_GRAMMAR)
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    # Nodes only have their slots, the binding included
+    elems = rules["list"].node.nodes[1].node
+    assert not hasattr(elems, "__dict__")
+    assert elems.binding == "elems"
+
+    # Every reference to a rule shares the same string for its name
+    refs = [
+        node
+        for rule in grammar.rules
+        for node in post_order(rule.node)
+        if isinstance(node, RuleRef) and node.name == "value"
+    ]
+    assert len(refs) == 2
+    assert refs[0].name is refs[1].name
+
+    # The comments are built from those of the children
+    assert rules["list"].comment == "list: \"'['\" [value (\"','\" value)*] \"']'\""
+
+
+def test_prediction():
+    grammar, _, prediction = _process(_GRAMMAR)
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    assert rules["value"].node.predictive
+    assert rules["list"].node.predictive
+
+    # 'key' and what follows it both start with NUMBER
+    assert not rules["pair"].node.predictive
+    assert [(c.rule, c.node) for c in prediction.conflicts] == [("pair", "key?")]
+    assert "what follows can also start with NUMBER" in prediction.report()
+
+
+def test_left_recursion():
+    grammar, _, _ = _process("""expr: expr '+' NUMBER | NUMBER
+a: b 'x' | NUMBER
+b: a '+' | c
+c: a ':'
+list: list X? | value
+value: NUMBER
+
+PLUS: '+'
+COLON: ':'
+X: 'x'
+""")
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    assert rules["expr"].left_rec == LeftRec.LOOP
+    assert rules["value"].left_rec == LeftRec.NONE
+
+    # 'a' is in both cycles (through 'b' alone, and through 'b' and 'c')
+    assert rules["a"].left_rec == LeftRec.LEADER
+    assert rules["b"].left_rec == LeftRec.INVOLVED
+    assert rules["c"].left_rec == LeftRec.INVOLVED
+
+    # Only growing a seed notices when 'X?' matching nothing gets no further
+    assert rules["list"].left_rec == LeftRec.LEADER
+
+
+def test_memoization():
+    grammar, _, _ = _process(
+        """stmt: call ';' | call '=' value | block
+call: NAME args?
+args: '(' value ')'
+block: '{' stmt* '}'
+@memo
+value: NUMBER
+@nomemo
+key: NAME ':'
+pair: key? NUMBER | key
+
+SEMI: ';'
+EQUALS: '='
+LPAREN: '('
+RPAREN: ')'
+LBRACE: '{'
+RBRACE: '}'
+COLON: ':'
+""",
+        factor_prefixes=False,
+    )
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    # 'call' is tried by the first alternative and then parsed again by the
+    # second, which makes 'args' (past the start of 'call') possible again too
+    assert rules["call"].node.memo
+    assert rules["args"].node.memo
+
+    # Each is only ever parsed once at a position
+    assert not rules["stmt"].node.memo
+    assert not rules["block"].node.memo
+    assert not rules["pair"].node.memo
+
+    assert rules["value"].node.memo
+    assert not rules["key"].node.memo
+
+
+def test_decorators():
+    processor = Process(parse_grammar("""@memo @nomemo
+a: b 'x' | NUMBER
+@memo
+b: a '+'
+@fast
+c: NUMBER
+
+PLUS: '+'
+X: 'x'
+"""))
+    _, _, errors = processor.process()
+
+    assert len(errors) == 3
+    assert "'a' can't be both '@memo' and '@nomemo'" in errors[0]
+    assert "'b' can't be '@memo'" in errors[1]
+    assert "Unknown decorator '@fast' on rule 'c'" in errors[2]
+
+
+def test_inlining():
+    grammar, _, _ = _process("""value: NUMBER | list | pair
+list: '[' [value (',' value)*] ']'
+pair: key NUMBER
+key: NAME ':'
+nested: '(' nested? ')'
+
+LBRACKET: '['
+RBRACKET: ']'
+COMMA: ','
+COLON: ':'
+LPAREN: '('
+RPAREN: ')'
+""")
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    # Only a body of parts is parsed in place, and 'nested' would never stop
+    assert rules["key"].inline
+    assert rules["pair"].inline
+    assert not rules["value"].inline
+    assert not rules["nested"].inline
+
+    # 'list' is only referenced once, but is too big to copy
+    assert not rules["list"].inline
+    elems = rules["list"].node.nodes[1].node
+    assert elems.inline
+    assert elems.nodes[1].node.inline
+
+
+def test_left_factoring():
+    grammar, _, _ = _process("""stmt: call ';' | call '=' value | block
+call: NAME args?
+args: '(' value ')'
+block: '{' stmt* '}'
+value: NUMBER '+' value | NUMBER
+expr: expr '+' NUMBER | expr '-' NUMBER | NUMBER
+
+SEMI: ';'
+EQUALS: '='
+LPAREN: '('
+RPAREN: ')'
+LBRACE: '{'
+RBRACE: '}'
+PLUS: '+'
+MINUS: '-'
+""")
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    # The alternatives starting with 'call' parse it once, so it isn't memoized
+    stmt = rules["stmt"].node
+    assert [alt.comment for alt in stmt.nodes] == ["call ';' | call '=' value", "block"]
+    assert stmt.nodes[0].prefix == 1
+    assert stmt.predictive
+    assert not rules["call"].node.memo
+
+    # The alternatives themselves are kept whole
+    assert [len(alt.nodes) for alt in stmt.nodes[0].nodes] == [2, 3]
+
+    # The last one can be just the shared part
+    value = rules["value"].node
+    assert value.prefix == 1
+    assert [alt.comment for alt in value.nodes] == ["NUMBER '+' value", "NUMBER"]
+
+    # A rule calling itself first is still parsed as a loop
+    assert rules["expr"].node.prefix == 0
+    assert rules["expr"].left_rec == LeftRec.LOOP
+
+
+def test_start_rules():
+    grammar, token_names, _ = _process(_GRAMMAR, start=["list"])
+
+    # 'pair' and 'key' (and the ':' only they use) aren't reachable from 'list'
+    assert [rule.name for rule in grammar.rules] == ["value", "list"]
+    assert token_names == ["LBRACKET", "RBRACKET", "COMMA", "NUMBER", "EOF", "ILLEGAL"]
+
+    processor = Process(parse_grammar(_GRAMMAR), start=["list", "missing"])
+    _, _, errors = processor.process()
+    assert errors == ["ERROR: Start rule 'missing' is not defined"]
+
+
+def test_backtrack_cost():
+    src = """stmt: call ';' | block | call '=' expr
+call: NAME
+block: '{' stmt* '}'
+expr: term '+' expr | term
+term: '(' expr ')' | NUMBER
+
+SEMI: ';'
+EQUALS: '='
+LBRACE: '{'
+RBRACE: '}'
+PLUS: '+'
+LPAREN: '('
+RPAREN: ')'
+"""
+    processor = Process(parse_grammar(src), factor_prefixes=False)
+    grammar, _, _ = processor.process()
+
+    costs = {}
+    for memoize in (True, False):
+        cost = BacktrackCost(
+            grammar.rules, processor.prediction, processor.memoization, memoize, False
+        )
+        cost.compute()
+        costs[memoize] = cost
+
+    # Memoizing leaves only the work of the alternatives to factor
+    bounds = {bound.rule: bound for bound in costs[True].bounds}
+    assert not any(bound.exponential or bound.parses > 1 for bound in bounds.values())
+    assert costs[True].suggestions == {
+        "stmt": [
+            "call ';' | call '=' expr each parse call, which can't be factored out: "
+            "they aren't next to each other"
+        ],
+        "expr": [
+            "factor out term, which term '+' expr | term start with, by turning on "
+            "factor_prefixes"
+        ],
+    }
+
+    # Without it, each nested '(' parses what is in it again
+    bounds = {bound.rule: bound for bound in costs[False].bounds}
+    assert bounds["expr"].exponential
+    assert bounds["expr"].causes == ["expr", "term"]
+    assert not bounds["call"].exponential
+    assert "memoize term: parsed up to 2 times at a position, recursively" in (
+        costs[False].suggestions["term"]
+    )
+    assert "expr: O(2^n)" in costs[False].report()
+
+
+def test_backtrack_cost_factored():
+    src = """stmt: NAME ~ '=' NUMBER | NAME ';' | block
+block: '{' stmt* '}' | '{' '}'
+expr: expr '+' term | expr '-' term | term
+term: factor '*' term | factor
+factor: NUMBER | NUMBER '!' | '(' expr ')'
+
+SEMI: ';'
+EQUALS: '='
+LBRACE: '{'
+RBRACE: '}'
+PLUS: '+'
+MINUS: '-'
+STAR: '*'
+BANG: '!'
+LPAREN: '('
+RPAREN: ')'
+"""
+    processor = Process(parse_grammar(src))
+    grammar, _, _ = processor.process()
+    cost = BacktrackCost(
+        grammar.rules, processor.prediction, processor.memoization, True, True
+    )
+    cost.compute()
+
+    # Only what factoring leaves as it is gets a word, with the reason for it
+    assert cost.suggestions == {
+        "stmt": [
+            "NAME ~ '=' NUMBER | NAME ';' each parse NAME, which can't be factored "
+            "out: NAME ~ '=' NUMBER has a cut, which the others can't get past"
+        ],
+        "block": [
+            "more lookahead for '{' stmt* '}' | '{' '}': alternatives overlap on "
+            "RBRACE"
+        ],
+        "factor": [
+            "NUMBER | NUMBER '!' each parse NUMBER, which can't be factored out: the "
+            "one that is just NUMBER comes before the others"
+        ],
+    }
+
+
+def test_cuts():
+    processor = Process(parse_grammar("""stmt: NAME ~ '=' NAME | NAME ';'
+opt: NAME [~] | (~)* NAME
+a: b 'x' | NAME
+b: a '+' | c
+c: '(' ~ a ')'
+
+EQUALS: '='
+SEMI: ';'
+X: 'x'
+PLUS: '+'
+LPAREN: '('
+RPAREN: ')'
+"""))
+    grammar, _, errors = processor.process()
+    rules = {rule.name: rule for rule in grammar.rules}
+
+    assert len(errors) == 3
+    assert "Cut in rule 'opt' has to be a part of an alternative" in errors[0]
+    assert "Cut in rule 'opt' has to be a part of an alternative" in errors[1]
+    assert "Rule 'a' can't reach a cut (in c)" in errors[2]
+
+    # Parsing NAME once for both would try ';' right after the cut
+    stmt = rules["stmt"].node
+    assert stmt.prefix == 0
+    assert [alt.comment for alt in stmt.nodes] == ["NAME ~ '=' NAME", "NAME ';'"]
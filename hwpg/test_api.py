@@ -0,0 +1,420 @@
+import pytest
+
+from hwpg.api import GrammarError, load_parser, ParserCache
+from hwpg.config import Config
+
+_GRAMMAR = """value: NUMBER | '[' NUMBER* ']'
+LBRACKET: '['
+RBRACKET: ']'
+"""
+
+
+class _Token:
+    def __init__(self, token_type):
+        self.token_type = token_type
+
+
+class _Tokens:
+    def __init__(self, tokens, eof):
+        self._tokens = iter(tokens)
+        self._eof = eof
+
+    def next_token(self):
+        return next(self._tokens, self._eof)
+
+
+def _make_tokens(module, *types):
+    token_type = module.TokenType
+    tokens = [_Token(token_type[tt]) for tt in types]
+    return _Tokens(tokens, _Token(token_type.EOF))
+
+
+def test_load_parser_in_memory():
+    parser = load_parser(_GRAMMAR, name="list")
+    tokens = _make_tokens(parser, "LBRACKET", "NUMBER", "NUMBER", "RBRACKET")
+
+    tree = parser.ListParser(tokens).parse_value()
+    assert tree and len(tree.nodes) == 3
+
+
+def test_load_parser_cached():
+    cache = ParserCache(size=1)
+
+    parser = cache.load(_GRAMMAR)
+    assert cache.load(_GRAMMAR) is parser
+
+    cache.load(_GRAMMAR + "EXTRA: 'x'\n")
+    assert len(cache) == 1
+    assert cache.load(_GRAMMAR) is not parser
+
+
+def test_load_parser_errors():
+    with pytest.raises(GrammarError) as exc:
+        load_parser("value: 'x'\n")
+
+    assert exc.value.errors
+
+
+_LEFT_REC_GRAMMAR = """expr: expr '-' NUMBER | NUMBER
+a: b 'x' | NUMBER
+b: a '-'
+
+MINUS: '-'
+X: 'x'
+"""
+
+
+def test_load_parser_left_recursion():
+    parser = load_parser(_LEFT_REC_GRAMMAR, name="calc")
+
+    tokens = _make_tokens(parser, "NUMBER", "MINUS", "NUMBER", "MINUS", "NUMBER")
+    tree = parser.CalcParser(tokens).parse_expr()
+    # Left associative: (1 - 2) - 3
+    assert tree and len(tree.nodes) == 3
+    assert len(tree.nodes[0].nodes) == 3
+
+    tokens = _make_tokens(parser, "NUMBER", "MINUS", "X", "MINUS", "X")
+    calc = parser.CalcParser(tokens)
+    tree = calc.parse_a()
+    assert tree and calc.pos == 5
+    assert tree.nodes[0].nodes[0].nodes[0].nodes[0].token_type.name == "NUMBER"
+
+
+@pytest.mark.parametrize(
+    "src", ["r: r A | C* D?\n", "r: s A | C* D?\ns: r\n"], ids=["direct", "indirect"]
+)
+@pytest.mark.parametrize("memoize", [True, False])
+def test_load_parser_left_recursion_empty_seed(src: str, memoize: bool):
+    parser = load_parser(src, Config(memoize=memoize), name="seed")
+
+    # The seed matches nothing, and is then grown by each 'A'
+    for count in (0, 1, 2):
+        seed = parser.SeedParser(_make_tokens(parser, *["A"] * count))
+        tree = seed.parse_r()
+        assert tree and seed.pos == count
+        for _ in range(count):
+            assert tree.nodes[1].token_type.name == "A"
+            tree = tree.nodes[0]
+        assert tree.nodes == [[], None]
+
+
+def test_load_parser_left_recursion_disabled():
+    with pytest.raises(GrammarError) as exc:
+        load_parser(_LEFT_REC_GRAMMAR, Config(left_recursion=False))
+
+    assert "expr" in exc.value.errors[0]
+
+
+_FACTOR_GRAMMAR = """stmt: NAME '=' NUMBER | NAME '(' NUMBER? ')' | NAME
+EQUALS: '='
+LPAREN: '('
+RPAREN: ')'
+"""
+
+
+def test_load_parser_left_factoring():
+    factored = load_parser(_FACTOR_GRAMMAR, name="stmt")
+    plain = load_parser(_FACTOR_GRAMMAR, Config(factor_prefixes=False), name="stmt")
+
+    # The shared NAME is only parsed once, but the trees come out the same
+    for types in (("NAME", "LPAREN", "RPAREN"), ("NAME", "EQUALS", "NUMBER")):
+        trees = []
+        for parser in (factored, plain):
+            tree = parser.StmtParser(_make_tokens(parser, *types)).parse_stmt()
+            trees.append([node.token_type.name for node in tree.nodes if node])
+
+        assert trees[0] == trees[1] == list(types)
+
+
+def test_load_parser_left_factoring_bare_prefix():
+    src = """expr: term '+' expr | term
+term: '(' expr ')' | NUMBER
+PLUS: '+'
+LPAREN: '('
+RPAREN: ')'
+"""
+    calls = []
+    for factor in (True, False):
+        cfg = Config(memoize=False, factor_prefixes=factor)
+        parser = load_parser(src, cfg, name="expr")
+
+        class CountingParser(parser.ExprParser):  # type: ignore
+            def parse_term(self):
+                calls[-1] += 1
+                return super().parse_term()
+
+        calls.append(0)
+        tokens = _make_tokens(parser, "LPAREN", "NUMBER", "RPAREN")
+        tree = CountingParser(tokens).parse_expr()
+        assert tree.nodes[1].token_type.name == "NUMBER"
+
+    # Falling back to the bare 'term' keeps its result, where each nested '('
+    # would otherwise parse what is in it again
+    assert calls == [2, 6]
+
+
+def test_load_parser_token_sets():
+    parser = load_parser(
+        """items: '[' (NUMBER | NAME)* ']' | NAME | NUMBER
+LBRACKET: '['
+RBRACKET: ']'
+""",
+        name="items",
+    )
+
+    # The run of tokens is matched in one go, and the tree is as it was
+    tokens = _make_tokens(parser, "LBRACKET", "NUMBER", "NAME", "NUMBER", "RBRACKET")
+    tree = parser.ItemsParser(tokens).parse_items()
+    assert tree and len(tree.nodes) == 3
+    items = tree.nodes[1]
+    assert [tok.token_type.name for tok in items] == ["NUMBER", "NAME", "NUMBER"]
+
+    tree = parser.ItemsParser(_make_tokens(parser, "NAME")).parse_items()
+    assert tree and tree.token_type.name == "NAME"
+
+
+def test_load_parser_token_set_after_failed_alternative():
+    # 'D D+' fails on 'B' after taking the 'D', so 'A | B' mustn't match it
+    src = "r0: (C (D D+ | A | B))? C\n"
+    results = []
+    for predictive in (True, False):
+        parser = load_parser(src, Config(predictive=predictive), name="r0")
+        tokens = _make_tokens(parser, "C", "D", "B")
+        r0 = parser.R0Parser(tokens)
+        tree = r0.parse_r0()
+        results.append((tree.nodes[0], tree.nodes[1].token_type.name, r0.pos))
+
+    assert results[0] == results[1] == (None, "C", 1)
+
+
+def test_load_parser_deeply_nested_grammar():
+    # Too deep for the self-hosted front end, so Lark parses it instead
+    src = "r: " + "(" * 200 + "A" + " B)" * 200 + "\n"
+    parser = load_parser(src, name="r")
+
+    tokens = _make_tokens(parser, "A", *["B"] * 200)
+    tree = parser.RParser(tokens).parse_r()
+    depth = 0
+    while isinstance(tree, parser.ParserNode):
+        assert tree.nodes[1].token_type.name == "B"
+        tree, depth = tree.nodes[0], depth + 1
+
+    assert depth == 200 and tree.token_type.name == "A"
+
+
+_CUT_GRAMMAR = """stmts: stmt*
+stmt: call ';' ~ | call '=' NUMBER ';' ~
+call: NAME ['(' ~ NUMBER ')']
+SEMI: ';'
+EQUALS: '='
+LPAREN: '('
+RPAREN: ')'
+"""
+
+
+def test_load_parser_cuts():
+    parser = load_parser(_CUT_GRAMMAR, name="stmts")
+
+    # Past each statement, the tokens and memo results before it are dropped
+    types = ["NAME", "LPAREN", "NUMBER", "RPAREN", "SEMI"]
+    types += ["NAME", "EQUALS", "NUMBER", "SEMI"] * 3
+    stmts = parser.StmtsParser(_make_tokens(parser, *types))
+    tree = stmts.parse_stmts()
+    assert tree and len(tree) == 4
+    assert stmts.pos == len(types)
+    assert [tok.token_type.name for tok in stmts._tokens] == ["EOF"]
+
+    # The memo tables keep no more than the byte of positions the last cut is in
+    start = stmts._memo_start
+    assert start == stmts.pos & ~7
+    assert all(len(memo) <= (stmts.pos + 1 - start) * 2 for memo in stmts._memos)
+    assert all(len(fails) <= 1 for fails in stmts._fails)
+
+    # Failing past the '(' would take going back before it
+    tokens = _make_tokens(parser, "NAME", "LPAREN", "SEMI")
+    with pytest.raises(parser.ParseError) as exc:
+        parser.StmtsParser(tokens).parse_stmts()
+
+    assert exc.value.cut_pos == 2
+
+
+_WINDOW_GRAMMAR = """doc: item* '.' | item* '!'
+@memo
+item: NAME '=' NUMBER
+EQUALS: '='
+DOT: '.'
+BANG: '!'
+"""
+
+
+def test_load_parser_memo_window():
+    cfg = Config(memo_window=8, factor_prefixes=False)
+    parser = load_parser(_WINDOW_GRAMMAR, cfg, name="doc")
+
+    # Only the last items are still memoized when the '.' isn't found
+    types = ["NAME", "EQUALS", "NUMBER"] * 20 + ["BANG"]
+    doc = parser.DocParser(_make_tokens(parser, *types))
+    tree = doc.parse_doc()
+    assert tree and len(tree.nodes[0]) == 20
+    assert doc.memo_evicted > 0
+    assert doc.memo_reparses == 1
+    assert all(len(memo) <= 2 * 2 * 8 for memo in doc._memos)
+
+    # The left recursive result still being grown is kept however long it gets
+    parser = load_parser(_LEFT_REC_GRAMMAR, Config(memo_window=2), name="calc")
+    types = ["NUMBER"] + ["MINUS", "X"] * 20
+    calc = parser.CalcParser(_make_tokens(parser, *types))
+    assert calc.parse_a() and calc.pos == len(types)
+    assert calc.memo_evicted == 0
+
+
+_STREAM_GRAMMAR = """items: item* '.'
+item: NAME args ';'
+args: '(' NUMBER ')' '=' NUMBER | '(' NUMBER ')'
+EQUALS: '='
+SEMI: ';'
+LPAREN: '('
+RPAREN: ')'
+DOT: '.'
+"""
+
+
+def test_load_parser_stream_tokens():
+    cfg = Config(stream_tokens=True, factor_prefixes=False)
+    parser = load_parser(_STREAM_GRAMMAR, cfg, name="items")
+
+    # Only 'args' backtracks, so only its tokens are held on to, however many
+    # items there are
+    types = ["NAME", "LPAREN", "NUMBER", "RPAREN", "EQUALS", "NUMBER", "SEMI"]
+    types += ["NAME", "LPAREN", "NUMBER", "RPAREN", "SEMI"]
+    types = types * 500 + ["DOT"]
+    tokens = _make_tokens(parser, *types)
+    items = parser.ItemsParser(tokens)
+    held = []
+    next_token = tokens.next_token
+    tokens.next_token = lambda: held.append(len(items._tokens)) or next_token()
+
+    tree = items.parse_items()
+    assert tree and len(tree.nodes[0]) == 1000 and items.pos == len(types)
+    assert max(held) <= 64
+
+    # Going back to the start of the document keeps every token until then
+    parser = load_parser(_WINDOW_GRAMMAR, cfg, name="doc")
+    types = ["NAME", "EQUALS", "NUMBER"] * 100 + ["BANG"]
+    doc = parser.DocParser(_make_tokens(parser, *types))
+    assert doc.parse_doc()
+    assert doc._start == 0 and len(doc._tokens) == len(types) + 1
+
+
+_NODE_GRAMMAR = """value: NUMBER | list | pair
+list: '[' [elems = value (',' value)*] ']'
+pair: NAME ':' value
+
+LBRACKET: '['
+RBRACKET: ']'
+COMMA: ','
+COLON: ':'
+"""
+
+
+def test_load_parser_node_classes():
+    parser = load_parser(_NODE_GRAMMAR, Config(node_classes=True), name="tree")
+
+    types = ["LBRACKET", "NUMBER", "COMMA", "NAME", "COLON", "NUMBER", "RBRACKET"]
+    tree = parser.TreeParser(_make_tokens(parser, *types)).parse_value()
+    assert type(tree) is parser.ListNode
+    assert tree.lbracket.token_type.name == "LBRACKET"
+
+    # Fields are named for bindings, rules and tokens, and listed in order
+    elems = tree.elems
+    assert elems.value.token_type.name == "NUMBER"
+    pair = elems.inner2_list[0].value
+    assert type(pair) is parser.PairNode
+    assert pair.nodes == [pair.name, pair.colon, pair.value]
+    assert not hasattr(pair, "__dict__")
+
+
+_EVENT_GRAMMAR = """stmt: expr ';' | assign = NAME '=' expr ';'
+expr: expr '-' NUMBER | NAME | NUMBER
+
+SEMI: ';'
+EQUALS: '='
+MINUS: '-'
+"""
+
+
+class _Handler:
+    def __init__(self):
+        self.events = []
+
+    def on_token(self, tok):
+        self.events.append(tok.token_type.name)
+
+    def enter_stmt(self):
+        self.events.append("<stmt>")
+
+    def exit_stmt(self, result):
+        self.events.append(("</stmt>", result))
+
+    def enter_expr(self):
+        self.events.append("<expr>")
+
+    def exit_expr(self, result):
+        self.events.append("</expr>")
+
+
+class _EventActions:
+    def stmt_assign(self):
+        return '        return "assign"', "str"
+
+
+def test_load_parser_events():
+    parser = load_parser(_EVENT_GRAMMAR, Config(events=True), name="events")
+
+    # The first alternative parses the NAME as an expression before failing,
+    # which the handler never hears of
+    types = ["NAME", "EQUALS", "NUMBER", "MINUS", "NUMBER", "SEMI"]
+    handler = _Handler()
+    tree = parser.EventsParser(_make_tokens(parser, *types), handler).parse_stmt()
+    assert tree and len(tree.nodes) == 4
+    assert handler.events == [
+        "<stmt>",
+        "NAME",
+        "EQUALS",
+        "<expr>",
+        "<expr>",
+        "NUMBER",
+        "</expr>",
+        "MINUS",
+        "NUMBER",
+        "</expr>",
+        "SEMI",
+        ("</stmt>", tree),
+    ]
+
+    # Without a tree, each rule's result is its action's, or just that it matched
+    cfg = Config(events=True, make_parse_tree=False, parser_actions=_EventActions())
+    parser = load_parser(_EVENT_GRAMMAR, cfg, name="events")
+
+    types = ["NAME", "EQUALS", "NAME", "SEMI"]
+    handler = _Handler()
+    assert parser.EventsParser(_make_tokens(parser, *types), handler).parse_stmt()
+    assert handler.events == [
+        "<stmt>",
+        "NAME",
+        "EQUALS",
+        "<expr>",
+        "NAME",
+        "</expr>",
+        "SEMI",
+        ("</stmt>", "assign"),
+    ]
+
+
+def test_load_parser_from_any_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    # The templates (and the Lark front end's grammar) are found all the same
+    src = _GRAMMAR + "EXTRA: 'x'\n"
+    assert ParserCache().load(src, name="list")
+    assert ParserCache().load(src, name="list", use_lark=True)
@@ -0,0 +1,33 @@
+import os
+
+from hwpg.batch import expand_grammars, generate_all, make_jobs
+
+_VALID = """value: NUMBER | '[' NUMBER* ']'
+LBRACKET: '['
+RBRACKET: ']'
+"""
+
+
+def test_generate_all_keeps_going(tmp_path):
+    # One grammar with an error, one that doesn't even parse and a valid one
+    grammars = {"literal": "value: 'x'\n", "syntax": "value: = =\n"}
+    grammars["valid"] = _VALID
+    for name, src in grammars.items():
+        with open(tmp_path / f"{name}.hwpg", "w") as f:
+            f.write(src)
+
+    filenames, missing = expand_grammars([str(tmp_path / "*.hwpg")])
+    assert not missing and len(filenames) == 3
+    output = str(tmp_path / "out")
+    jobs = make_jobs(filenames, output)
+
+    results = dict(generate_all(jobs, None, False, False, 2))
+    assert list(results) == filenames
+
+    # Each failure is reported with its own grammar, and the rest still made
+    errors = {os.path.basename(name)[:-5]: errs for name, errs in results.items()}
+    assert "Literal 'x' does not have corresponding token rule" in errors["literal"][0]
+    assert errors["syntax"] and errors["syntax"][0].startswith("ERROR: ")
+    assert errors["valid"] == []
+    assert os.path.exists(os.path.join(output, "valid", "parser.py"))
+    assert not os.path.exists(os.path.join(output, "literal", "parser.py"))
@@ -0,0 +1,211 @@
+import json
+import os
+import tracemalloc
+
+from hwpg import parsergen
+from hwpg.config import Config
+from hwpg.manifest import Manifest, MANIFEST_FILENAME
+from hwpg.pipeline import generate, render, report
+from hwpg.runtime.python.parser_codegen import PyParserFuncCodeGen
+from hwpg.timings import dumps_profile, Timings
+
+_GRAMMAR = """value: NUMBER | list | pair
+list: '[' [value (',' value)*] ']'
+pair: NAME ':' value
+
+LBRACKET: '['
+RBRACKET: ']'
+COMMA: ','
+COLON: ':'
+"""
+
+
+def test_snippets_compiled_once(monkeypatch):
+    compiled = []
+    compile_snippet = parsergen.compile_snippet
+    monkeypatch.setattr(
+        parsergen, "compile_snippet", lambda s: compiled.append(s) or compile_snippet(s)
+    )
+    monkeypatch.setattr(PyParserFuncCodeGen, "_templates", {})
+
+    # Each snippet is compiled the first time it is used, then shared by every
+    # function (and every later run)
+    first = render(_GRAMMAR, "tree", Config())
+    assert compiled and len(set(compiled)) == len(compiled)
+    count = len(compiled)
+
+    assert render(_GRAMMAR, "tree", Config()) == first
+    assert len(compiled) == count
+
+
+def _spy_lookups(monkeypatch):
+    # The rules whose code is found in the manifest from here on
+    reused = []
+    lookup = Manifest.lookup
+
+    def spy(self, name, key):
+        found = lookup(self, name, key)
+        if found:
+            reused.append(name)
+        return found
+
+    monkeypatch.setattr(Manifest, "lookup", spy)
+    return reused
+
+
+def _backdate(output: str):
+    # Returns the output files by name, each dated back so being written again
+    # shows in its time
+    files = {}
+    for name in os.listdir(output):
+        path = os.path.join(output, name)
+        os.utime(path, (0, 0))
+        with open(path, "r") as f:
+            files[name] = f.read()
+
+    return files
+
+
+def _rewritten(output: str, files):
+    rewritten = []
+    for name, code in files.items():
+        path = os.path.join(output, name)
+        with open(path, "r") as f:
+            if os.stat(path).st_mtime or f.read() != code:
+                rewritten.append(name)
+
+    return sorted(rewritten)
+
+
+def test_generate_unchanged(tmp_path, monkeypatch):
+    grammar, output = str(tmp_path / "tree.hwpg"), str(tmp_path / "tree")
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR)
+    assert not generate(grammar, Config(), "", output)
+    files = _backdate(output)
+    assert MANIFEST_FILENAME in files and "parser.py" in files
+
+    # Every rule comes from the manifest, and no file is written again
+    reused = _spy_lookups(monkeypatch)
+    assert not generate(grammar, Config(), "", output)
+    assert sorted(reused) == ["list", "pair", "value"]
+    assert _rewritten(output, files) == []
+
+
+def test_generate_changed(tmp_path, monkeypatch):
+    grammar, output = str(tmp_path / "tree.hwpg"), str(tmp_path / "tree")
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR)
+    assert not generate(grammar, Config(), "", output)
+    files = _backdate(output)
+
+    # Only the changed rule, and 'value' (which parses it in place), are
+    # generated again
+    reused = _spy_lookups(monkeypatch)
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR.replace("pair: NAME ':' value", "pair: NAME ':' NUMBER"))
+    assert not generate(grammar, Config(), "", output)
+    assert reused == ["list"]
+    assert _rewritten(output, files) == [MANIFEST_FILENAME, "parser.py"]
+
+    # Other settings make other code, so none of it is reused
+    reused.clear()
+    assert not generate(grammar, Config(inline=0), "", output)
+    assert reused == []
+
+
+def test_timings_profile(tmp_path):
+    grammar, output = str(tmp_path / "tree.hwpg"), str(tmp_path / "tree")
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR)
+
+    timings = Timings(grammar)
+    try:
+        assert not generate(grammar, Config(), "", output, timings=timings)
+    finally:
+        tracemalloc.stop()
+
+    phases = [phase.name for phase in timings.phases]
+    for name in ("read", "parse", "process", "tokens", "write"):
+        assert name in phases
+    assert sorted(timings.rules) == ["list", "pair", "value"]
+
+    report = timings.report()
+    assert report.startswith(f"Timings for {grammar}:")
+    assert "Slowest rules (3 total):" in report
+
+    profile = json.loads(dumps_profile([timings]))
+    assert profile["version"] == 1
+    (entry,) = profile["grammars"]
+    assert entry["grammar"] == grammar
+    assert entry["total_seconds"] == timings.total()
+    assert [phase["name"] for phase in entry["phases"]] == phases
+    assert all(
+        set(phase) == {"name", "seconds", "peak_bytes"} for phase in entry["phases"]
+    )
+    assert set(entry["rules"]) == {"list", "pair", "value"}
+
+
+def test_report_as_configured(tmp_path):
+    grammar = str(tmp_path / "tree.hwpg")
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR)
+
+    errors, text = report(grammar, Config())
+    assert not errors
+    assert "Memoized functions: 0 of 5" in text
+
+    # Without predictive functions, those that backtrack are memoized
+    errors, text = report(grammar, Config(predictive=False))
+    assert not errors
+    assert "Memoized functions: 3 of 5" in text
+
+
+def test_alternatives_share_guard_and_restore():
+    src = """value: pair | item
+pair: NAME ':' NUMBER
+item: NAME
+
+COLON: ':'
+"""
+    errors, files = render(src, "value", Config())
+    assert not errors
+    code = files["parser.py"]
+    value = code[code.index("    def parse_value(") : code.index("    def parse_pair(")]
+
+    # Both start with NAME, which is tested once, and the position is put back
+    # after each failed alternative but not again at the end
+    assert value.count("if tt == TokenType.NAME:") == 1
+    assert value.count("self.pos = old_pos") == 2
+    assert value.rstrip().endswith("self.pos = old_pos\n\n        return None")
+
+
+def _nested_rule(name: str, depth: int) -> str:
+    # Groups nested 'depth' levels deep, in turn repeated, optional and
+    # alternatives
+    body = "NUMBER"
+    for level in range(depth):
+        kind = level % 3
+        if kind == 0:
+            body = f"('[' {body})*"
+        elif kind == 1:
+            body = f"[',' {body}]"
+        else:
+            body = f"(':' {body} | NAME)"
+
+    return f"{name}: {body}\n"
+
+
+def test_deeply_nested_rule(tmp_path):
+    # Deeper than Python's recursion limit: it is parsed, processed and
+    # generated from its source without recursing (and its functions don't
+    # either)
+    grammar, output = str(tmp_path / "nested.hwpg"), str(tmp_path / "nested")
+    with open(grammar, "w") as f:
+        f.write(_nested_rule("nested", 1000) + _GRAMMAR)
+
+    assert not generate(grammar, Config(), "", output)
+    with open(os.path.join(output, "parser.py"), "r") as f:
+        code = f.read()
+    assert "    def parse_nested(self)" in code
+    compile(code, "parser.py", "exec")
@@ -0,0 +1,38 @@
+import os
+
+from hwpg.watch import Watcher
+
+_GRAMMAR = """value: NUMBER | '[' NUMBER* ']'
+LBRACKET: '['
+RBRACKET: ']'
+"""
+
+
+def test_watcher_regenerates_changed(tmp_path, capsys):
+    jobs = []
+    for name in ("a", "b"):
+        with open(tmp_path / f"{name}.hwpg", "w") as f:
+            f.write(_GRAMMAR)
+        jobs.append((str(tmp_path / f"{name}.hwpg"), str(tmp_path / name)))
+
+    # Everything is generated at the start
+    watcher = Watcher(jobs, None)
+    watcher._regenerate(watcher._changed())
+    out = capsys.readouterr().out
+    assert out.count("OK ") == 2
+    assert watcher._changed() == []
+
+    # Then only what changes, with any errors reported and the watch going on
+    grammar = jobs[1][0]
+    with open(grammar, "w") as f:
+        f.write("value: 'x'\n")
+    os.utime(grammar, (1, 1))
+    watcher._regenerate(watcher._changed())
+    out = capsys.readouterr().out
+    assert f"FAILED {grammar}" in out and "OK " not in out
+
+    with open(grammar, "w") as f:
+        f.write(_GRAMMAR)
+    os.utime(grammar, (2, 2))
+    watcher._regenerate(watcher._changed())
+    assert capsys.readouterr().out.startswith(f"OK     {grammar}")
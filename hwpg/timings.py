@@ -0,0 +1,98 @@
+import json
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Any, ContextManager, Dict, List, Optional
+
+# Bump whenever the layout of the JSON profile changes
+_PROFILE_VERSION = 1
+
+# Number of rules listed in the text report
+_TOP_RULES = 10
+
+
+@dataclass
+class Phase:
+    name: str
+    seconds: float
+    # Most memory allocated at any one time during the phase (above what was
+    # already allocated when it started)
+    peak_bytes: int
+
+
+class Timings:
+    """
+    Collects the wall time and peak memory allocation of each pipeline phase
+    for a single grammar, as well as the time taken to generate each rule.
+    Memory is measured with 'tracemalloc', which is started on first use and
+    slows everything down noticeably, so only compare timings with each other
+    """
+
+    def __init__(self, grammar: str):
+        self.grammar = grammar
+        self.phases: List[Phase] = []
+        self.rules: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # Without 'reset_peak' (before Python 3.9) each peak covers all phases so far
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start_mem, _ = tracemalloc.get_traced_memory()
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            self.phases.append(Phase(name, elapsed, max(peak - start_mem, 0)))
+
+    def add_rule(self, name: str, seconds: float):
+        self.rules[name] = self.rules.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return sum(phase.seconds for phase in self.phases)
+
+    def report(self) -> str:
+        lines = [f"Timings for {self.grammar}:"]
+        for phase in self.phases:
+            lines.append(
+                f"  {phase.name:<12} {phase.seconds * 1000:>9.2f} ms"
+                f" {phase.peak_bytes / 1024:>10.1f} KiB peak"
+            )
+        lines.append(f"  {'total':<12} {self.total() * 1000:>9.2f} ms")
+
+        if self.rules:
+            rules = sorted(self.rules.items(), key=lambda item: -item[1])
+            lines.append(f"Slowest rules ({len(rules)} total):")
+            for name, seconds in rules[:_TOP_RULES]:
+                lines.append(f"  {name:<30} {seconds * 1000:>9.2f} ms")
+
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "grammar": self.grammar,
+            "total_seconds": self.total(),
+            "phases": [asdict(phase) for phase in self.phases],
+            "rules": self.rules,
+        }
+
+
+def measure(timings: Optional[Timings], name: str) -> ContextManager:
+    """Times the named phase, or does nothing when no timings are collected"""
+    return timings.phase(name) if timings else nullcontext()
+
+
+def dumps_profile(all_timings: List[Timings]) -> str:
+    """Returns a JSON profile of the timings of one or more grammars"""
+    profile = {
+        "version": _PROFILE_VERSION,
+        "grammars": [timings.to_dict() for timings in all_timings],
+    }
+    return json.dumps(profile, indent=2)
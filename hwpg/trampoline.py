@@ -0,0 +1,29 @@
+from typing import Any, Generator, List
+
+# A step of a recursive pass: it yields the step of each nested call and is
+# sent back that call's result
+Step = Generator["Step", Any, Any]
+
+
+def run(step: Step) -> Any:
+    """
+    Runs a recursive pass written as generators and returns its result.
+    Instead of calling itself, each step yields the step for the nested call,
+    so the nesting is kept on a list rather than the Python call stack. This
+    makes passes over the AST safe no matter how deeply a grammar nests
+    """
+    stack: List[Step] = [step]
+    value = None
+
+    while True:
+        try:
+            nested = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+
+            value = stop.value
+        else:
+            stack.append(nested)
+            value = None
@@ -0,0 +1,118 @@
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+from hwpg.batch import Job
+from hwpg.pipeline import generate, load_config
+
+# How often files are checked, and how long they must stay unchanged after an
+# edit before regenerating (editors often save in several quick writes)
+_POLL_INTERVAL = 0.02
+_DEBOUNCE = 0.05
+
+
+def _mtime(filename: str) -> Optional[float]:
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+class Watcher:
+    """
+    Regenerates grammars as they change. Everything that is expensive to set
+    up (the config module, the front end, the Jinja2 environments and their
+    compiled templates) is loaded once and stays warm for the whole session,
+    so a regeneration costs only the work for that one grammar
+    """
+
+    def __init__(
+        self,
+        jobs: List[Job],
+        config: Optional[str],
+        use_lark: bool = False,
+        force: bool = False,
+        start: Sequence[str] = (),
+    ):
+        self._jobs = jobs
+        self._config = config
+        self._use_lark = use_lark
+        self._force = force
+        self._start = start
+
+        self._cfg, self._config_src = load_config(config, start)
+        self._mtimes: Dict[str, Optional[float]] = {}
+
+    def _watched(self) -> List[str]:
+        filenames = [filename for filename, _ in self._jobs]
+        return [self._config, *filenames] if self._config else filenames
+
+    def _changed(self) -> List[str]:
+        changed: List[str] = []
+
+        for filename in self._watched():
+            mtime = _mtime(filename)
+            if mtime != self._mtimes.get(filename):
+                self._mtimes[filename] = mtime
+                changed.append(filename)
+
+        return changed
+
+    def _wait_for_quiet(self, changed: List[str]) -> List[str]:
+        # Debounce: keep collecting changes until a burst of saves settles down
+        while True:
+            time.sleep(_DEBOUNCE)
+            more = self._changed()
+            if not more:
+                return changed
+
+            changed.extend(name for name in more if name not in changed)
+
+    def _regenerate(self, changed: List[str]):
+        # A new config affects every grammar
+        if self._config in changed:
+            try:
+                self._cfg, self._config_src = load_config(self._config, self._start)
+            except Exception as e:
+                print(f"ERROR: Unable to load config: {type(e).__name__}: {e}")
+                return
+
+            jobs = self._jobs
+        else:
+            jobs = [job for job in self._jobs if job[0] in changed]
+
+        for filename, output in jobs:
+            start = time.perf_counter()
+
+            try:
+                errors = generate(
+                    filename,
+                    self._cfg,
+                    self._config_src,
+                    output,
+                    self._use_lark,
+                    self._force,
+                )
+            except Exception as e:
+                errors = [f"ERROR: {type(e).__name__}: {e}"]
+
+            elapsed = (time.perf_counter() - start) * 1000
+            if errors:
+                err = "\n".join(errors)
+                print(f"FAILED {filename} ({elapsed:.1f} ms)\nErrors:\n{err}")
+            else:
+                print(f"OK     {filename} ({elapsed:.1f} ms)")
+
+    def run(self):
+        """Generates every grammar, then watches for changes until interrupted"""
+        self._regenerate(self._changed())
+        print("Watching for changes (Ctrl+C to stop)...")
+
+        try:
+            while True:
+                time.sleep(_POLL_INTERVAL)
+                changed = self._changed()
+                if changed:
+                    self._regenerate(self._wait_for_quiet(changed))
+        except KeyboardInterrupt:
+            pass